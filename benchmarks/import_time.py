@@ -0,0 +1,121 @@
+"""
+Benchmark: Startkosten der Einstiegspunkte durch Python-Importe.
+
+Jedes Modul wird in einem frischen Interpreter mit `python -X importtime` importiert.
+Ausgewertet werden die kumulierte Importzeit des Moduls, die Wall-Clock-Zeit des
+Interpreters und die teuersten Pakete der obersten Ebene. Jede Messung wird mit Zeitstempel
+und Git-Commit an output/import_time.jsonl angehängt und mit der vorherigen Messung verglichen,
+sodass sich die Startkosten über die Zeit verfolgen lassen.
+
+Aufruf:
+    python benchmarks/import_time.py --repeat 5
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(BASE_DIR, "src")
+HISTORY_PATH = os.path.join(BASE_DIR, "output", "import_time.jsonl")
+
+# Einstiegspunkte: Inferenz, Dienst und Evaluation (ohne Berichte)
+MODULES = ("model", "service", "evaluation")
+HEAVY_PACKAGES = ("numpy", "pandas", "sklearn", "matplotlib", "seaborn")
+
+# Zeile von -X importtime: "import time: <self µs> | <kumuliert µs> | <Einrückung><Modul>"
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)$")
+
+
+def measure(module: str) -> dict[str, Any]:
+    """
+    Importiert ein Modul in einem frischen Interpreter und wertet -X importtime aus.
+
+    Args:
+        module: Name des Moduls in src/.
+
+    Returns:
+        dict[str, Any]: Kumulierte Importzeit und Wall-Clock-Zeit in ms sowie Importzeit pro Paket
+            der obersten Ebene.
+    """
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=SRC_DIR, capture_output=True, text=True, check=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+
+    packages: dict[str, float] = {}
+    loaded: set[str] = set()
+    module_ms = 0.0
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative_ms, name = int(match.group(2)) / 1000, match.group(4)
+        loaded.add(name.split(".")[0])
+        if name == module:
+            module_ms = cumulative_ms
+        elif "." not in name:
+            # Kumulierte Zeit eines Pakets enthält seine Abhängigkeiten (Überschneidungen möglich)
+            packages[name] = max(packages.get(name, 0.0), cumulative_ms)
+    return {"import_ms": module_ms, "wall_ms": wall_ms, "packages": packages,
+            "heavy_loaded": [p for p in HEAVY_PACKAGES if p in loaded]}
+
+
+def git_commit() -> Optional[str]:
+    """
+    Liefert den aktuellen Git-Commit (kurz) oder None außerhalb eines Repositorys.
+
+    Returns:
+        Optional[str]: Commit-Hash.
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    """
+    Misst alle Einstiegspunkte, gibt sie aus und hängt das Ergebnis an output/import_time.jsonl an.
+    """
+    parser = argparse.ArgumentParser(description="Importzeit der Einstiegspunkte")
+    parser.add_argument("--repeat", type=int, default=5, help="Messungen pro Modul (Median wird gespeichert)")
+    parser.add_argument("--top", type=int, default=5, help="Anzahl der teuersten Pakete in der Ausgabe")
+    args = parser.parse_args()
+
+    previous = None
+    if os.path.exists(HISTORY_PATH):
+        with open(HISTORY_PATH, "r", encoding="utf-8") as f:
+            lines = [line for line in f if line.strip()]
+        previous = json.loads(lines[-1]) if lines else None
+
+    record: dict[str, Any] = {"timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                              "commit": git_commit(), "python": sys.version.split()[0], "modules": {}}
+    for module in MODULES:
+        runs = sorted((measure(module) for _ in range(args.repeat)), key=lambda r: r["import_ms"])
+        median = runs[len(runs) // 2]
+        record["modules"][module] = median
+
+        change = ""
+        if previous and module in previous["modules"]:
+            delta = median["import_ms"] - previous["modules"][module]["import_ms"]
+            change = f" ({delta:+.0f} ms ggü. {previous['commit'] or previous['timestamp']})"
+        top = sorted(median["packages"].items(), key=lambda item: -item[1])[:args.top]
+        print(f"{module:<12} Import {median['import_ms']:>7.0f} ms  Interpreter {median['wall_ms']:>7.0f} ms{change}")
+        print(f"{'':<12} " + ", ".join(f"{name} {ms:.0f} ms" for name, ms in top))
+        if median["heavy_loaded"]:
+            print(f"{'':<12} Schwere Pakete geladen: {', '.join(median['heavy_loaded'])}")
+
+    os.makedirs(os.path.dirname(HISTORY_PATH), exist_ok=True)
+    with open(HISTORY_PATH, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
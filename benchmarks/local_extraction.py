@@ -0,0 +1,90 @@
+"""
+Benchmark: lokale Regex-Extraktion gegenüber reiner LLM-Extraktion auf data/data.csv.
+
+Misst für beide Varianten die Latenz pro Mail und vergleicht die Ergebnisse feldweise.
+Zusätzlich wird ausgewiesen, wie oft jedes Feld lokal gefunden wurde und wie oft der lokale
+Wert mit dem Wert der reinen LLM-Extraktion übereinstimmt. Benötigt einen laufenden Ollama-Server.
+
+Aufruf:
+    python benchmarks/local_extraction.py
+"""
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import extraction
+import model as model_module
+from evaluation import OUTPUT_DIR, _normalize_field, compare_extractions, load_dataset
+
+LOCAL_FIELDS = {
+    "geburtsdatum": extraction.extract_geburtsdatum,
+    "rechnungsbetrag": extraction.extract_rechnungsbetrag,
+    "anschrift": extraction.extract_anschrift,
+}
+
+
+def run(ai_model: model_module.AIModel, requests: list[str]) -> tuple[list[dict], np.ndarray]:
+    """
+    Klassifiziert alle Mails sequenziell und misst die Latenz pro Mail.
+
+    Args:
+        ai_model: Initialisiertes AI-Modell.
+        requests: Texte der Mails.
+
+    Returns:
+        tuple[list[dict], np.ndarray]: Vorhersagen und Latenzen in Sekunden.
+    """
+    predictions, latencies = [], []
+    for request in requests:
+        start = time.perf_counter()
+        predictions.append(ai_model.zero_shot_classifier(request))
+        latencies.append(time.perf_counter() - start)
+    return predictions, np.array(latencies)
+
+
+def main() -> None:
+    """
+    Führt den Vergleich aus und speichert das Ergebnis als output/local_extraction_benchmark.json.
+    """
+    requests, y_true = load_dataset()
+    summary: dict[str, dict] = {}
+
+    runs = {}
+    for name, local_extraction in [("llm_only", False), ("local", True)]:
+        print(f"Starting inference ({name})...")
+        predictions, latencies = run(model_module.AIModel(local_extraction=local_extraction), requests)
+        runs[name] = predictions
+        summary[name] = {
+            "accuracy": float(np.mean([p["kategorie"] == t for p, t in zip(predictions, y_true)])),
+            "latency_mean_s": float(latencies.mean()),
+            "latency_p95_s": float(np.percentile(latencies, 95)),
+        }
+    summary["local"].update(compare_extractions(runs["llm_only"], runs["local"]))
+
+    # Reine Regex-Extraktion: Laufzeit, Abdeckung und Übereinstimmung mit dem LLM pro Feld
+    start = time.perf_counter()
+    for request in requests:
+        extraction.extract_base_fields(request)
+    summary["regex_us_per_mail"] = (time.perf_counter() - start) / len(requests) * 1e6
+    fields: dict[str, dict] = {}
+    for field, extract in LOCAL_FIELDS.items():
+        found = [(extract(request), llm[field]) for request, llm in zip(requests, runs["llm_only"])]
+        found = [(value, llm_value) for value, llm_value in found if value is not None]
+        fields[field] = {
+            "coverage": len(found) / len(requests),
+            "agreement_with_llm": float(np.mean([_normalize_field(v) == _normalize_field(l) for v, l in found])) if found else 0.0,
+        }
+    summary["fields"] = fields
+
+    print(json.dumps(summary, ensure_ascii=False, indent=4))
+    with open(os.path.join(OUTPUT_DIR, "local_extraction_benchmark.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=4)
+
+
+if __name__ == "__main__":
+    main()
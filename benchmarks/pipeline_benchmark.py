@@ -0,0 +1,171 @@
+"""
+Benchmark: Durchsatz, Latenz und Speicherbedarf der Pipeline ohne Ollama-Server.
+
+Alle Varianten laufen gegen `backends.FakeChatModel` mit fester Latenz pro LLM-Aufruf und
+einer begrenzten Anzahl paralleler Slots (wie OLLAMA_NUM_PARALLEL). Die Mails aus
+data/data.csv (oder synthetische Mails, falls die Datei fehlt) werden `--scale`-fach
+wiederholt; jede Kopie erhält einen eigenen Betreff, damit der Cache nur echte Wiederholungen trifft.
+
+Gemessen werden pro Variante Mails/s, p50/p95/p99 der Latenz pro Mail, Anzahl LLM-Aufrufe
+und der Spitzenwert des Python-Speichers (tracemalloc). Die Kategorien des Fake-Backends sind
+deterministisch, aber zufällig; eine Accuracy wird deshalb nicht ausgewiesen. Die Varianten
+flaky_* lassen `--failure-rate` der LLM-Aufrufe fehlschlagen, ohne bzw. mit Wiederholung.
+
+Aufruf:
+    python benchmarks/pipeline_benchmark.py --scale 5 --latency 0.05 --parallel 4
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import model as model_module
+from backends import create_llm
+from cache import ResultCache
+from ingest import format_request, read_rows
+from profiling import Profiler
+from resilience import Resilience, RetryPolicy
+from rules import RuleClassifier
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_INPUT = os.path.join(BASE_DIR, "data", "data.csv")
+OUTPUT_DIR = os.path.join(BASE_DIR, "output")
+
+SYNTHETIC_MAILS = [
+    ("Ratenzahlung", "Sehr geehrte Damen und Herren, ich kann die Rechnung über 450,00 EUR nicht auf einmal "
+     "bezahlen und bitte um einen Ratenplan mit 6 Raten. Mit freundlichen Grüßen {name}", "nan"),
+    ("Ratenplan zurück", "Anbei der unterschriebene Ratenplan. Viele Grüße {name}", "ratenplan_unterschrieben.pdf"),
+    ("Bescheid Krankenkasse", "Hallo, anbei der Leistungsbescheid meiner Versicherung zur Rechnung vom 03.02.2024. "
+     "Gruß {name}", "leistungsbescheid.pdf"),
+    ("Passwort vergessen", "Ich komme nicht mehr ins Onlineportal, bitte senden Sie mir das Passwort erneut zu. "
+     "{name}, geb. 12.05.1980", "nan"),
+    ("Rechnungskopie", "Guten Tag, ich habe die Rechnung verlegt und bitte um eine Kopie per Post an "
+     "Musterstraße 12, 12345 Musterstadt. {name}", "nan"),
+    ("Zahlungsaufschub", "Ich bitte um Aufschub der Zahlung über 89,90 € bis zum 15.03.2024. Danke, {name}", "nan"),
+    ("Überweisung", "Ich habe den Betrag von 120,00 EUR heute überwiesen. Mit freundlichen Grüßen {name}", "nan"),
+    ("Frage", "Ist die Praxis zwischen den Feiertagen geöffnet? Gruß {name}", "nan"),
+]
+NAMES = ["Max Mustermann", "Erika Musterfrau", "Hans Meier", "Anna Schmidt"]
+
+
+def load_requests(input_path: str, scale: int) -> list[str]:
+    """
+    Lädt die Mails und vervielfacht sie synthetisch.
+
+    Args:
+        input_path: Pfad zur Eingabedatei; fehlt sie, werden synthetische Mails verwendet.
+        scale: Anzahl Kopien pro Mail.
+
+    Returns:
+        list[str]: Mail-Texte für das Modell.
+    """
+    if os.path.exists(input_path):
+        rows = list(read_rows(input_path))
+    else:
+        print(f"{input_path} nicht gefunden, verwende synthetische Mails.")
+        rows = [{"Betreff": subject, "Text": text.format(name=NAMES[i // len(SYNTHETIC_MAILS)]), "Anlagen": attachments}
+                for i, (subject, text, attachments) in enumerate(SYNTHETIC_MAILS * len(NAMES))]
+    return [format_request({**row, "Betreff": f"{row.get('Betreff') or ''} #{copy}"})
+            for copy in range(scale) for row in rows]
+
+
+def measure(name: str, requests: list[str], build: Callable[[Profiler], model_module.AIModel],
+            max_concurrency: int) -> dict[str, Any]:
+    """
+    Klassifiziert alle Mails mit einer Variante und misst Durchsatz, Latenz und Speicher.
+
+    Args:
+        name: Name der Variante.
+        requests: Mail-Texte.
+        build: Erstellt das AI-Modell; erhält den Profiler als Hook.
+        max_concurrency: Anzahl gleichzeitig bearbeiteter Mails.
+
+    Returns:
+        dict[str, Any]: Kennzahlen der Variante.
+    """
+    profiler = Profiler()
+    ai_model = build(profiler)
+    tracemalloc.start()
+    start = time.perf_counter()
+    predictions = ai_model.classify_batch(requests, max_concurrency=max_concurrency)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    summary = profiler.summary()
+    latency = summary["stages"]["total"]
+    result = {
+        "emails": len(requests),
+        "concurrency": max_concurrency,
+        "emails_per_s": len(requests) / elapsed,
+        "latency_p50_ms": latency["p50"] * 1000,
+        "latency_p95_ms": latency["p95"] * 1000,
+        "latency_p99_ms": latency["p99"] * 1000,
+        "llm_calls": sum(len(t["llm_calls"]) for t in profiler.traces),
+        "errors": sum("error" in p for p in predictions),
+        "peak_memory_mb": peak / 2**20,
+    }
+    if ai_model.cache is not None:
+        result["cache_hit_rate"] = ai_model.cache.stats()["hit_rate"]
+    print(f"{name:<18} {result['emails_per_s']:>8.1f} Mails/s  p50 {result['latency_p50_ms']:>7.1f} ms  "
+          f"p95 {result['latency_p95_ms']:>7.1f} ms  LLM-Aufrufe {result['llm_calls']:>5}  "
+          f"Speicher {result['peak_memory_mb']:>6.1f} MB")
+    return result
+
+
+def main() -> None:
+    """
+    Führt alle Varianten aus und speichert das Ergebnis als output/pipeline_benchmark.json.
+    """
+    parser = argparse.ArgumentParser(description="Offline-Benchmark der Pipeline mit Fake-LLM")
+    parser.add_argument("--input", default=DEFAULT_INPUT, help="Eingabedatei (CSV oder JSONL)")
+    parser.add_argument("--scale", type=int, default=5, help="Anzahl Kopien pro Mail")
+    parser.add_argument("--latency", type=float, default=0.05, help="Latenz pro LLM-Aufruf in Sekunden")
+    parser.add_argument("--parallel", type=int, default=4, help="Parallele Slots des Fake-Backends")
+    parser.add_argument("--concurrency", type=int, default=4, help="Gleichzeitig bearbeitete Mails (schnelle Pfade)")
+    parser.add_argument("--failure-rate", type=float, default=0.1, help="Anteil fehlschlagender LLM-Aufrufe (flaky_*)")
+    args = parser.parse_args()
+
+    requests = load_requests(args.input, args.scale)
+
+    def build(failure_rate: float = 0.0, **kwargs: Any) -> Callable[[Profiler], model_module.AIModel]:
+        return lambda profiler: model_module.AIModel(
+            llm=create_llm("fake", latency_s=args.latency, num_parallel=args.parallel, failure_rate=failure_rate),
+            hooks=[profiler], **kwargs)
+
+    results: dict[str, Any] = {"config": vars(args)}
+    results["serial"] = measure("serial", requests, build(), 1)
+    results["concurrent"] = measure("concurrent", requests, build(), args.concurrency)
+    results["one_pass"] = measure("one_pass", requests, build(mode="one_pass"), args.concurrency)
+    results["rules"] = measure("rules", requests, build(pre_classifiers=[RuleClassifier()]), args.concurrency)
+    results["local_extraction"] = measure("local_extraction", requests, build(local_extraction=True), args.concurrency)
+
+    no_retry = Resilience(RetryPolicy(max_attempts=1))
+    retry = Resilience(RetryPolicy(base_delay_s=args.latency, seed=0))
+    results["flaky_no_retry"] = measure("flaky_no_retry", requests, build(args.failure_rate, resilience=no_retry),
+                                        args.concurrency)
+    results["flaky_retry"] = measure("flaky_retry", requests, build(args.failure_rate, resilience=retry), args.concurrency)
+    results["flaky_no_retry"]["llm"] = no_retry.stats()
+    results["flaky_retry"]["llm"] = retry.stats()
+
+    # Derselbe Cache wird zweimal befüllt bzw. gelesen
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, "cache.sqlite")
+        for name in ("cache_cold", "cache_warm"):
+            cache = ResultCache(cache_path)
+            results[name] = measure(name, requests, build(cache=cache), args.concurrency)
+            cache.close()
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    with open(os.path.join(OUTPUT_DIR, "pipeline_benchmark.json"), "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=4)
+
+
+if __name__ == "__main__":
+    main()
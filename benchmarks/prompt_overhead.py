@@ -0,0 +1,78 @@
+"""
+Micro-Benchmark: Python-Overhead pro Anfrage vor dem eigentlichen LLM-Aufruf.
+
+Vergleicht den früheren Ablauf (Template parsen, Structured-Output-Runnable samt
+JSON-Schema bauen, Kategorien serialisieren) mit den in `AIModel.__init__`
+vorkompilierten Pipelines. Es wird kein Ollama-Server benötigt, da nur der
+Prompt gerendert und kein Modell aufgerufen wird.
+
+Aufruf:
+    python benchmarks/prompt_overhead.py --iterations 2000
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from langchain_core.prompts import ChatPromptTemplate
+
+import model as model_module
+from prompts import CLASS_PROMPT
+
+SAMPLE_REQUEST = ("Betreff: Ratenzahlung \n Text: Sehr geehrte Damen und Herren, ich möchte die Rechnung "
+                  "über 450,00 EUR gerne in 6 Raten zahlen. Mit freundlichen Grüßen Max Mustermann \n Anlagen: nan")
+
+
+def per_request_setup(ai_model: model_module.AIModel) -> None:
+    """
+    Früherer Ablauf: alles wird bei jeder Mail neu aufgebaut.
+
+    Args:
+        ai_model: Initialisiertes AI-Modell.
+
+    Returns:
+        None
+    """
+    prompt = ChatPromptTemplate.from_template(CLASS_PROMPT)
+    ai_model.llm.with_structured_output(ai_model.ClassificationResponse)
+    prompt.format(request=SAMPLE_REQUEST, categories=json.dumps(ai_model.labels, ensure_ascii=False))
+
+
+def precompiled(ai_model: model_module.AIModel) -> None:
+    """
+    Aktueller Ablauf: nur der Prompt der vorkompilierten Pipeline wird gerendert.
+
+    Args:
+        ai_model: Initialisiertes AI-Modell.
+
+    Returns:
+        None
+    """
+    ai_model.chains[ai_model.ClassificationResponse].first.invoke({"request": SAMPLE_REQUEST})
+
+
+def main() -> None:
+    """
+    Führt den Micro-Benchmark aus und gibt die Zeiten pro Anfrage aus.
+    """
+    parser = argparse.ArgumentParser(description="Micro-Benchmark für den Prompt-Overhead pro Anfrage")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    ai_model = model_module.AIModel()
+    results = {}
+    for name, func in [("pro Anfrage aufgebaut", per_request_setup), ("vorkompiliert", precompiled)]:
+        func(ai_model)  # Warm-up
+        best = min(timeit.repeat(lambda: func(ai_model), number=args.iterations, repeat=5))
+        results[name] = best / args.iterations * 1e6
+        print(f"{name:<25} {results[name]:10.1f} µs/Anfrage")
+
+    baseline, optimized = results["pro Anfrage aufgebaut"], results["vorkompiliert"]
+    print(f"{'Ersparnis':<25} {baseline - optimized:10.1f} µs/Anfrage ({baseline / optimized:.1f}x schneller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+from typing import Any, Callable, Optional, Sequence
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import Runnable
+from pydantic import BaseModel, PrivateAttr
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministischer Ersatz für Ollama, um Durchsatz, Nebenläufigkeit und Cache ohne GPU zu messen.
+
+    Liefert zum gebundenen JSON-Schema passende Antworten: Enum-Felder (z.B. die Kategorie) werden
+    anhand eines Hashes des Prompts gewählt, alle übrigen Felder erhalten leere Standardwerte.
+    Optional liefert `responder` eigene Antworten. Latenz und Anzahl paralleler Slots
+    (wie OLLAMA_NUM_PARALLEL) sind konfigurierbar, die Antwort enthält Ollama-ähnliche Metadaten.
+    Mit `failure_rate` und `timeout_s` lassen sich Überlast (ConnectionError) und Timeouts simulieren.
+    """
+
+    model: str = "fake"
+    temperature: Optional[float] = 0
+    latency_s: float = 0.05
+    jitter_s: float = 0.0
+    eval_s_per_token: float = 0.0
+    num_parallel: int = 4
+    seed: int = 0
+    failure_rate: float = 0.0
+    timeout_s: Optional[float] = None
+    responder: Optional[Callable[[str, dict[str, Any]], dict[str, Any]]] = None
+
+    _slots: threading.BoundedSemaphore = PrivateAttr()
+    _random: random.Random = PrivateAttr()
+
+    def model_post_init(self, __context: Any) -> None:
+        self._slots = threading.BoundedSemaphore(self.num_parallel)
+        self._random = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _default_value(self, prompt: str, name: str, spec: dict[str, Any]) -> Any:
+        """
+        Erzeugt einen deterministischen Wert für ein Feld des JSON-Schemas.
+
+        Args:
+            prompt: Prompt-Text (Grundlage für die Wahl bei Enum-Feldern).
+            name: Feldname.
+            spec: JSON-Schema des Feldes.
+
+        Returns:
+            Any: Wert für das Feld.
+        """
+        if "enum" in spec:
+            digest = hashlib.sha256(f"{name}:{prompt}".encode("utf-8")).digest()
+            return spec["enum"][digest[0] % len(spec["enum"])]
+        if "default" in spec:
+            return spec["default"]
+        types = {option.get("type") for option in spec.get("anyOf", [spec])}
+        if "null" in types or "$ref" in json.dumps(spec):
+            return None
+        return {"string": "", "number": 0.0, "integer": 0, "boolean": False}.get(next(iter(types)), None)
+
+    def _generate(self, messages: list[BaseMessage], stop: Optional[list[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        prompt = "\n".join(str(m.content) for m in messages)
+        schema = kwargs.get("format") or {}
+        if self.responder is not None:
+            payload = self.responder(prompt, schema)
+        else:
+            payload = {name: self._default_value(prompt, name, spec) for name, spec in schema.get("properties", {}).items()}
+        content = json.dumps(payload, ensure_ascii=False)
+        prompt_tokens, eval_tokens = len(prompt) // 4, len(content) // 4
+
+        with self._slots:
+            start = time.perf_counter()
+            delay = (max(0.0, self.latency_s + self._random.uniform(-self.jitter_s, self.jitter_s))
+                     + eval_tokens * self.eval_s_per_token)
+            if self.failure_rate and self._random.random() < self.failure_rate:
+                raise ConnectionError(f"Fake-Backend {self.model} überlastet")
+            if self.timeout_s is not None and delay > self.timeout_s:
+                time.sleep(self.timeout_s)
+                raise TimeoutError(f"Fake-Backend {self.model}: keine Antwort nach {self.timeout_s} s")
+            time.sleep(delay)
+            duration_ns = int((time.perf_counter() - start) * 1e9)
+
+        message = AIMessage(
+            content=content,
+            usage_metadata={"input_tokens": prompt_tokens, "output_tokens": eval_tokens,
+                            "total_tokens": prompt_tokens + eval_tokens},
+            response_metadata={"model": self.model, "total_duration": duration_ns, "load_duration": 0,
+                               "prompt_eval_count": prompt_tokens, "prompt_eval_duration": 0,
+                               "eval_count": eval_tokens, "eval_duration": duration_ns},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def with_structured_output(self, schema: type[BaseModel], **kwargs: Any) -> Runnable:
+        """
+        Bindet das JSON-Schema wie ChatOllama (method="json_schema") und parst die Antwort.
+
+        Args:
+            schema: Pydantic-Modell der Ausgabe.
+
+        Returns:
+            Runnable: Chat-Modell mit gebundenem Schema und Output-Parser.
+        """
+        return self.bind(format=schema.model_json_schema()) | PydanticOutputParser(pydantic_object=schema)
+
+
+def create_ollama(model: str = "llama3", temperature: float = 0, timeout_s: Optional[float] = 120.0,
+                  **kwargs: Any) -> BaseChatModel:
+    """
+    Erstellt das Chat-Modell für einen Ollama-Server (OLLAMA_HOST, Standard: localhost).
+
+    Args:
+        model: Name des Ollama-Modells.
+        temperature: Temperatur.
+        timeout_s: Timeout pro HTTP-Anfrage in Sekunden (inkl. Laden des Modells) oder None für unbegrenzt.
+        **kwargs: Weitere Argumente für ChatOllama.
+
+    Returns:
+        BaseChatModel: ChatOllama-Instanz.
+    """
+    from langchain_ollama import ChatOllama
+
+    # Ollama Host: Lokal oder Docker
+    base_url = kwargs.pop("base_url", os.environ.get("OLLAMA_HOST", "http://localhost:11434"))
+    client_kwargs = {"timeout": timeout_s, **kwargs.pop("client_kwargs", {})}
+    return ChatOllama(model=model, temperature=temperature, base_url=base_url, client_kwargs=client_kwargs, **kwargs)
+
+
+BACKENDS: dict[str, Callable[..., BaseChatModel]] = {
+    "ollama": create_ollama,
+    "fake": FakeChatModel,
+}
+
+
+def create_llm(backend: Optional[str] = None, **kwargs: Any) -> BaseChatModel:
+    """
+    Erstellt das Chat-Modell für ein Backend.
+
+    Args:
+        backend: Name des Backends ("ollama" oder "fake"); Standard ist LLM_BACKEND bzw. "ollama".
+        **kwargs: Argumente für das Backend (z.B. model, temperature, latency_s).
+
+    Returns:
+        BaseChatModel: Chat-Modell mit `with_structured_output`.
+    """
+    backend = backend or os.environ.get("LLM_BACKEND", "ollama")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unbekanntes LLM-Backend: {backend} (verfügbar: {', '.join(BACKENDS)})")
+    return BACKENDS[backend](**kwargs)
+
+
+def parse_stage_models(values: Sequence[str]) -> dict[str, str]:
+    """
+    Liest Modellzuordnungen der Form "STUFE=MODELL" (z.B. von der Kommandozeile).
+
+    Args:
+        values: Zuordnungen, z.B. ["rechnungskopie=llama3.2:1b"].
+
+    Returns:
+        dict[str, str]: Modellname pro Stufe.
+    """
+    stage_models: dict[str, str] = {}
+    for value in values:
+        stage, sep, model = value.partition("=")
+        if not sep or not stage.strip() or not model.strip():
+            raise ValueError(f"Ungültige Modellzuordnung: {value!r} (erwartet STUFE=MODELL)")
+        stage_models[stage.strip()] = model.strip()
+    return stage_models
+
+
+def create_routing_llms(stage_models: Optional[dict[str, str]] = None, cascade_model: Optional[str] = None,
+                        cascade_temperature: float = 0.7, backend: Optional[str] = None, **kwargs: Any) -> dict[str, Any]:
+    """
+    Erstellt die Chat-Modelle für das Routing auf mehrere Modelle (`AIModel(stage_llms=..., cascade_llm=...)`).
+
+    Args:
+        stage_models: Modellname pro Stufe (Temperatur 0).
+        cascade_model: Kleines Modell für den Kaskadenmodus oder None.
+        cascade_temperature: Temperatur des kleinen Modells; > 0, damit die Antworten streuen können.
+        backend: Name des Backends; Standard ist LLM_BACKEND bzw. "ollama".
+        **kwargs: Weitere Argumente für alle Modelle (z.B. timeout_s).
+
+    Returns:
+        dict[str, Any]: Argumente `stage_llms` und `cascade_llm` für `AIModel`.
+    """
+    return {
+        "stage_llms": {stage: create_llm(backend, model=model, temperature=0, **kwargs) for stage, model in (stage_models or {}).items()},
+        "cascade_llm": create_llm(backend, model=cascade_model, temperature=cascade_temperature, **kwargs) if cascade_model else None,
+    }
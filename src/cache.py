@@ -0,0 +1,135 @@
+from typing import Any, Optional
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+class ResultCache:
+    """
+    Persistenter, inhaltsadressierter Cache für LLM-Ergebnisse (SQLite).
+
+    Der Schlüssel ist ein Hash aus normalisiertem Mailtext, Prompt-Template, Schema,
+    Modellname und Temperatur. Ändert sich ein Prompt, werden dadurch nur die
+    Einträge dieses Prompts ungültig. Bei Überschreiten von `max_entries` werden
+    die am längsten nicht genutzten Einträge entfernt (LRU).
+    """
+
+    def __init__(self, path: str, max_entries: int = 100_000) -> None:
+        """
+        Öffnet bzw. erstellt den Cache.
+
+        Args:
+            path: Pfad zur SQLite-Datei (":memory:" für einen flüchtigen Cache).
+            max_entries: Maximale Anzahl an Einträgen vor der LRU-Verdrängung.
+
+        Returns:
+            None
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries (last_access)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    @staticmethod
+    def make_key(text: str, prompt: str, schema: str, model: str, temperature: Optional[float]) -> str:
+        """
+        Erzeugt den Cache-Schlüssel für eine Anfrage.
+
+        Args:
+            text: Text der Mail (wird whitespace-normalisiert).
+            prompt: Prompt-Template.
+            schema: Beschreibung des Ausgabe-Schemas (z.B. JSON-Schema).
+            model: Name des Modells.
+            temperature: Temperatur des Modells.
+
+        Returns:
+            str: SHA-256-Hash als Hex-String.
+        """
+        payload = json.dumps(
+            {"text": " ".join(text.split()), "prompt": prompt, "schema": schema, "model": model, "temperature": temperature},
+            ensure_ascii=False, sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[dict[str, Any]]:
+        """
+        Liest einen Eintrag und aktualisiert dessen Zugriffszeit.
+
+        Args:
+            key: Cache-Schlüssel.
+
+        Returns:
+            Optional[dict[str, Any]]: Gespeichertes Ergebnis oder None.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def set(self, key: str, value: dict[str, Any]) -> None:
+        """
+        Speichert ein Ergebnis und verdrängt bei Bedarf alte Einträge.
+
+        Args:
+            key: Cache-Schlüssel.
+            value: JSON-serialisierbares Ergebnis.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            exists = self._conn.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone() is not None
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, last_access) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), time.time()),
+            )
+            if not exists:
+                self._size += 1
+            if self._size > self.max_entries:
+                overflow = self._size - self.max_entries
+                self._conn.execute(
+                    "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY last_access ASC LIMIT ?)",
+                    (overflow,),
+                )
+                self.evictions += overflow
+                self._size = self.max_entries
+            self._conn.commit()
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Liefert Trefferstatistiken des Caches.
+
+        Returns:
+            dict[str, Any]: Treffer, Fehlzugriffe, Trefferquote, Verdrängungen und Größe.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0,
+                    "evictions": self.evictions, "entries": self._size}
+
+    def close(self) -> None:
+        """
+        Schließt die Datenbankverbindung.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._conn.close()
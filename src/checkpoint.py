@@ -0,0 +1,111 @@
+from typing import Any, Optional
+import hashlib
+import json
+import os
+
+from ingest import read_jsonl_rows, repair_jsonl_tail
+
+# Spalten, die bereits einen stabilen Zeilen-Identifikator enthalten
+ID_COLUMNS = ("id", "ID", "Id", "message_id", "Message-ID")
+
+
+def row_id(row: dict[str, Any], index: int) -> str:
+    """
+    Liefert einen stabilen Identifikator für eine Eingabezeile.
+
+    Vorhandene ID-Spalten werden übernommen, ansonsten wird ein Hash über Zeilennummer, Betreff, Text
+    und Anlagen gebildet. Inhaltlich identische Mails in verschiedenen Zeilen erhalten damit
+    unterschiedliche Identifikatoren und jeweils eine eigene Vorhersage.
+
+    Args:
+        row: Eingabezeile.
+        index: Nummer der Zeile in der Eingabedatei (ab 0).
+
+    Returns:
+        str: Identifikator der Zeile.
+    """
+    for column in ID_COLUMNS:
+        if row.get(column) not in (None, ""):
+            return str(row[column])
+    content = json.dumps([index, row.get("Betreff"), row.get("Text"), row.get("Anlagen")], ensure_ascii=False)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+
+class RunManifest:
+    """
+    Checkpoint eines Batch-Laufs auf Basis der JSONL-Ausgabe.
+
+    Jede geschriebene Vorhersage enthält die "row_id". Beim Fortsetzen wird die Ausgabe eingelesen;
+    bei mehreren Zeilen für dieselbe ID (z.B. nach erneuter Verarbeitung fehlgeschlagener Zeilen)
+    gilt die zuletzt geschriebene. Im Speicher werden nur Kategorie, Quelle und Fehlerstatus gehalten.
+    """
+
+    def __init__(self, path: str, resume: bool = True) -> None:
+        """
+        Lädt den Checkpoint.
+
+        Args:
+            path: Pfad zur JSONL-Ausgabe des Laufs.
+            resume: Bestehende Ergebnisse übernehmen. Bei False beginnt der Lauf leer.
+
+        Returns:
+            None
+        """
+        self.path = path
+        self.entries: dict[str, dict[str, Any]] = {}
+        if resume and os.path.exists(path):
+            # Ein beim Absturz abgeschnittener letzter Datensatz wird verworfen und neu klassifiziert
+            if repair_jsonl_tail(path):
+                print(f"Abgeschnittener letzter Datensatz in {path} verworfen")
+            for record in read_jsonl_rows(path):
+                if "row_id" in record:
+                    self.record(record["row_id"], record)
+
+    def record(self, rid: str, prediction: dict[str, Any]) -> None:
+        """
+        Vermerkt eine Vorhersage im Checkpoint.
+
+        Args:
+            rid: Identifikator der Zeile.
+            prediction: Vorhersage von `AIModel.zero_shot_classifier`.
+
+        Returns:
+            None
+        """
+        self.entries[rid] = {"kategorie": prediction["kategorie"], "quelle": prediction.get("quelle", "llm"),
+                             "failed": "error" in prediction}
+
+    def get(self, rid: str) -> Optional[dict[str, Any]]:
+        """
+        Liefert den Checkpoint-Eintrag einer Zeile.
+
+        Args:
+            rid: Identifikator der Zeile.
+
+        Returns:
+            Optional[dict[str, Any]]: Kategorie, Quelle und Fehlerstatus oder None, falls noch nicht verarbeitet.
+        """
+        return self.entries.get(rid)
+
+    def needs_processing(self, rid: str, retry_failed: bool = False) -> bool:
+        """
+        Prüft, ob eine Zeile (erneut) klassifiziert werden muss.
+
+        Args:
+            rid: Identifikator der Zeile.
+            retry_failed: Zeilen, bei denen die Klassifikation mit "error" endete, erneut verarbeiten.
+
+        Returns:
+            bool: True, falls die Zeile verarbeitet werden muss.
+        """
+        entry = self.entries.get(rid)
+        return entry is None or (retry_failed and entry["failed"])
+
+    def stats(self) -> dict[str, int]:
+        """
+        Liefert die Anzahl verarbeiteter und fehlgeschlagener Zeilen.
+
+        Returns:
+            dict[str, int]: Verarbeitete und fehlgeschlagene Zeilen.
+        """
+        return {"done": len(self.entries), "failed": sum(entry["failed"] for entry in self.entries.values())}
@@ -1,220 +1,583 @@
 import model as model_module
-import pandas as pd
-import numpy as np
-from numpy.typing import NDArray
-from sklearn.metrics import confusion_matrix, classification_report, accuracy_score
+from cache import ResultCache
+from rules import RuleClassifier
+from ingest import PredictionWriter, format_request, read_rows
+from checkpoint import RunManifest, row_id
+from profiling import Profiler, percentile
+from reporting import accuracy, write_report
+from backends import create_llm, create_routing_llms, parse_stage_models
+from resilience import Resilience, RetryPolicy
+from itertools import tee
 import time
 from tqdm import tqdm
 import json
-import matplotlib.pyplot as plt
-import seaborn as sns
 import os
-import textwrap
-from numpy import ndarray
+import argparse
+from typing import Any, Optional, Sequence
 
 # Pfade für die neue Verzeichnisstruktur
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 OUTPUT_DIR = os.path.join(BASE_DIR, "output")
+DEFAULT_INPUT = os.path.join(DATA_DIR, "data.csv")
 
-# Mapping für kürzere, lesbare Labels
-LABEL_MAPPING: dict[str, str] = {
-    "Ratenplan anfordern": "Ratenplan anfordern",
-    "Ratenplan unterschrieben zurücksenden": "Ratenplan zurücksenden",
-    "Patient übermittelt Leistungsbescheid": "Leistungsbescheid",
-    "Patient fragt erneute Zusendung des Passworts fürs Onlineportal an": "Passwort anfordern",
-    "Patient braucht eine Rechnungskopie": "Rechnungskopie",
-    "Patient möchte später zahlen": "Später zahlen",
-    "Patient teilt mit, dass er überwiesen hat": "Zahlung mitgeteilt",
-    "Sonstiges": "Sonstiges"
-}
+def load_dataset(input_path: str = DEFAULT_INPUT) -> tuple[list[str], list[str]]:
+    """
+    Lädt den Datensatz vollständig und baut die Mail-Texte für das Modell.
+
+    Args:
+        input_path: Pfad zur Eingabedatei (CSV oder JSONL).
+
+    Returns:
+        tuple[list[str], list[str]]: Mail-Texte und tatsächliche Klassen.
+    """
+    rows = list(read_rows(input_path))
+    return [format_request(row) for row in rows], [row["Anliegen"] for row in rows]
 
-def shorten_label(label: str) -> str:
+def _normalize_field(value: Any) -> str:
     """
-    Kürzt ein Label auf eine lesbare Form.
+    Normalisiert einen extrahierten Wert für den Vergleich (leer, 0 und None sind gleichwertig).
 
     Args:
-        label: Label, der kürzer werden soll.
+        value: Extrahierter Wert.
 
     Returns:
-        Gekürztes Label.
+        str: Normalisierter Wert.
     """
-    return LABEL_MAPPING.get(label, label)
+    if value is None or value == "" or value == 0:
+        return ""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f"{float(value):g}"
+    return str(value).strip().lower()
 
-def plot_confusion_matrix(cm: ndarray, labels: list[str], output_path: str = "confusion_matrix.png") -> None:
+def compare_extractions(reference: list[dict[str, Any]], candidate: list[dict[str, Any]]) -> dict[str, float]:
     """
-    Erstellt eine visuelle Heatmap der Confusion Matrix.
+    Vergleicht die extrahierten Felder zweier Läufe feldweise.
+
+    Details werden nur bei Mails verglichen, die in beiden Läufen dieselbe Kategorie erhalten haben.
 
     Args:
-        cm: Confusion Matrix.
-        labels: Liste der Klassen.
-        output_path: Pfad zur Speicherung des Diagramms.
+        reference: Vorhersagen des Referenzlaufs.
+        candidate: Vorhersagen des zu vergleichenden Laufs.
 
     Returns:
-        None
+        dict[str, float]: Übereinstimmung der Basisfelder und Details sowie Füllgrad der Details.
     """
-    plt.figure(figsize=(14, 12))
-    
-    # Verwende das Label-Mapping für kürzere Labels
-    short_labels = [shorten_label(l) for l in labels]
-    
-    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', 
-                xticklabels=short_labels, yticklabels=short_labels,
-                cbar_kws={'label': 'Anzahl'})
-    
-    plt.xlabel('Vorhergesagt', fontsize=12)
-    plt.ylabel('Tatsächlich', fontsize=12)
-    plt.title('Confusion Matrix - Klassifikation der Anfragen', fontsize=14, fontweight='bold')
-    plt.xticks(rotation=45, ha='right', fontsize=10)
-    plt.yticks(rotation=0, fontsize=10)
-    plt.tight_layout()
-    plt.savefig(output_path, dpi=150, bbox_inches='tight')
-    plt.close()
-    print(f"Confusion Matrix gespeichert: {output_path}")
+    base_fields = ["vorname", "nachname", "rechnungsbetrag", "geburtsdatum", "anschrift"]
+    base_matches = sum(_normalize_field(ref.get(f)) == _normalize_field(cand.get(f))
+                       for ref, cand in zip(reference, candidate) for f in base_fields)
+    detail_total = detail_matches = detail_filled = 0
+    for ref, cand in zip(reference, candidate):
+        if ref["kategorie"] != cand["kategorie"] or not ref.get("details"):
+            continue
+        cand_details = cand.get("details") or {}
+        for field, value in ref["details"].items():
+            detail_total += 1
+            detail_matches += _normalize_field(value) == _normalize_field(cand_details.get(field))
+            detail_filled += _normalize_field(cand_details.get(field)) != ""
+    return {
+        "base_field_agreement": base_matches / (len(base_fields) * len(reference)) if reference else 0.0,
+        "detail_field_agreement": detail_matches / detail_total if detail_total else 0.0,
+        "detail_fill_rate": detail_filled / detail_total if detail_total else 0.0,
+    }
+
+def compare_modes() -> None:
+    """
+    Vergleicht One-Pass- und Two-Pass-Modus hinsichtlich Accuracy, Extraktionsqualität und Latenz.
+
+    Die Mails werden sequenziell und ohne Cache verarbeitet, damit die gemessenen Latenzen
+    einzelnen Anfragen entsprechen. Als Referenz für die Extraktionsqualität dient der Two-Pass-Lauf.
+    Das Ergebnis wird zusätzlich als output/mode_comparison.json gespeichert.
+    """
+    import pandas as pd
+
+    print("Loading data...")
+    requests, y_true = load_dataset()
+    runs: dict[str, dict[str, Any]] = {}
+
+    for mode in ["two_pass", "one_pass"]:
+        ai_model = model_module.AIModel(mode=mode)
+        predictions, latencies = [], []
+        print(f"Starting inference ({mode})...")
+        for request in tqdm(requests):
+            start = time.perf_counter()
+            predictions.append(ai_model.zero_shot_classifier(request))
+            latencies.append(time.perf_counter() - start)
+        runs[mode] = {"predictions": predictions, "latencies": sorted(latencies)}
+
+    summary = {}
+    for mode, run in runs.items():
+        y_pred = [p["kategorie"] for p in run["predictions"]]
+        latencies = run["latencies"]
+        summary[mode] = {
+            "accuracy": accuracy(y_true, y_pred),
+            "latency_mean_s": sum(latencies) / len(latencies),
+            "latency_p50_s": percentile(latencies, 50),
+            "latency_p95_s": percentile(latencies, 95),
+            "errors": sum("error" in p for p in run["predictions"]),
+            **compare_extractions(runs["two_pass"]["predictions"], run["predictions"]),
+        }
+
+    print(f"\n{'='*50}")
+    print(pd.DataFrame(summary).T.to_string(float_format=lambda v: f"{v:.3f}"))
+    print(f"{'='*50}")
+    with open(os.path.join(OUTPUT_DIR, "mode_comparison.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=4)
+
+def compare_prompts(max_input_tokens: int = 512) -> None:
+    """
+    Vergleicht Original-Prompts mit kompakten Prompts und Vorverarbeitung der Mails.
 
-def plot_class_distribution(y_true: list[str], y_pred: list[str], output_path: str = "class_distribution.png") -> None:
+    Gemessen werden Prompt-Tokens (laut Backend), Prompt-Eval-Zeit, Latenz und Accuracy,
+    jeweils als Differenz zum Original. Die Mails werden sequenziell und ohne Cache verarbeitet.
+    Das Ergebnis wird als output/prompt_comparison.json gespeichert.
+
+    Args:
+        max_input_tokens: Token-Budget für den Mailtext bei Vorverarbeitung.
+    """
+    import pandas as pd
+
+    print("Loading data...")
+    requests, y_true = load_dataset()
+    variants = {
+        "original": {},
+        "preprocess": {"preprocess": True, "max_input_tokens": max_input_tokens},
+        "compact": {"compact_prompts": True},
+        "compact_preprocess": {"compact_prompts": True, "preprocess": True, "max_input_tokens": max_input_tokens},
+    }
+
+    summary: dict[str, dict[str, Any]] = {}
+    for name, kwargs in variants.items():
+        profiler = Profiler()
+        ai_model = model_module.AIModel(hooks=[profiler], **kwargs)
+        print(f"Starting inference ({name})...")
+        y_pred = [ai_model.zero_shot_classifier(request)["kategorie"] for request in tqdm(requests)]
+        calls = [call for trace in profiler.traces for call in trace["llm_calls"]]
+        latencies = sorted(trace["total_s"] for trace in profiler.traces)
+        summary[name] = {
+            "accuracy": accuracy(y_true, y_pred),
+            "prompt_tokens": sum(call["prompt_tokens"] or 0 for call in calls),
+            "prompt_eval_s": sum(call.get("prompt_eval_s", 0.0) for call in calls),
+            "latency_mean_s": sum(latencies) / len(latencies),
+            "latency_p95_s": percentile(latencies, 95),
+        }
+    baseline = summary["original"]
+    for stats in summary.values():
+        stats["accuracy_delta"] = stats["accuracy"] - baseline["accuracy"]
+        stats["prompt_tokens_saved"] = 1 - stats["prompt_tokens"] / baseline["prompt_tokens"] if baseline["prompt_tokens"] else 0.0
+
+    print(f"\n{'='*50}")
+    print(pd.DataFrame(summary).T.to_string(float_format=lambda v: f"{v:.3f}"))
+    print(f"{'='*50}")
+    with open(os.path.join(OUTPUT_DIR, "prompt_comparison.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=4)
+
+def compare_cascade(cascade_model: str = "llama3.2:1b", cascade_samples: int = 3, cascade_threshold: float = 1.0,
+                    stage_models: Optional[dict[str, str]] = None) -> None:
     """
-    Zeigt die Verteilung der tatsächlichen vs. vorhergesagten Klassen.
+    Vergleicht llama3 für alle Stufen mit dem Routing auf ein kleines Modell.
+
+    Im Kaskadenmodus beantwortet zuerst das kleine Modell die Klassifikation mehrfach; llama3 wird nur
+    bei uneinigen Antworten gefragt (Eskalationsrate). Optional nutzen einzelne Stufen der
+    Detailextraktion (`stage_models`) ebenfalls kleinere Modelle. Gemessen werden Accuracy, Latenz
+    sowie LLM-Aufrufe und Prompt-Tokens pro Modell. Die Mails werden sequenziell und ohne Cache
+    verarbeitet; das Ergebnis wird als output/cascade_comparison.json gespeichert.
 
     Args:
+        cascade_model: Kleines Modell für den Kaskadenmodus.
+        cascade_samples: Anzahl Antworten des kleinen Modells pro Mail.
+        cascade_threshold: Mindestanteil übereinstimmender Antworten des kleinen Modells.
+        stage_models: Optionales Modell pro Stufe für die Variante "cascade_stages".
+    """
+    import pandas as pd
+
+    print("Loading data...")
+    requests, y_true = load_dataset()
+    variants = {
+        "llama3": {},
+        "cascade": create_routing_llms(cascade_model=cascade_model),
+    }
+    if stage_models:
+        variants["cascade_stages"] = create_routing_llms(stage_models, cascade_model)
+
+    summary: dict[str, dict[str, Any]] = {}
+    for name, kwargs in variants.items():
+        profiler = Profiler()
+        ai_model = model_module.AIModel(hooks=[profiler], cascade_samples=cascade_samples,
+                                        cascade_threshold=cascade_threshold, **kwargs)
+        print(f"Starting inference ({name})...")
+        y_pred = [ai_model.zero_shot_classifier(request)["kategorie"] for request in tqdm(requests)]
+        latencies = sorted(trace["total_s"] for trace in profiler.traces)
+        per_model: dict[str, dict[str, int]] = {}
+        for trace in profiler.traces:
+            for call in trace["llm_calls"]:
+                stats = per_model.setdefault(call["model"], {"calls": 0, "prompt_tokens": 0})
+                stats["calls"] += 1
+                stats["prompt_tokens"] += call["prompt_tokens"] or 0
+        # Eskaliert: die Klassifikation wurde (zusätzlich) vom großen Modell beantwortet
+        escalated = sum(any(call["stage"] == "classification" for call in trace["llm_calls"]) for trace in profiler.traces)
+        summary[name] = {
+            "accuracy": accuracy(y_true, y_pred),
+            "latency_mean_s": sum(latencies) / len(latencies),
+            "latency_p95_s": percentile(latencies, 95),
+            "llm_calls": sum(stats["calls"] for stats in per_model.values()),
+            "escalation_rate": escalated / len(requests) if kwargs.get("cascade_llm") else 1.0,
+            "models": per_model,
+        }
+    baseline = summary["llama3"]
+    for stats in summary.values():
+        stats["accuracy_delta"] = stats["accuracy"] - baseline["accuracy"]
+        stats["latency_speedup"] = baseline["latency_mean_s"] / stats["latency_mean_s"] if stats["latency_mean_s"] else 0.0
+
+    print(f"\n{'='*50}")
+    print(pd.DataFrame({name: {k: v for k, v in stats.items() if k != "models"} for name, stats in summary.items()}).T
+          .to_string(float_format=lambda v: f"{v:.3f}"))
+    for name, stats in summary.items():
+        models = ", ".join(f"{model}: {m['calls']} Aufrufe, {m['prompt_tokens']} Prompt-Tokens" for model, m in stats["models"].items())
+        print(f"{name}: {models}")
+    print(f"{'='*50}")
+    with open(os.path.join(OUTPUT_DIR, "cascade_comparison.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=4)
+
+def report_routing(predictions: list[dict[str, Any]], y_true: list[str], mode: str = "two_pass") -> dict[str, Any]:
+    """
+    Wertet aus, welcher Pfad (LLM oder Vorklassifikator) die Mails klassifiziert hat.
+
+    Args:
+        predictions: Vorhersagen mit dem Feld "quelle".
         y_true: Liste der tatsächlichen Klassen.
-        y_pred: Liste der vorhergesagten Klassen.
-        output_path: Pfad zur Speicherung des Diagramms.
+        mode: Modus des Laufs. Im One-Pass-Modus kostet ein Schnellpfad bei Kategorien mit Details
+            einen separaten Extraktionsaufruf.
 
     Returns:
-        None
+        dict[str, Any]: Abdeckung, Accuracy und Anzahl Mails pro Quelle sowie eingesparte LLM-Aufrufe.
     """
-    fig, axes = plt.subplots(1, 2, figsize=(16, 7))
-    
-    # Tatsächliche Verteilung
-    true_counts = pd.Series(y_true).value_counts()
-    true_counts.index = [shorten_label(l) for l in true_counts.index]
-    axes[0].barh(true_counts.index, true_counts.values, color='steelblue')
-    axes[0].set_title('Tatsächliche Verteilung', fontweight='bold')
-    axes[0].set_xlabel('Anzahl')
-    axes[0].invert_yaxis()
-    
-    # Vorhergesagte Verteilung
-    pred_counts = pd.Series(y_pred).value_counts()
-    pred_counts.index = [shorten_label(l) for l in pred_counts.index]
-    axes[1].barh(pred_counts.index, pred_counts.values, color='coral')
-    axes[1].set_title('Vorhergesagte Verteilung', fontweight='bold')
-    axes[1].set_xlabel('Anzahl')
-    axes[1].invert_yaxis()
-    
-    plt.tight_layout()
-    plt.savefig(output_path, dpi=150, bbox_inches='tight')
-    plt.close()
-    print(f"Klassenverteilung gespeichert: {output_path}")
+    routing: dict[str, Any] = {}
+    for source in sorted({p.get("quelle", "llm") for p in predictions}):
+        idx = [i for i, p in enumerate(predictions) if p.get("quelle", "llm") == source]
+        routing[source] = {
+            "count": len(idx),
+            "coverage": len(idx) / len(predictions),
+            "accuracy": accuracy([y_true[i] for i in idx], [predictions[i]["kategorie"] for i in idx]),
+        }
+    fast = [p for p in predictions if p.get("quelle", "llm") != "llm"]
+    extra_calls = sum(p["kategorie"] in model_module.AIModel.DETAIL_FIELDS for p in fast) if mode == "one_pass" else 0
+    routing["llm_calls_saved"] = len(fast) - extra_calls
+
+    print("\n--- Routing ---")
+    for source, stats in routing.items():
+        if source != "llm_calls_saved":
+            print(f"{source:<10} {stats['count']:>6} Mails  Abdeckung {stats['coverage']:.1%}  Accuracy {stats['accuracy']:.2%}")
+    print(f"Eingesparte LLM-Aufrufe: {routing['llm_calls_saved']}")
+    return routing
 
-def plot_metrics_per_class(report_dict: dict[str, dict[str, float]], output_path: str = "metrics_per_class.png") -> None:
+def evaluate_rules(thresholds: Sequence[float] = (0.6, 0.7, 0.8, 0.9, 1.0)) -> None:
     """
-    Zeigt Precision, Recall, F1 pro Klasse als Balkendiagramm.
+    Wertet den Regel-Vorklassifikator ohne LLM für verschiedene Konfidenzschwellen aus.
 
     Args:
-        report_dict: Dictionary mit Metriken pro Klasse.
-        output_path: Pfad zur Speicherung des Diagramms.
+        thresholds: Zu prüfende Konfidenzschwellen.
+    """
+    requests, y_true = load_dataset()
+    print(f"{'Schwelle':>8}  {'Abdeckung':>9}  {'Accuracy':>8}  {'Mails':>6}")
+    for threshold in thresholds:
+        classifier = RuleClassifier(threshold=threshold)
+        hits = [(label, classifier.predict(request)) for request, label in zip(requests, y_true)]
+        hits = [(label, prediction[0]) for label, prediction in hits if prediction is not None]
+        acc = accuracy(*zip(*hits)) if hits else 0.0
+        print(f"{threshold:>8.2f}  {len(hits) / len(requests):>9.1%}  {acc:>8.2%}  {len(hits):>6}")
 
-    Returns:
-        None
+def compare_knn(folds: int = 5, threshold: float = 0.8, max_concurrency: int = 4,
+                thresholds: Sequence[float] = (0.6, 0.7, 0.8, 0.9, 1.0)) -> None:
     """
-    # Filter nur Klassen (keine 'accuracy', 'macro avg', etc.)
-    classes = [k for k in report_dict.keys() if k not in ['accuracy', 'macro avg', 'weighted avg']]
-    
-    precision = [report_dict[c]['precision'] for c in classes]
-    recall = [report_dict[c]['recall'] for c in classes]
-    f1 = [report_dict[c]['f1-score'] for c in classes]
-    
-    # Verwende das Label-Mapping für kürzere Labels
-    short_classes = [shorten_label(c) for c in classes]
-    
-    x = np.arange(len(classes))
-    width = 0.25
-    
-    fig, ax = plt.subplots(figsize=(16, 7))
-    ax.bar(x - width, precision, width, label='Precision', color='#2ecc71')
-    ax.bar(x, recall, width, label='Recall', color='#3498db')
-    ax.bar(x + width, f1, width, label='F1-Score', color='#9b59b6')
-    
-    ax.set_ylabel('Score')
-    ax.set_title('Metriken pro Klasse', fontweight='bold')
-    ax.set_xticks(x)
-    ax.set_xticklabels(short_classes, rotation=30, ha='right', fontsize=10)
-    ax.legend()
-    ax.set_ylim(0, 1.1)
-    ax.axhline(y=0.8, color='gray', linestyle='--', alpha=0.5, label='80% Threshold')
-    
-    plt.tight_layout()
-    plt.savefig(output_path, dpi=150, bbox_inches='tight')
-    plt.close()
-    print(f"Metriken pro Klasse gespeichert: {output_path}")
+    Vergleicht kNN allein, LLM allein und die hybride Weiterleitung (kNN vor dem LLM).
+
+    kNN und Hybrid werden per stratifizierter Kreuzvalidierung ausgewertet: Der Index wird jeweils
+    nur aus den Trainings-Folds gebaut. Alle Läufe erfolgen ohne Cache. Zusätzlich werden Abdeckung
+    und Accuracy des kNN für mehrere Konfidenzschwellen ausgegeben. Das Ergebnis wird als
+    output/knn_comparison.json gespeichert.
 
-def evaluate() -> None:
+    Args:
+        folds: Anzahl der Folds (höchstens die Größe der kleinsten Kategorie).
+        threshold: Konfidenzschwelle des kNN im Hybrid-Lauf.
+        max_concurrency: Maximale Anzahl gleichzeitig laufender Anfragen an den Ollama-Server.
+        thresholds: Zu prüfende Konfidenzschwellen für die kNN-Abdeckung.
+    """
+    import numpy as np
+    import pandas as pd
+    from sklearn.model_selection import StratifiedKFold
+    from knn import KNNClassifier
+
+    print("Loading data...")
+    requests, y_true = load_dataset()
+    labels = np.array(y_true)
+    n_splits = max(2, min(folds, min(np.unique(labels, return_counts=True)[1])))
+    splits = list(StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=0).split(requests, labels))
+
+    print("Starting inference (llm_only)...")
+    start = time.perf_counter()
+    llm_pred = [p["kategorie"] for p in model_module.AIModel().classify_batch(requests, max_concurrency=max_concurrency)]
+    llm_seconds = time.perf_counter() - start
+
+    votes: list[Optional[tuple[str, float, float]]] = [None] * len(requests)
+    hybrid: list[Optional[dict[str, Any]]] = [None] * len(requests)
+    knn_seconds = hybrid_seconds = 0.0
+    print(f"Starting inference (knn/hybrid, {n_splits} Folds)...")
+    for train, test in tqdm(splits):
+        knn = KNNClassifier(threshold=threshold).fit([requests[i] for i in train], labels[train].tolist())
+        test_requests = [requests[i] for i in test]
+        start = time.perf_counter()
+        for i, vote in zip(test, knn.vote_batch(test_requests)):
+            votes[i] = vote
+        knn_seconds += time.perf_counter() - start
+        start = time.perf_counter()
+        results = model_module.AIModel(pre_classifiers=[knn]).classify_batch(test_requests, max_concurrency=max_concurrency)
+        hybrid_seconds += time.perf_counter() - start
+        for i, result in zip(test, results):
+            hybrid[i] = result
+
+    routed = [p for p in hybrid if p["quelle"] == KNNClassifier.name]
+    summary: dict[str, Any] = {
+        "knn_only": {"accuracy": accuracy(y_true, [v[0] for v in votes]), "emails_per_s": len(requests) / knn_seconds},
+        "llm_only": {"accuracy": accuracy(y_true, llm_pred), "emails_per_s": len(requests) / llm_seconds},
+        "hybrid": {"accuracy": accuracy(y_true, [p["kategorie"] for p in hybrid]),
+                   "emails_per_s": len(requests) / hybrid_seconds, "knn_coverage": len(routed) / len(requests)},
+        "knn_thresholds": {},
+    }
+    print(f"\n{'='*50}")
+    print(pd.DataFrame({k: v for k, v in summary.items() if k != "knn_thresholds"}).T.to_string(float_format=lambda v: f"{v:.3f}"))
+    print(f"\n{'Schwelle':>8}  {'Abdeckung':>9}  {'Accuracy':>8}")
+    for t in thresholds:
+        knn = KNNClassifier(threshold=t)
+        hits = [(label, vote[0]) for label, vote in zip(y_true, votes) if knn.accept(vote[1], vote[2])]
+        stats = {"coverage": len(hits) / len(requests), "accuracy": accuracy(*zip(*hits)) if hits else 0.0}
+        summary["knn_thresholds"][str(t)] = stats
+        print(f"{t:>8.2f}  {stats['coverage']:>9.1%}  {stats['accuracy']:>8.2%}")
+    print(f"{'='*50}")
+    with open(os.path.join(OUTPUT_DIR, "knn_comparison.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=4)
+
+def report_profile(profiler: Profiler) -> None:
+    """
+    Gibt die Latenzen pro Stufe aus und exportiert das Profil nach output/.
+
+    Args:
+        profiler: Profiler mit den Traces des Laufs.
+    """
+    summary = profiler.export(os.path.join(OUTPUT_DIR, "profile.json"), os.path.join(OUTPUT_DIR, "profile_traces.jsonl"))
+    print("\n--- Profil (ms) ---")
+    print(f"{'Stufe':<28} {'n':>6} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for name, stats in summary["stages"].items():
+        print(f"{name:<28} {stats['count']:>6} {stats['p50'] * 1000:>9.1f} {stats['p95'] * 1000:>9.1f} {stats['p99'] * 1000:>9.1f}")
+    for name, metrics in summary["llm_calls"].items():
+        tokens = ", ".join(f"{key}: {metrics[key]['mean']:.0f}" for key in ("prompt_tokens", "eval_tokens") if key in metrics)
+        print(f"LLM {name}: Ø {tokens}")
+    print("Profil gespeichert: profile.json, profile_traces.jsonl")
+
+def evaluate(max_concurrency: int = 4, cache_path: Optional[str] = os.path.join(OUTPUT_DIR, "llm_cache.sqlite"),
+             mode: str = "two_pass", rule_threshold: Optional[float] = None, local_extraction: bool = False,
+             input_path: str = DEFAULT_INPUT, output_path: str = os.path.join(OUTPUT_DIR, "all_predictions.jsonl"),
+             resume: bool = False, retry_failed: bool = False, profile: bool = False, compact_prompts: bool = False,
+             preprocess: bool = False, max_input_tokens: Optional[int] = 512, plots: str = "auto",
+             stage_models: Optional[dict[str, str]] = None, cascade_model: Optional[str] = None,
+             cascade_samples: int = 3, cascade_threshold: float = 1.0, llm_timeout_s: Optional[float] = 120.0,
+             max_retries: int = 2) -> None:
     """
     Hauptfunktion zur Evaluation des AI-Modells.
+
+    Die Eingabe wird gestreamt und jede Vorhersage sofort an die JSONL-Ausgabe angehängt,
+    sodass der Speicherbedarf nicht mit der Größe des Postfachs wächst und fertige
+    Ergebnisse einen Absturz überstehen. Die Ausgabe dient zugleich als Checkpoint:
+    Mit `resume` werden bereits klassifizierte Zeilen übersprungen.
+
+    Args:
+        max_concurrency: Maximale Anzahl gleichzeitig laufender Anfragen an den Ollama-Server.
+        cache_path: Pfad zum persistenten Ergebnis-Cache oder None, um ohne Cache zu arbeiten.
+        mode: "two_pass" (Klassifikation + separate Detailextraktion) oder "one_pass" (ein kombinierter Aufruf).
+        rule_threshold: Konfidenzschwelle des Regel-Vorklassifikators oder None, um alle Mails an das LLM zu geben.
+        local_extraction: Sicher per Regex gefundene Felder lokal extrahieren statt per LLM.
+        input_path: Eingabedatei (CSV mit ";" als Trennzeichen oder JSONL). Ohne Spalte "Anliegen"
+            (ungelabeltes Postfach) werden nur die Vorhersagen geschrieben.
+        output_path: JSONL-Datei, an die die Vorhersagen fortlaufend geschrieben werden.
+        resume: Einen abgebrochenen Lauf fortsetzen und bereits klassifizierte Zeilen überspringen.
+        retry_failed: Beim Fortsetzen auch Zeilen erneut verarbeiten, deren Klassifikation fehlgeschlagen ist
+            (impliziert `resume`).
+        profile: Dauer pro Stufe, Token-Zahlen und Ollama-Timings jeder Mail erfassen und als
+            output/profile.json (Zusammenfassung) und output/profile_traces.jsonl (pro Mail) exportieren.
+        compact_prompts: Kompakte Prompts mit der E-Mail am Ende verwenden.
+        preprocess: Zitate, Signaturen und Textbausteine vor dem LLM entfernen.
+        max_input_tokens: Token-Budget für den Mailtext bei `preprocess`.
+        plots: Diagramme "always", "never" oder "auto" (nur bei geänderten Zahlen) erzeugen.
+            Die Confusion Matrix wird zusätzlich als output/metrics.json gespeichert.
+        stage_models: Eigenes Modell pro Stufe (z.B. {"rechnungskopie": "llama3.2:1b"}).
+        cascade_model: Kleines Modell, das die Klassifikation zuerst beantwortet; llama3 nur bei Uneinigkeit.
+        cascade_samples: Anzahl Antworten des kleinen Modells pro Mail.
+        cascade_threshold: Mindestanteil übereinstimmender Antworten des kleinen Modells.
+        llm_timeout_s: Timeout pro Anfrage an den Ollama-Server in Sekunden.
+        max_retries: Wiederholungen bei Timeouts, Verbindungsfehlern und Überlast. Fehler, Wiederholungen
+            und Öffnungen des Circuit Breakers werden am Ende ausgegeben.
     """
-    print("Loading data...")
-    df = pd.read_csv(os.path.join(DATA_DIR, "data.csv"), sep=";")
-    y_true: list[str] = df["Anliegen"].tolist()
+    # Fehlgeschlagene Zeilen erneut zu verarbeiten setzt einen fortgesetzten Lauf voraus
+    resume = resume or retry_failed
+    manifest = RunManifest(output_path, resume=resume)
+    if resume:
+        stats = manifest.stats()
+        print(f"Resuming: {stats['done']} Zeilen bereits verarbeitet, davon {stats['failed']} fehlgeschlagen")
+
+    print(f"Streaming data from {input_path}...")
+    pending = ((row_id(row, i), row) for i, row in enumerate(read_rows(input_path)))
+    pending = ((rid, row) for rid, row in pending if manifest.needs_processing(rid, retry_failed))
+    # Zwei Sichten auf denselben Zeilenstrom: eine für das Modell, eine für die Zeilen-IDs.
+    # tee puffert nur die Zeilen, die sich gerade in Bearbeitung befinden.
+    rows_for_model, rows_for_ids = tee(pending)
     
-    ai_model = model_module.AIModel()
-    y_pred: list[str] = []
+    cache = ResultCache(cache_path) if cache_path else None
+    pre_classifiers = [RuleClassifier(threshold=rule_threshold)] if rule_threshold is not None else []
+    profiler = Profiler() if profile else None
+    ai_model = model_module.AIModel(cache=cache, mode=mode, pre_classifiers=pre_classifiers, local_extraction=local_extraction,
+                                    hooks=[profiler] if profiler else [], compact_prompts=compact_prompts,
+                                    preprocess=preprocess, max_input_tokens=max_input_tokens,
+                                    cascade_samples=cascade_samples, cascade_threshold=cascade_threshold,
+                                    llm=create_llm(model="llama3", temperature=0, timeout_s=llm_timeout_s),
+                                    resilience=Resilience(RetryPolicy(max_attempts=max_retries + 1)),
+                                    **create_routing_llms(stage_models, cascade_model, timeout_s=llm_timeout_s))
     
-    print("Starting inference on full dataset...")
+    print(f"Starting inference on full dataset (mode={mode}, max_concurrency={max_concurrency})...")
     start_time = time.time()
-    sample_size = len(df)
-    all_predictions = []
     
-    # Using tqdm for progress bar
-    for idx in tqdm(range(sample_size)):
-        pred = ai_model.zero_shot_classifier(f"Betreff: {df.iloc[idx]['Betreff']} \n Text: {df.iloc[idx]['Text']} \n Anlagen: {df.iloc[idx]['Anlagen']}")
-        all_predictions.append(pred)
-        y_pred.append(pred["kategorie"])
+    predictions = ai_model.iter_classify((format_request(row) for _, row in rows_for_model), max_concurrency=max_concurrency)
+    try:
+        with PredictionWriter(output_path, append=resume) as writer:
+            # Using tqdm for progress bar
+            for (rid, _), pred in tqdm(zip(rows_for_ids, predictions)):
+                writer.write({"row_id": rid, **pred})
+                manifest.record(rid, pred)
+    except KeyboardInterrupt:
+        predictions.close()
+        print(f"\nAbgebrochen. {writer.count} neue Vorhersagen in {output_path} gesichert, fortsetzen mit --resume.")
+        return
         
     end_time = time.time()
-    print(f"Inference finished in {end_time - start_time:.2f} seconds.")
-    
-    # Calculate Metrics
-    acc = accuracy_score(y_true, y_pred)
-    print(f"\n{'='*50}")
-    print(f"ACCURACY: {acc:.2%}")
-    print(f"{'='*50}")
-    
-    print("\n--- Classification Report ---")
-    report = classification_report(y_true, y_pred, zero_division=0, output_dict=True)
-    print(classification_report(y_true, y_pred, zero_division=0))
-    
-    print("\n--- Confusion Matrix ---")
-    labels = sorted(list(set(y_true) | set(y_pred)))
-    cm = confusion_matrix(y_true, y_pred, labels=labels)
-    
-    # Create a nice DataFrame for the CM
-    cm_df = pd.DataFrame(cm, index=[f"True_{l}" for l in labels], columns=[f"Pred_{l}" for l in labels])
-    print(cm_df)
-    
-    # Export CSV
-    cm_df.to_csv(os.path.join(OUTPUT_DIR, "confusion_matrix.csv"))
-    
-    # Save all_predictions as json
-    with open(os.path.join(OUTPUT_DIR, "all_predictions.json"), "w", encoding="utf-8") as f:
-        json.dump(all_predictions, f, ensure_ascii=False, indent=4)
-    
-    # ========== VISUALISIERUNGEN ==========
-    print("\n--- Erstelle Visualisierungen ---")
-    
-    # 1. Confusion Matrix Heatmap
-    plot_confusion_matrix(cm, labels, os.path.join(OUTPUT_DIR, "confusion_matrix.png"))
-    
-    # 2. Klassenverteilung (True vs Pred)
-    plot_class_distribution(y_true, y_pred, os.path.join(OUTPUT_DIR, "class_distribution.png"))
-    
-    # 3. Metriken pro Klasse
-    plot_metrics_per_class(report, os.path.join(OUTPUT_DIR, "metrics_per_class.png"))
+    print(f"Inference finished in {end_time - start_time:.2f} seconds ({writer.count} Zeilen klassifiziert).")
+    print(f"Predictions written to {output_path}")
+
+    # Ungelabeltes Postfach (keine Spalte "Anliegen"): nur Vorhersagen, keine Metriken
+    labelled = "Anliegen" in next(read_rows(input_path), {})
+    metrics = None
+    if labelled:
+        # Metriken über alle Zeilen, inklusive der aus einem früheren Lauf übernommenen
+        from metrics import ConfusionAccumulator
+        metrics = ConfusionAccumulator.from_targets()
+        # Für das Routing-Reporting genügen Kategorie und Quelle
+        y_true: list[str] = []
+        routed: list[dict[str, str]] = []
+        for i, row in enumerate(read_rows(input_path)):
+            entry = manifest.get(row_id(row, i))
+            metrics.update(row["Anliegen"], entry["kategorie"])
+            if pre_classifiers:
+                y_true.append(row["Anliegen"])
+                routed.append(entry)
+        metrics.save(os.path.join(OUTPUT_DIR, "metrics.json"))
+    else:
+        print(f"Keine Spalte 'Anliegen' in {input_path}: Metriken und Bericht werden übersprungen.")
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Cache: {stats['hits']} Treffer, {stats['misses']} Fehlzugriffe ({stats['hit_rate']:.1%}), {stats['entries']} Einträge")
+        cache.close()
+    llm_stats = ai_model.resilience.stats()
+    print(f"LLM: {llm_stats['calls']} Aufrufe, {llm_stats['failed']} fehlgeschlagen, {llm_stats['retries']} Wiederholungen "
+          f"({llm_stats['timeouts']} Timeouts), Circuit Breaker {llm_stats['circuit_opens']}x geöffnet")
+    if ai_model.cascade_llm is not None:
+        cascade_stats = ai_model.cascade_resilience.stats()
+        print(f"Kaskade: {cascade_stats['calls']} Aufrufe, {cascade_stats['failed']} fehlgeschlagen (eskaliert), "
+              f"Circuit Breaker {cascade_stats['circuit_opens']}x geöffnet")
+    if labelled and pre_classifiers:
+        report_routing(routed, y_true, mode)
+    if profiler is not None:
+        report_profile(profiler)
     
-    print("\n✅ Alle Visualisierungen gespeichert!")
-    print("   - confusion_matrix.png")
-    print("   - class_distribution.png")
-    print("   - metrics_per_class.png")
+    if metrics is not None:
+        write_report(metrics, OUTPUT_DIR, plots=plots)
 
 if __name__ == "__main__":
-    evaluate()
+    parser = argparse.ArgumentParser(description="Evaluation des AI-Modells")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Maximale Anzahl gleichzeitig laufender Anfragen (sollte OLLAMA_NUM_PARALLEL entsprechen)")
+    parser.add_argument("--cache", default=os.path.join(OUTPUT_DIR, "llm_cache.sqlite"),
+                        help="Pfad zum persistenten Ergebnis-Cache")
+    parser.add_argument("--no-cache", action="store_true", help="Ergebnis-Cache deaktivieren")
+    parser.add_argument("--mode", choices=["two_pass", "one_pass"], default="two_pass",
+                        help="Klassifikation und Detailextraktion in zwei Aufrufen oder in einem kombinierten Aufruf")
+    parser.add_argument("--compare-modes", action="store_true",
+                        help="One-Pass und Two-Pass hinsichtlich Accuracy, Extraktion und Latenz vergleichen")
+    parser.add_argument("--rules", type=float, nargs="?", const=0.8, default=None, metavar="THRESHOLD",
+                        help="Regel-Vorklassifikator vor dem LLM nutzen (optional mit Konfidenzschwelle, Standard 0.8)")
+    parser.add_argument("--rules-only", action="store_true",
+                        help="Nur den Regel-Vorklassifikator für mehrere Schwellen auswerten (ohne LLM)")
+    parser.add_argument("--local-extraction", action="store_true",
+                        help="Datum, Beträge, Anschrift und Ratenangaben per Regex statt per LLM extrahieren")
+    parser.add_argument("--input", default=DEFAULT_INPUT, help="Eingabedatei (CSV mit ';' oder JSONL)")
+    parser.add_argument("--output", default=os.path.join(OUTPUT_DIR, "all_predictions.jsonl"),
+                        help="JSONL-Datei für die fortlaufend geschriebenen Vorhersagen")
+    parser.add_argument("--resume", action="store_true",
+                        help="Abgebrochenen Lauf fortsetzen und bereits klassifizierte Zeilen überspringen")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="Lauf fortsetzen und Zeilen mit fehlgeschlagener Klassifikation erneut verarbeiten (impliziert --resume)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Latenz pro Stufe, Tokens und Ollama-Timings erfassen (output/profile.json)")
+    parser.add_argument("--compact-prompts", action="store_true",
+                        help="Kompakte Prompts mit der E-Mail am Ende (KV-Cache-Wiederverwendung des Präfixes)")
+    parser.add_argument("--preprocess", action="store_true",
+                        help="Zitate, Signaturen und Textbausteine vor dem LLM entfernen")
+    parser.add_argument("--max-input-tokens", type=int, default=512,
+                        help="Token-Budget für den Mailtext bei --preprocess (Standard: 512)")
+    parser.add_argument("--compare-prompts", action="store_true",
+                        help="Original- vs. kompakte Prompts und Vorverarbeitung vergleichen (output/prompt_comparison.json)")
+    parser.add_argument("--plots", choices=["auto", "always", "never"], default="auto",
+                        help="Diagramme erzeugen: auto = nur bei geänderten Zahlen (Standard)")
+    parser.add_argument("--merge-metrics", nargs="+", metavar="METRICS_JSON",
+                        help="Gespeicherte metrics.json mehrerer Shards zusammenführen und den Bericht erzeugen")
+    parser.add_argument("--compare-knn", action="store_true",
+                        help="kNN allein, LLM allein und Hybrid per Kreuzvalidierung vergleichen (output/knn_comparison.json)")
+    parser.add_argument("--knn-threshold", type=float, default=0.8,
+                        help="Konfidenzschwelle des kNN-Vorklassifikators (Standard: 0.8)")
+    parser.add_argument("--llm-timeout", type=float, default=120,
+                        help="Timeout pro Anfrage an den Ollama-Server in Sekunden (Standard: 120)")
+    parser.add_argument("--max-retries", type=int, default=2,
+                        help="Wiederholungen bei Timeouts, Verbindungsfehlern und Überlast mit Backoff (Standard: 2)")
+    parser.add_argument("--stage-model", action="append", default=[], metavar="STAGE=MODEL",
+                        help="Eigenes Modell für eine Stufe (classification, ratenplan, rechnungskopie, "
+                             "zahlungsaufschub, combined), mehrfach angebbar")
+    parser.add_argument("--cascade-model", default=None, metavar="MODEL",
+                        help="Kleines Modell, das die Klassifikation zuerst beantwortet (z.B. llama3.2:1b)")
+    parser.add_argument("--cascade-samples", type=int, default=3, help="Antworten des kleinen Modells pro Mail")
+    parser.add_argument("--cascade-threshold", type=float, default=1.0,
+                        help="Mindestanteil übereinstimmender Antworten, sonst Eskalation an llama3")
+    parser.add_argument("--compare-cascade", action="store_true",
+                        help="llama3 mit dem Kaskadenmodus vergleichen (Accuracy, Latenz, Eskalationsrate)")
+    args = parser.parse_args()
+    if args.compare_modes:
+        compare_modes()
+    elif args.merge_metrics:
+        from metrics import ConfusionAccumulator
+        merged = ConfusionAccumulator.merge_files(args.merge_metrics)
+        merged.save(os.path.join(OUTPUT_DIR, "metrics.json"))
+        write_report(merged, OUTPUT_DIR, plots=args.plots)
+    elif args.compare_prompts:
+        compare_prompts(max_input_tokens=args.max_input_tokens)
+    elif args.compare_knn:
+        compare_knn(threshold=args.knn_threshold, max_concurrency=args.concurrency)
+    elif args.compare_cascade:
+        compare_cascade(cascade_model=args.cascade_model or "llama3.2:1b", cascade_samples=args.cascade_samples,
+                        cascade_threshold=args.cascade_threshold, stage_models=parse_stage_models(args.stage_model))
+    elif args.rules_only:
+        evaluate_rules()
+    else:
+        evaluate(max_concurrency=args.concurrency, cache_path=None if args.no_cache else args.cache, mode=args.mode,
+                 rule_threshold=args.rules, local_extraction=args.local_extraction,
+                 input_path=args.input, output_path=args.output, resume=args.resume, retry_failed=args.retry_failed,
+                 profile=args.profile, compact_prompts=args.compact_prompts, preprocess=args.preprocess,
+                 max_input_tokens=args.max_input_tokens, plots=args.plots,
+                 stage_models=parse_stage_models(args.stage_model), cascade_model=args.cascade_model,
+                 cascade_samples=args.cascade_samples, cascade_threshold=args.cascade_threshold,
+                 llm_timeout_s=args.llm_timeout, max_retries=args.max_retries)
@@ -0,0 +1,209 @@
+from typing import Any, Optional
+import re
+
+MONTHS: dict[str, int] = {
+    "januar": 1, "jan": 1, "jänner": 1, "februar": 2, "feb": 2, "märz": 3, "mär": 3, "maerz": 3, "april": 4, "apr": 4,
+    "mai": 5, "juni": 6, "jun": 6, "juli": 7, "jul": 7, "august": 8, "aug": 8, "september": 9, "sep": 9, "sept": 9,
+    "oktober": 10, "okt": 10, "november": 11, "nov": 11, "dezember": 12, "dez": 12,
+}
+
+NUMBER_WORDS: dict[str, int] = {
+    "zwei": 2, "drei": 3, "vier": 4, "fünf": 5, "sechs": 6, "sieben": 7, "acht": 8, "neun": 9, "zehn": 10,
+    "elf": 11, "zwölf": 12, "achtzehn": 18, "vierundzwanzig": 24,
+}
+
+# Datum: 01.02.2025, 1.2.25, 1. Februar 2025
+_DATE = (r"(?P<{p}day>\d{{1,2}})\.\s?(?:(?P<{p}month>\d{{1,2}})\.\s?|(?P<{p}month_name>"
+         + "|".join(sorted(MONTHS, key=len, reverse=True)) + r")\.?\s)(?P<{p}year>\d{{4}}|\d{{2}})(?!\d)")
+# Betrag: 1.234,56 / 450,00 / 450 / 450.00 (jeweils vor oder nach €/EUR/Euro)
+_AMOUNT = r"(?P<{p}amount>\d{{1,3}}(?:\.\d{{3}})+(?:,\d{{1,2}})?|\d+(?:[,.]\d{{1,2}})?)"
+_CURRENCY = r"(?:€|eur\b|euro\b)"
+
+GEBURTSDATUM_PATTERN = re.compile(
+    r"(?:geburtsdatum|geb\.|geboren(?: am)?)\s*:?\s*(?:am\s+)?" + _DATE.format(p=""), re.IGNORECASE)
+AMOUNT_PATTERN = re.compile(
+    r"(?:" + _AMOUNT.format(p="a_") + r"\s*" + _CURRENCY + r"|" + _CURRENCY + r"\s*" + _AMOUNT.format(p="b_") + r")",
+    re.IGNORECASE)
+# Beträge, die eine Rate beschreiben und daher kein Rechnungsbetrag sind
+RATE_CONTEXT_BEFORE = re.compile(r"(?:raten?|monatlich|teilbetr\w*)\s+(?:\w+\s+){0,3}$", re.IGNORECASE)
+RATE_CONTEXT_AFTER = re.compile(r"^\s*(?:monatlich|pro monat|im monat|je rate|als rate|/\s*monat|mtl\.)", re.IGNORECASE)
+_STREET_SUFFIXES = "straße|strasse|str\\.|weg|platz|allee|gasse|ring|damm|ufer|chaussee|steig|pfad|markt"
+# Straße: "Musterstraße", "Karl-Marx-Str." oder "Lange Straße", jeweils mit Hausnummer
+ANSCHRIFT_PATTERN = re.compile(
+    r"(?P<street>(?:[A-ZÄÖÜ][\wäöüß\-]*(?i:" + _STREET_SUFFIXES + r")"
+    r"|[A-ZÄÖÜ][\wäöüß\-]*\s(?:" + _STREET_SUFFIXES.title() + r"))"
+    r"\s+\d+\s?[a-zA-Z]?)\s*,?\s*\n?\s*(?P<plz>\d{5})\s+(?P<ort>(?:(?:Bad|Sankt|St\.)\s)?[A-ZÄÖÜ][\wäöüß\-]+"
+    r"(?:\s(?:an der|am|im|in der|bei|ob der)\s[A-ZÄÖÜ][\wäöüß\-]+)?)")
+
+RATENHOEHE_PATTERNS = [
+    re.compile(_AMOUNT.format(p="") + r"\s*" + _CURRENCY + r"\s*(?:monatlich|pro monat|im monat|je rate|als rate|/\s*monat|mtl\.)",
+               re.IGNORECASE),
+    re.compile(r"(?:monatliche[rn]?\s+)?raten?\s+(?:von|in höhe von|à|zu(?: je)?)\s+" + _AMOUNT.format(p="") + r"\s*" + _CURRENCY,
+               re.IGNORECASE),
+    re.compile(r"monatlich(?:\s+\w+){0,2}\s+" + _AMOUNT.format(p="") + r"\s*" + _CURRENCY, re.IGNORECASE),
+]
+RATENANZAHL_PATTERN = re.compile(
+    r"(?P<count>\d{1,2}|" + "|".join(NUMBER_WORDS) + r")\s+(?:monatliche\s+)?(?:monats)?raten\b", re.IGNORECASE)
+STARTDATUM_PATTERN = re.compile(
+    r"(?:ab|beginnend(?: am| zum| mit dem)?|start(?:end)?(?: am| zum)?)\s+(?:dem\s+)?" + _DATE.format(p=""), re.IGNORECASE)
+ABBUCHUNGSTAG_PATTERN = re.compile(
+    r"(?:zum|am|jeweils zum|jeweils am)\s+(?P<day>\d{1,2})\.\s*(?:eines\s+|jeden\s+|jedes\s+|des\s+)?(?:monats|im monat)",
+    re.IGNORECASE)
+ZIELDATUM_PATTERN = re.compile(
+    r"(?:bis|bis zum|bis spätestens|spätestens(?: am| bis| zum)?|erst(?: am| zum| ab)?)\s+(?:zum\s+)?" + _DATE.format(p=""),
+    re.IGNORECASE)
+
+
+def _format_date(match: re.Match, prefix: str = "") -> Optional[str]:
+    """
+    Normalisiert ein gefundenes Datum auf TT.MM.JJJJ.
+
+    Args:
+        match: Treffer eines Datums-Patterns.
+        prefix: Präfix der benannten Gruppen.
+
+    Returns:
+        Optional[str]: Datum als TT.MM.JJJJ oder None, falls ungültig.
+    """
+    day = int(match.group(f"{prefix}day"))
+    month_name = match.group(f"{prefix}month_name")
+    month = MONTHS[month_name.lower()] if month_name else int(match.group(f"{prefix}month"))
+    year = int(match.group(f"{prefix}year"))
+    if year < 100:
+        year += 2000 if year < 50 else 1900
+    if not (1 <= day <= 31 and 1 <= month <= 12):
+        return None
+    return f"{day:02d}.{month:02d}.{year}"
+
+
+def _parse_amount(value: str) -> float:
+    """
+    Wandelt einen deutschen Betrag (1.234,56) in eine Zahl um.
+
+    Args:
+        value: Betrag als Text.
+
+    Returns:
+        float: Betrag.
+    """
+    if "," in value:
+        return float(value.replace(".", "").replace(",", "."))
+    # "1.234" ist ein Tausenderpunkt, "12.50" ein Dezimalpunkt
+    if re.fullmatch(r"\d{1,3}(?:\.\d{3})+", value):
+        return float(value.replace(".", ""))
+    return float(value)
+
+
+def _unique(values: list[Any]) -> Optional[Any]:
+    """
+    Liefert den Wert, falls genau ein eindeutiger Wert gefunden wurde.
+
+    Args:
+        values: Gefundene Werte.
+
+    Returns:
+        Optional[Any]: Eindeutiger Wert oder None bei keinem oder widersprüchlichen Treffern.
+    """
+    distinct = list(dict.fromkeys(v for v in values if v is not None))
+    return distinct[0] if len(distinct) == 1 else None
+
+
+def extract_geburtsdatum(text: str) -> Optional[str]:
+    """
+    Extrahiert das Geburtsdatum, sofern es eindeutig gekennzeichnet ist (z.B. "geb. 01.02.1980").
+
+    Args:
+        text: Text der Mail.
+
+    Returns:
+        Optional[str]: Geburtsdatum als TT.MM.JJJJ oder None.
+    """
+    return _unique([_format_date(m) for m in GEBURTSDATUM_PATTERN.finditer(text)])
+
+
+def extract_rechnungsbetrag(text: str) -> Optional[float]:
+    """
+    Extrahiert den Rechnungsbetrag, sofern genau ein Betrag (ohne Raten) genannt ist.
+
+    Args:
+        text: Text der Mail.
+
+    Returns:
+        Optional[float]: Rechnungsbetrag oder None.
+    """
+    amounts = []
+    for m in AMOUNT_PATTERN.finditer(text):
+        if RATE_CONTEXT_BEFORE.search(text[max(0, m.start() - 40):m.start()]) or RATE_CONTEXT_AFTER.match(text[m.end():m.end() + 20]):
+            continue
+        amounts.append(_parse_amount(m.group("a_amount") or m.group("b_amount")))
+    return _unique(amounts)
+
+
+def extract_anschrift(text: str) -> Optional[str]:
+    """
+    Extrahiert eine Postanschrift aus Straße, Hausnummer, PLZ und Ort.
+
+    Args:
+        text: Text der Mail.
+
+    Returns:
+        Optional[str]: Anschrift als "Straße Nr, PLZ Ort" oder None.
+    """
+    return _unique([f"{' '.join(m.group('street').split())}, {m.group('plz')} {m.group('ort')}"
+                    for m in ANSCHRIFT_PATTERN.finditer(text)])
+
+
+def extract_base_fields(text: str) -> dict[str, Any]:
+    """
+    Extrahiert die Basisfelder, die sich zuverlässig per Regex finden lassen.
+
+    Args:
+        text: Text der Mail.
+
+    Returns:
+        dict[str, Any]: Nur die sicher gefundenen Felder (geburtsdatum, rechnungsbetrag, anschrift).
+    """
+    found = {
+        "geburtsdatum": extract_geburtsdatum(text),
+        "rechnungsbetrag": extract_rechnungsbetrag(text),
+        "anschrift": extract_anschrift(text),
+    }
+    return {field: value for field, value in found.items() if value is not None}
+
+
+def extract_ratenplan_fields(text: str) -> dict[str, Any]:
+    """
+    Extrahiert Angaben zur gewünschten Ratenzahlung.
+
+    Args:
+        text: Text der Mail.
+
+    Returns:
+        dict[str, Any]: Nur die sicher gefundenen Felder (ratenhoehe, ratenanzahl, startdatum, abbuchungstag).
+    """
+    counts = []
+    for m in RATENANZAHL_PATTERN.finditer(text):
+        count = m.group("count").lower()
+        counts.append(int(count) if count.isdigit() else NUMBER_WORDS[count])
+    days = [int(m.group("day")) for m in ABBUCHUNGSTAG_PATTERN.finditer(text)]
+    found = {
+        "ratenhoehe": _unique([_parse_amount(m.group("amount")) for p in RATENHOEHE_PATTERNS for m in p.finditer(text)]),
+        "ratenanzahl": _unique([c for c in counts if c > 1]),
+        "startdatum": _unique([_format_date(m) for m in STARTDATUM_PATTERN.finditer(text)]),
+        "abbuchungstag": _unique([d for d in days if 1 <= d <= 31]),
+    }
+    return {field: value for field, value in found.items() if value is not None}
+
+
+def extract_zahlungsaufschub_fields(text: str) -> dict[str, Any]:
+    """
+    Extrahiert das gewünschte neue Zahlungsziel.
+
+    Args:
+        text: Text der Mail.
+
+    Returns:
+        dict[str, Any]: Nur die sicher gefundenen Felder (zieldatum).
+    """
+    zieldatum = _unique([_format_date(m) for m in ZIELDATUM_PATTERN.finditer(text)])
+    return {"zieldatum": zieldatum} if zieldatum is not None else {}
@@ -0,0 +1,184 @@
+from typing import Any, Iterator, Optional, TextIO
+import csv
+import json
+import os
+
+
+def read_csv_rows(path: str, delimiter: str = ";") -> Iterator[dict[str, str]]:
+    """
+    Liest eine CSV-Datei zeilenweise, ohne sie vollständig in den Speicher zu laden.
+
+    Args:
+        path: Pfad zur CSV-Datei.
+        delimiter: Trennzeichen der Spalten.
+
+    Returns:
+        Iterator[dict[str, str]]: Zeilen als Dictionary (Spaltenname -> Wert).
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        yield from csv.DictReader(f, delimiter=delimiter)
+
+
+def read_jsonl_rows(path: str) -> Iterator[dict[str, Any]]:
+    """
+    Liest eine JSONL-Datei zeilenweise.
+
+    Args:
+        path: Pfad zur JSONL-Datei.
+
+    Returns:
+        Iterator[dict[str, Any]]: Ein Dictionary pro nicht-leerer Zeile.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def repair_jsonl_tail(path: str, chunk_size: int = 65536) -> bool:
+    """
+    Repariert das Ende einer JSONL-Datei nach einem Absturz während des Schreibens.
+
+    Endet die Datei nicht mit einem Zeilenumbruch, wird die letzte Zeile ergänzt, falls sie gültiges
+    JSON ist, und andernfalls (abgeschnittener Datensatz) entfernt. Danach kann gefahrlos angehängt werden.
+
+    Args:
+        path: Pfad zur JSONL-Datei.
+        chunk_size: Größe der rückwärts gelesenen Blöcke in Bytes.
+
+    Returns:
+        bool: True, falls ein abgeschnittener Datensatz entfernt wurde.
+    """
+    if not os.path.exists(path):
+        return False
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        if end == 0:
+            return False
+        f.seek(end - 1)
+        if f.read(1) == b"\n":
+            return False
+        # Beginn der letzten Zeile suchen, ohne die Datei vollständig zu lesen
+        start = end
+        while start > 0:
+            block_start = max(0, start - chunk_size)
+            f.seek(block_start)
+            newline = f.read(start - block_start).rfind(b"\n")
+            if newline >= 0:
+                start = block_start + newline + 1
+                break
+            start = block_start
+        f.seek(start)
+        tail = f.read()
+        try:
+            complete = isinstance(json.loads(tail), dict)
+        except ValueError:
+            complete = False
+        if not complete:
+            f.truncate(start)
+            return True
+        f.write(b"\n")
+        return False
+
+
+def read_rows(path: str) -> Iterator[dict[str, Any]]:
+    """
+    Liest Eingabedaten anhand der Dateiendung als CSV (";"-getrennt) oder JSONL.
+
+    Args:
+        path: Pfad zur Eingabedatei (.csv, .jsonl oder .ndjson).
+
+    Returns:
+        Iterator[dict[str, Any]]: Zeilen als Dictionary.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return read_csv_rows(path)
+    if extension in (".jsonl", ".ndjson"):
+        return read_jsonl_rows(path)
+    raise ValueError(f"Nicht unterstütztes Eingabeformat: {path}")
+
+
+def _field(row: dict[str, Any], column: str) -> str:
+    """
+    Liest eine Spalte; leere Werte werden wie bisher beim Einlesen mit pandas als "nan" dargestellt,
+    damit Prompts und Cache-Schlüssel unverändert bleiben.
+
+    Args:
+        row: Eingabezeile.
+        column: Spaltenname.
+
+    Returns:
+        str: Wert der Spalte.
+    """
+    value = row.get(column)
+    return "nan" if value is None or value == "" else str(value)
+
+
+def format_request(row: dict[str, Any]) -> str:
+    """
+    Baut den Mail-Text für das Modell aus Betreff, Text und Anlagen.
+
+    Args:
+        row: Eingabezeile mit den Spalten "Betreff", "Text" und "Anlagen".
+
+    Returns:
+        str: Mail-Text im Format "Betreff: ... \\n Text: ... \\n Anlagen: ...".
+    """
+    return f"Betreff: {_field(row, 'Betreff')} \n Text: {_field(row, 'Text')} \n Anlagen: {_field(row, 'Anlagen')}"
+
+
+class PredictionWriter:
+    """
+    Hängt Vorhersagen als JSONL an eine Datei an. Jede Zeile wird sofort geschrieben, sodass
+    bereits fertige Ergebnisse einen Absturz überstehen.
+    """
+
+    def __init__(self, path: str, append: bool = False) -> None:
+        """
+        Öffnet die Ausgabedatei.
+
+        Args:
+            path: Pfad zur JSONL-Datei.
+            append: An eine bestehende Datei anhängen statt sie zu überschreiben.
+
+        Returns:
+            None
+        """
+        self.path = path
+        self.count = 0
+        if append:
+            # Neue Zeilen nicht an einen beim Absturz abgeschnittenen Datensatz anhängen
+            repair_jsonl_tail(path)
+        self._file: Optional[TextIO] = open(path, "a" if append else "w", encoding="utf-8")
+
+    def write(self, record: dict[str, Any]) -> None:
+        """
+        Schreibt eine Vorhersage als eine Zeile.
+
+        Args:
+            record: JSON-serialisierbare Vorhersage.
+
+        Returns:
+            None
+        """
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self.count += 1
+
+    def close(self) -> None:
+        """
+        Schließt die Ausgabedatei.
+
+        Returns:
+            None
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "PredictionWriter":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
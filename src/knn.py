@@ -0,0 +1,163 @@
+from typing import Any, Iterable, Optional, Sequence
+import numpy as np
+
+from ingest import format_request, read_rows
+
+
+class KNNClassifier:
+    """
+    Vorklassifikator über die nächsten Nachbarn in bereits gelabelten Mails (Spalte "Anliegen").
+
+    Die Mails werden lokal eingebettet: TF-IDF über Wörter und Wort-Bigramme, reduziert per
+    LSA (TruncatedSVD) auf `dim` Dimensionen und L2-normiert. Der Index ist eine float32-Matrix;
+    die Kosinus-Ähnlichkeit zu allen gelabelten Mails ist damit ein Matrix-Vektor-Produkt.
+    Die Kategorie wird per ähnlichkeitsgewichteter Abstimmung der `k` nächsten Nachbarn bestimmt.
+    Nur Vorhersagen mit ausreichender Konfidenz und Ähnlichkeit werden zurückgegeben, alle anderen
+    Mails gehen an das LLM.
+    """
+
+    name = "knn"
+
+    def __init__(self, k: int = 7, threshold: float = 0.8, min_similarity: float = 0.3, dim: int = 256) -> None:
+        """
+        Initialisiert einen leeren Klassifikator.
+
+        Args:
+            k: Anzahl der Nachbarn für die Abstimmung.
+            threshold: Mindestkonfidenz (Stimmanteil der besten Kategorie).
+            min_similarity: Mindest-Kosinus-Ähnlichkeit des nächsten Nachbarn.
+            dim: Dimension der Einbettung nach der LSA.
+
+        Returns:
+            None
+        """
+        self.k = k
+        self.threshold = threshold
+        self.min_similarity = min_similarity
+        self.dim = dim
+        self.vectorizer: Any = None
+        self.svd: Any = None
+        self.index: Optional[np.ndarray] = None
+        self.labels: list[str] = []
+        self._label_ids: Optional[np.ndarray] = None
+
+    def embed(self, requests: Sequence[str]) -> np.ndarray:
+        """
+        Bettet Mails in den Vektorraum des Index ein.
+
+        Args:
+            requests: Texte der Mails.
+
+        Returns:
+            np.ndarray: L2-normierte Einbettungen (float32, eine Zeile pro Mail).
+        """
+        vectors = self.vectorizer.transform(requests)
+        vectors = self.svd.transform(vectors) if self.svd is not None else vectors.toarray()
+        vectors = vectors.astype(np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def fit(self, requests: Sequence[str], labels: Sequence[str]) -> "KNNClassifier":
+        """
+        Baut den Index aus gelabelten Mails.
+
+        Args:
+            requests: Texte der Mails.
+            labels: Tatsächliche Kategorien.
+
+        Returns:
+            KNNClassifier: Der trainierte Klassifikator.
+        """
+        from sklearn.decomposition import TruncatedSVD
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        self.vectorizer = TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True, min_df=1)
+        tfidf = self.vectorizer.fit_transform(requests)
+        # Bei kleinen Datensätzen ist die LSA nicht möglich bzw. nicht nötig
+        n_components = min(self.dim, tfidf.shape[0] - 1, tfidf.shape[1] - 1)
+        self.svd = TruncatedSVD(n_components=n_components, random_state=0).fit(tfidf) if n_components >= 2 else None
+
+        self.labels = sorted(set(labels))
+        self._label_ids = np.array([self.labels.index(label) for label in labels])
+        self.index = self.embed(requests)
+        return self
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[dict[str, Any]], **kwargs: Any) -> "KNNClassifier":
+        """
+        Baut den Index aus Eingabezeilen mit den Spalten "Betreff", "Text", "Anlagen" und "Anliegen".
+
+        Args:
+            rows: Gelabelte Eingabezeilen (z.B. aus `ingest.read_rows`).
+            **kwargs: Argumente für den Konstruktor.
+
+        Returns:
+            KNNClassifier: Der trainierte Klassifikator.
+        """
+        rows = [row for row in rows if row.get("Anliegen")]
+        return cls(**kwargs).fit([format_request(row) for row in rows], [row["Anliegen"] for row in rows])
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs: Any) -> "KNNClassifier":
+        """
+        Baut den Index aus einer gelabelten Eingabedatei (CSV oder JSONL).
+
+        Args:
+            path: Pfad zur Eingabedatei.
+            **kwargs: Argumente für den Konstruktor.
+
+        Returns:
+            KNNClassifier: Der trainierte Klassifikator.
+        """
+        return cls.from_rows(read_rows(path), **kwargs)
+
+    def vote_batch(self, requests: Sequence[str]) -> list[tuple[str, float, float]]:
+        """
+        Bestimmt für mehrere Mails die Kategorie per kNN-Abstimmung, unabhängig von der Schwelle.
+
+        Args:
+            requests: Texte der Mails.
+
+        Returns:
+            list[tuple[str, float, float]]: Kategorie, Konfidenz und Ähnlichkeit des nächsten Nachbarn pro Mail.
+        """
+        if self.index is None:
+            raise RuntimeError("KNNClassifier ist nicht trainiert, zuerst fit() aufrufen")
+        similarities = self.embed(requests) @ self.index.T
+        k = min(self.k, similarities.shape[1])
+        neighbours = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        neighbour_sims = np.take_along_axis(similarities, neighbours, axis=1)
+
+        # Ähnlichkeitsgewichtete Stimmen pro Kategorie (negative Ähnlichkeiten zählen nicht)
+        votes = np.zeros((len(requests), len(self.labels)), dtype=np.float32)
+        np.add.at(votes, (np.arange(len(requests))[:, None], self._label_ids[neighbours]), np.clip(neighbour_sims, 0, None))
+        best = votes.argmax(axis=1)
+        totals = votes.sum(axis=1)
+        confidence = np.divide(votes[np.arange(len(requests)), best], totals, out=np.zeros_like(totals), where=totals > 0)
+        return [(self.labels[b], float(c), float(s)) for b, c, s in zip(best, confidence, neighbour_sims.max(axis=1))]
+
+    def accept(self, confidence: float, similarity: float) -> bool:
+        """
+        Prüft, ob eine Abstimmung sicher genug ist, um das LLM zu überspringen.
+
+        Args:
+            confidence: Stimmanteil der besten Kategorie.
+            similarity: Ähnlichkeit des nächsten Nachbarn.
+
+        Returns:
+            bool: True, falls die Vorhersage übernommen wird.
+        """
+        return confidence >= self.threshold and similarity >= self.min_similarity
+
+    def predict(self, request: str) -> Optional[tuple[str, float]]:
+        """
+        Klassifiziert eine Mail, falls die Nachbarn eindeutig genug sind.
+
+        Args:
+            request: Text der Mail.
+
+        Returns:
+            Optional[tuple[str, float]]: (Kategorie, Konfidenz) oder None, falls die Mail an das LLM gehen soll.
+        """
+        label, confidence, similarity = self.vote_batch([request])[0]
+        return (label, confidence) if self.accept(confidence, similarity) else None
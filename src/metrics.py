@@ -0,0 +1,263 @@
+from typing import Any, Iterable, Optional, Sequence
+import hashlib
+import json
+import os
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LABELS_PATH = os.path.join(BASE_DIR, "data", "classification_targets.txt")
+
+
+class ConfusionAccumulator:
+    """
+    Inkrementelle Confusion Matrix über eine feste Liste von Kategorien.
+
+    Vorhersagen werden einzeln oder in Blöcken gezählt, ohne Listen aller Vorhersagen zu halten.
+    Akkumulatoren verschiedener Shards oder Worker lassen sich zusammenführen und als JSON speichern.
+    Precision, Recall und F1 werden vektorisiert aus der Matrix berechnet. Unbekannte Kategorien
+    (z.B. abweichende Labels in den Daten) werden als zusätzliche Zeile/Spalte angehängt.
+    """
+
+    def __init__(self, labels: Sequence[str]) -> None:
+        """
+        Initialisiert eine leere Matrix.
+
+        Args:
+            labels: Kategorien in fester Reihenfolge.
+
+        Returns:
+            None
+        """
+        self.labels: list[str] = list(labels)
+        self._index = {label: i for i, label in enumerate(self.labels)}
+        # Zeilen: tatsächliche Kategorie, Spalten: vorhergesagte Kategorie
+        self.matrix = np.zeros((len(self.labels), len(self.labels)), dtype=np.int64)
+
+    @classmethod
+    def from_targets(cls, path: str = LABELS_PATH) -> "ConfusionAccumulator":
+        """
+        Erstellt einen Akkumulator für die Kategorien aus classification_targets.txt.
+
+        Args:
+            path: Pfad zur Datei mit einer Kategorie pro Zeile.
+
+        Returns:
+            ConfusionAccumulator: Leerer Akkumulator.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            return cls([line.strip() for line in f if line.strip()])
+
+    def _indices(self, labels: Iterable[str]) -> np.ndarray:
+        """
+        Liefert die Indizes der Kategorien und erweitert die Matrix um unbekannte Kategorien.
+
+        Args:
+            labels: Kategorien.
+
+        Returns:
+            np.ndarray: Indizes in der Matrix.
+        """
+        labels = list(labels)
+        new = [label for label in dict.fromkeys(labels) if label not in self._index]
+        if new:
+            for label in new:
+                self._index[label] = len(self.labels)
+                self.labels.append(label)
+            self.matrix = np.pad(self.matrix, ((0, len(new)), (0, len(new))))
+        return np.fromiter((self._index[label] for label in labels), dtype=np.intp, count=len(labels))
+
+    def update(self, y_true: str, y_pred: str) -> None:
+        """
+        Zählt eine Vorhersage.
+
+        Args:
+            y_true: Tatsächliche Kategorie.
+            y_pred: Vorhergesagte Kategorie.
+
+        Returns:
+            None
+        """
+        i, j = self._indices((y_true, y_pred))
+        self.matrix[i, j] += 1
+
+    def update_batch(self, y_true: Sequence[str], y_pred: Sequence[str]) -> None:
+        """
+        Zählt mehrere Vorhersagen auf einmal.
+
+        Args:
+            y_true: Tatsächliche Kategorien.
+            y_pred: Vorhergesagte Kategorien (gleiche Länge).
+
+        Returns:
+            None
+        """
+        if len(y_true) != len(y_pred):
+            raise ValueError("y_true und y_pred müssen gleich lang sein")
+        indices = self._indices([*y_true, *y_pred])
+        np.add.at(self.matrix, (indices[:len(y_true)], indices[len(y_true):]), 1)
+
+    def merge(self, other: "ConfusionAccumulator") -> "ConfusionAccumulator":
+        """
+        Addiert die Zählungen eines anderen Akkumulators (z.B. eines anderen Shards).
+
+        Args:
+            other: Akkumulator mit beliebiger Reihenfolge der Kategorien.
+
+        Returns:
+            ConfusionAccumulator: Dieser Akkumulator.
+        """
+        indices = self._indices(other.labels)
+        self.matrix[np.ix_(indices, indices)] += other.matrix
+        return self
+
+    @property
+    def total(self) -> int:
+        """Anzahl gezählter Vorhersagen."""
+        return int(self.matrix.sum())
+
+    @property
+    def accuracy(self) -> float:
+        """Anteil korrekt klassifizierter Mails."""
+        return float(np.trace(self.matrix) / self.total) if self.total else 0.0
+
+    def per_class(self) -> dict[str, np.ndarray]:
+        """
+        Berechnet Precision, Recall, F1 und Support für alle Kategorien (0.0 bei Division durch 0).
+
+        Returns:
+            dict[str, np.ndarray]: Arrays in der Reihenfolge von `labels`.
+        """
+        tp = np.diag(self.matrix).astype(np.float64)
+        predicted = self.matrix.sum(axis=0)
+        support = self.matrix.sum(axis=1)
+        precision = np.divide(tp, predicted, out=np.zeros_like(tp), where=predicted > 0)
+        recall = np.divide(tp, support, out=np.zeros_like(tp), where=support > 0)
+        f1 = np.divide(2 * precision * recall, precision + recall, out=np.zeros_like(tp), where=(precision + recall) > 0)
+        return {"precision": precision, "recall": recall, "f1-score": f1, "support": support}
+
+    def report(self) -> dict[str, Any]:
+        """
+        Liefert die Metriken im Format von `sklearn.metrics.classification_report(output_dict=True)`.
+
+        Kategorien ohne tatsächliche und ohne vorhergesagte Mails werden ausgelassen.
+
+        Returns:
+            dict[str, Any]: Metriken pro Kategorie sowie accuracy, macro avg und weighted avg.
+        """
+        stats = self.per_class()
+        present = (stats["support"] > 0) | (self.matrix.sum(axis=0) > 0)
+        support = stats["support"][present]
+        report: dict[str, Any] = {
+            label: {"precision": float(stats["precision"][i]), "recall": float(stats["recall"][i]),
+                    "f1-score": float(stats["f1-score"][i]), "support": int(stats["support"][i])}
+            for i, label in enumerate(self.labels) if present[i]
+        }
+        report["accuracy"] = self.accuracy
+        metrics = ("precision", "recall", "f1-score")
+        report["macro avg"] = {m: float(stats[m][present].mean()) if present.any() else 0.0 for m in metrics}
+        report["weighted avg"] = {m: float(np.average(stats[m][present], weights=support)) if support.sum() else 0.0
+                                  for m in metrics}
+        report["macro avg"]["support"] = report["weighted avg"]["support"] = int(support.sum())
+        return report
+
+    def format_report(self, digits: int = 2) -> str:
+        """
+        Formatiert den Report als Tabelle wie `classification_report`.
+
+        Args:
+            digits: Nachkommastellen.
+
+        Returns:
+            str: Tabelle als Text.
+        """
+        report = self.report()
+        classes = [label for label in report if label not in ("accuracy", "macro avg", "weighted avg")]
+        width = max([len(label) for label in classes] + [len("weighted avg")])
+        lines = [f"{'':>{width}} {'precision':>9} {'recall':>9} {'f1-score':>9} {'support':>9}", ""]
+        for label in [*classes, "", "macro avg", "weighted avg"]:
+            if not label:
+                lines += ["", f"{'accuracy':>{width}} {'':>9} {'':>9} {report['accuracy']:>9.{digits}f} {self.total:>9}"]
+                continue
+            row = report[label]
+            lines.append(f"{label:>{width}} {row['precision']:>9.{digits}f} {row['recall']:>9.{digits}f} "
+                         f"{row['f1-score']:>9.{digits}f} {row['support']:>9}")
+        return "\n".join(lines)
+
+    def fingerprint(self) -> str:
+        """
+        Hash über Kategorien und Zählungen; ändert sich nur, wenn sich die Zahlen ändern.
+
+        Returns:
+            str: Hex-Digest.
+        """
+        digest = hashlib.sha256(json.dumps(self.labels, ensure_ascii=False).encode("utf-8"))
+        digest.update(self.matrix.tobytes())
+        return digest.hexdigest()
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Serialisiert den Akkumulator.
+
+        Returns:
+            dict[str, Any]: Kategorien und Matrix.
+        """
+        return {"labels": self.labels, "matrix": self.matrix.tolist()}
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "ConfusionAccumulator":
+        """
+        Stellt einen Akkumulator aus `to_dict` wieder her.
+
+        Args:
+            data: Kategorien und Matrix.
+
+        Returns:
+            ConfusionAccumulator: Akkumulator mit den gespeicherten Zählungen.
+        """
+        accumulator = cls(data["labels"])
+        accumulator.matrix = np.array(data["matrix"], dtype=np.int64).reshape(len(accumulator.labels), len(accumulator.labels))
+        return accumulator
+
+    def save(self, path: str) -> None:
+        """
+        Speichert den Akkumulator als JSON.
+
+        Args:
+            path: Zielpfad.
+
+        Returns:
+            None
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> "ConfusionAccumulator":
+        """
+        Lädt einen mit `save` gespeicherten Akkumulator.
+
+        Args:
+            path: Pfad zur JSON-Datei.
+
+        Returns:
+            ConfusionAccumulator: Geladener Akkumulator.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    @classmethod
+    def merge_files(cls, paths: Sequence[str], labels: Optional[Sequence[str]] = None) -> "ConfusionAccumulator":
+        """
+        Führt gespeicherte Akkumulatoren mehrerer Shards zusammen.
+
+        Args:
+            paths: Pfade der JSON-Dateien.
+            labels: Kategorien des Ergebnisses; Standard sind die aus classification_targets.txt.
+
+        Returns:
+            ConfusionAccumulator: Zusammengeführter Akkumulator.
+        """
+        merged = cls(labels) if labels is not None else cls.from_targets()
+        for path in paths:
+            merged.merge(cls.load(path))
+        return merged
@@ -1,11 +1,30 @@
-from typing import Literal, Optional, Any
+from typing import Literal, Optional, Any, Callable, Iterable, Iterator, Protocol, Sequence
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
 import re
 import json
-from pydantic import BaseModel, Field
-from langchain_ollama import ChatOllama
+import threading
+from pydantic import BaseModel, Field, create_model
+from langchain_core.language_models import BaseChatModel
 from langchain_core.prompts import ChatPromptTemplate
-import numpy as np
-from prompts import CLASS_PROMPT, RATENPLAN_ANFORDERUNG_PROMPT, RECHNUNGSKOPIE_PROMPT, ZAHLUNGSAUFSCHUB_INFO_PROMPT
+from langchain_core.runnables import Runnable
+from backends import create_llm
+from cache import ResultCache
+import extraction
+import profiling
+from resilience import Resilience, RetryPolicy
+from preprocess import preprocess_request
+from prompts import CLASS_PROMPT, COMBINED_PROMPT, RATENPLAN_ANFORDERUNG_PROMPT, RECHNUNGSKOPIE_PROMPT, ZAHLUNGSAUFSCHUB_INFO_PROMPT
+from prompts import (CLASS_PROMPT_COMPACT, COMBINED_PROMPT_COMPACT, RATENPLAN_ANFORDERUNG_PROMPT_COMPACT,
+                     RECHNUNGSKOPIE_PROMPT_COMPACT, ZAHLUNGSAUFSCHUB_INFO_PROMPT_COMPACT)
+
+class PreClassifier(Protocol):
+    """Schneller Vorklassifikator, der eindeutige Mails ohne LLM-Aufruf klassifiziert."""
+    name: str
+
+    def predict(self, request: str) -> Optional[tuple[str, float]]:
+        """Liefert (Kategorie, Konfidenz), falls sicher genug, sonst None."""
+        ...
 
 class AIModel:
     class ClassificationResponse(BaseModel):
@@ -35,12 +54,73 @@ class AIModel:
         zieldatum: Optional[str] = Field(default="", description="Gewünschtes neues Zahlungsziel")
         grund: Optional[str] = Field(default="", description="Begründung (z.B. 'warte auf Versicherung')")           
 
-    def __init__(self) -> None:
+    class CombinedResponse(ClassificationResponse):
+        """Klassifikation und kategoriespezifische Details in einem Aufruf (One-Pass-Modus)"""
+        ratenplan: Optional["RatenplanAnforderung"] = Field(default=None, description="Nur bei 'Ratenplan anfordern', sonst null")
+        rechnungskopie: Optional["Rechnungskopie"] = Field(default=None, description="Nur bei 'Patient braucht eine Rechnungskopie', sonst null")
+        zahlungsaufschub: Optional["Zahlungsaufschub"] = Field(default=None, description="Nur bei 'Patient möchte später zahlen', sonst null")
+
+    # Kategorie -> (Feld im CombinedResponse, Schema der Details)
+    DETAIL_FIELDS: dict[str, tuple[str, type[BaseModel]]] = {
+        "Ratenplan anfordern": ("ratenplan", RatenplanAnforderung),
+        "Patient braucht eine Rechnungskopie": ("rechnungskopie", Rechnungskopie),
+        "Patient möchte später zahlen": ("zahlungsaufschub", Zahlungsaufschub),
+    }
+
+    # Stufen, für die über `stage_llms` ein eigenes Modell gewählt werden kann
+    STAGES: dict[str, type[BaseModel]] = {
+        "classification": ClassificationResponse,
+        "ratenplan": RatenplanAnforderung,
+        "rechnungskopie": Rechnungskopie,
+        "zahlungsaufschub": Zahlungsaufschub,
+        "combined": CombinedResponse,
+    }
+    # Stufen, die im Kaskadenmodus zuerst vom kleinen Modell beantwortet werden
+    CASCADE_STAGES = ("classification", "combined")
+    # Cache-Eintrag für Mails, bei denen das kleine Modell unsicher war
+    ESCALATED = {"__escalated__": True}
+
+    def __init__(self, cache: Optional[ResultCache] = None, mode: Literal["two_pass", "one_pass"] = "two_pass",
+                 pre_classifiers: Sequence[PreClassifier] = (), local_extraction: bool = False,
+                 hooks: Sequence[Callable[[dict[str, Any]], None]] = (), llm: Optional[BaseChatModel] = None,
+                 compact_prompts: bool = False, preprocess: bool = False, max_input_tokens: Optional[int] = 512,
+                 stage_llms: Optional[dict[str, BaseChatModel]] = None, cascade_llm: Optional[BaseChatModel] = None,
+                 cascade_samples: int = 3, cascade_threshold: float = 1.0, resilience: Optional[Resilience] = None,
+                 cascade_resilience: Optional[Resilience] = None) -> None:
         """
         Initialisiert den AI-Modell.
 
         Args:
-            None
+            cache: Optionaler persistenter Ergebnis-Cache. Bei einem Treffer entfällt der LLM-Aufruf.
+            mode: "two_pass" klassifiziert zuerst und extrahiert Details in einem zweiten Aufruf,
+                "one_pass" erledigt beides mit einem kombinierten Schema in einem einzigen Aufruf.
+            pre_classifiers: Vorklassifikatoren (z.B. `rules.RuleClassifier`), die der Reihe nach vor dem LLM
+                gefragt werden. Die erste sichere Vorhersage ersetzt den Klassifikationsaufruf.
+            local_extraction: Felder, die per Regex sicher gefunden werden (Datum, Betrag, Anschrift, Ratenangaben),
+                werden lokal extrahiert und aus dem Schema für das LLM entfernt.
+            hooks: Callbacks, die nach jeder Mail die Trace mit Dauer pro Stufe, Token-Zahlen und
+                Ollama-Timings erhalten (z.B. `profiling.Profiler`). Ohne Hooks wird nichts gemessen.
+            llm: Chat-Modell mit `with_structured_output`. Standard ist `backends.create_llm()`
+                (Backend über LLM_BACKEND, "ollama" mit llama3 oder "fake" für Offline-Benchmarks).
+            compact_prompts: Kompakte Prompts ohne Einrückung und lange Beispiellisten verwenden, bei denen
+                die E-Mail am Ende steht (gleichbleibender Präfix für den KV-Cache des Servers).
+            preprocess: Zitate, Signaturen und Textbausteine vor dem LLM entfernen (`preprocess.preprocess_request`).
+                Kundennummer, lokale Extraktion der Basisfelder und die Vorklassifikatoren (deren Regeln bzw.
+                kNN-Index auf unverarbeiteten Mails beruhen) arbeiten weiterhin auf der Original-Mail.
+            max_input_tokens: Token-Budget für den Mailtext bei `preprocess`; None für keine Kürzung.
+            stage_llms: Eigene Chat-Modelle für einzelne Stufen (Schlüssel aus `STAGES`, z.B.
+                {"rechnungskopie": kleines_modell}). Alle übrigen Stufen nutzen `llm`.
+            cascade_llm: Kleines Modell für den Kaskadenmodus. Die Klassifikation wird zuerst
+                `cascade_samples`-mal vom kleinen Modell beantwortet (Self-Consistency, Temperatur > 0);
+                nur wenn der Anteil der häufigsten Kategorie unter `cascade_threshold` liegt,
+                wird das Modell der Klassifikationsstufe gefragt.
+            cascade_samples: Anzahl Antworten des kleinen Modells pro Mail.
+            cascade_threshold: Mindestanteil übereinstimmender Antworten (1.0 = alle gleich).
+            resilience: Wiederholung, Circuit Breaker und Fehlerzähler für alle LLM-Aufrufe außer der Kaskade;
+                Standard sind 3 Versuche mit Backoff und ein Schalter nach 5 Fehlern in Folge.
+            cascade_resilience: Eigener Circuit Breaker und Fehlerzähler für das kleine Modell. Standard ist
+                ein einziger Versuch ohne Warten auf den Schalter: Beim ersten Fehler wird sofort eskaliert,
+                und Fehler des kleinen Modells öffnen nicht den Schalter des großen Modells.
 
         Returns:
             None
@@ -51,82 +131,379 @@ class AIModel:
         with open(labels_path, "r", encoding="utf-8") as f:
             self.labels = [line.strip() for line in f if line.strip()]
         
-        # Ollama Host: Lokal oder Docker
-        ollama_host = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
-        self.llm = ChatOllama(model="llama3", temperature=0, base_url=ollama_host)
+        self.llm = llm if llm is not None else create_llm(model="llama3", temperature=0)
+        unknown = set(stage_llms or {}) - self.STAGES.keys()
+        if unknown:
+            raise ValueError(f"Unbekannte Stufe(n): {', '.join(sorted(unknown))} (verfügbar: {', '.join(self.STAGES)})")
+        self.stage_llms = dict(stage_llms or {})
+        self.cascade_llm = cascade_llm
+        self.cascade_samples = cascade_samples
+        self.cascade_threshold = cascade_threshold
+        self.resilience = resilience if resilience is not None else Resilience()
+        self.cascade_resilience = (cascade_resilience if cascade_resilience is not None
+                                   else Resilience(RetryPolicy(max_attempts=1), max_wait_s=0))
+
+        # Prompt-Templates und Structured-Output-Runnables einmalig aufbauen,
+        # statt Template-Parsing und JSON-Schema-Erzeugung bei jeder Mail zu wiederholen
+        self.labels_json = json.dumps(self.labels, ensure_ascii=False)
+        self.templates: dict[type[BaseModel], str] = {
+            self.ClassificationResponse: CLASS_PROMPT_COMPACT if compact_prompts else CLASS_PROMPT,
+            self.RatenplanAnforderung: RATENPLAN_ANFORDERUNG_PROMPT_COMPACT if compact_prompts else RATENPLAN_ANFORDERUNG_PROMPT,
+            self.Rechnungskopie: RECHNUNGSKOPIE_PROMPT_COMPACT if compact_prompts else RECHNUNGSKOPIE_PROMPT,
+            self.Zahlungsaufschub: ZAHLUNGSAUFSCHUB_INFO_PROMPT_COMPACT if compact_prompts else ZAHLUNGSAUFSCHUB_INFO_PROMPT,
+            self.CombinedResponse: COMBINED_PROMPT_COMPACT if compact_prompts else COMBINED_PROMPT,
+        }
+        # Stufe und Chat-Modell pro Schema (reduzierte Varianten erben beides vom ursprünglichen Schema)
+        self.stages: dict[type[BaseModel], str] = {schema: stage for stage, schema in self.STAGES.items()}
+        self.llms: dict[type[BaseModel], BaseChatModel] = {
+            schema: self.stage_llms.get(stage, self.llm) for schema, stage in self.stages.items()
+        }
+        self.chains: dict[type[BaseModel], Runnable] = {
+            schema: self._build_chain(template, schema) for schema, template in self.templates.items()
+        }
+        self._cascade_chains: dict[type[BaseModel], Runnable] = {}
+        if cascade_llm is not None:
+            self._cascade_chains = {self.STAGES[stage]: self._build_chain(self.templates[self.STAGES[stage]], self.STAGES[stage], cascade_llm)
+                                    for stage in self.CASCADE_STAGES}
+
+        if mode not in ("two_pass", "one_pass"):
+            raise ValueError(f"Unbekannter Modus: {mode}")
+        self.mode = mode
+        self.cache = cache
+        self.pre_classifiers = list(pre_classifiers)
+        self.local_extraction = local_extraction
+        self.hooks = list(hooks)
+        self.preprocess = preprocess
+        self.max_input_tokens = max_input_tokens
+        # Reduzierte Schemas (ohne lokal gefundene Felder) werden bei Bedarf erzeugt und wiederverwendet
+        self._variants: dict[tuple[type[BaseModel], frozenset[str]], type[BaseModel]] = {}
+        self._variants_lock = threading.Lock()
+        # Schema-Beschreibungen für die Cache-Schlüssel nur einmal serialisieren
+        self._schema_keys: dict[type[BaseModel], str] = {
+            schema: json.dumps(schema.model_json_schema(), sort_keys=True) for schema in self.templates
+        }
+
+    def _build_chain(self, template: str, schema: type[BaseModel], llm: Optional[BaseChatModel] = None) -> Runnable:
+        """
+        Baut die Pipeline aus Prompt-Template und Structured Output für ein Schema.
+
+        Args:
+            template: Prompt-Template mit Platzhaltern.
+            schema: Pydantic-Modell für die strukturierte Ausgabe.
+            llm: Chat-Modell; Standard ist das Modell der Stufe des Schemas.
+
+        Returns:
+            Runnable: Pipeline, die mit den Prompt-Variablen aufgerufen wird.
+        """
+        prompt = ChatPromptTemplate.from_template(template)
+        if "categories" in prompt.input_variables:
+            prompt = prompt.partial(categories=self.labels_json)
+        return prompt | (llm or self.llms[schema]).with_structured_output(schema)
+
+    def _run_chain(self, schema: type[BaseModel], inputs: dict[str, str]) -> BaseModel:
+        """
+        Führt die Pipeline eines Schemas aus und nutzt dabei den Ergebnis-Cache, falls vorhanden.
+
+        Args:
+            schema: Pydantic-Modell, dessen Pipeline ausgeführt wird.
+            inputs: Prompt-Variablen (z.B. {"request": ...}).
+
+        Returns:
+            BaseModel: Strukturierte Antwort des LLM bzw. aus dem Cache.
+        """
+        if schema in self._cascade_chains:
+            try:
+                res = self._cached(schema, inputs, self._cascade_key, lambda: self._run_cascade(schema, inputs))
+            except Exception as e:
+                # Kleines Modell nicht erreichbar: ohne Cache-Eintrag an das große Modell eskalieren
+                print(f"Error in cascade: {e}")
+                res = None
+            if res is not None:
+                return res
+        return self._cached(schema, inputs, self._model_key(self.llms[schema]), lambda: self._invoke_chain(self.chains[schema], inputs))
+
+    def _model_key(self, llm: BaseChatModel) -> tuple[str, Any]:
+        """
+        Liefert Modellname und Temperatur eines Chat-Modells für den Cache-Schlüssel.
+
+        Args:
+            llm: Chat-Modell.
+
+        Returns:
+            tuple[str, Any]: Modellname und Temperatur.
+        """
+        return llm.model, llm.temperature
 
-    def extract_ratenplan_info(self, text: str) -> Optional[dict[str, Any]]:
+    @property
+    def _cascade_key(self) -> tuple[str, Any]:
+        """Modellname und Parameter der Kaskade für den Cache-Schlüssel."""
+        model, temperature = self._model_key(self.cascade_llm)
+        return f"{model}@{self.cascade_samples}x{self.cascade_threshold}", temperature
+
+    def _cached(self, schema: type[BaseModel], inputs: dict[str, str], model_key: tuple[str, Any],
+                compute: Callable[[], Optional[BaseModel]]) -> Optional[BaseModel]:
+        """
+        Liest eine Antwort aus dem Ergebnis-Cache oder berechnet und speichert sie.
+
+        Args:
+            schema: Pydantic-Modell der Antwort.
+            inputs: Prompt-Variablen.
+            model_key: Modellname und Temperatur für den Cache-Schlüssel.
+            compute: Berechnet die Antwort; None (Eskalation der Kaskade) wird als Markierung gespeichert,
+                damit ein erneuter Lauf das kleine Modell nicht noch einmal fragt.
+
+        Returns:
+            Optional[BaseModel]: Antwort aus dem Cache bzw. von `compute`.
+        """
+        if self.cache is None:
+            return compute()
+
+        with profiling.stage("cache"):
+            key = ResultCache.make_key("\n".join(inputs.values()), self.templates[schema], self._schema_keys[schema], *model_key)
+            cached = self.cache.get(key)
+        if cached == self.ESCALATED:
+            return None
+        if cached is not None:
+            return schema.model_validate(cached)
+        res = compute()
+        self.cache.set(key, res.model_dump(mode='json') if res is not None else self.ESCALATED)
+        return res
+
+    def _run_cascade(self, schema: type[BaseModel], inputs: dict[str, str]) -> Optional[BaseModel]:
+        """
+        Lässt das kleine Modell mehrfach antworten und übernimmt die Antwort bei ausreichender Übereinstimmung.
+
+        Die Antworten werden gleichzeitig angefordert (`batch`), sodass die Latenz der Kaskade
+        nicht mit `cascade_samples` wächst, solange das Backend genügend parallele Slots hat.
+        Fehler werden nicht wiederholt (`cascade_resilience`); der Aufrufer eskaliert dann an das große Modell.
+
+        Args:
+            schema: Pydantic-Modell der Klassifikationsstufe.
+            inputs: Prompt-Variablen.
+
+        Returns:
+            Optional[BaseModel]: Antwort mit der häufigsten Kategorie oder None, falls das kleine Modell unsicher ist.
+        """
+        chain = self._cascade_chains[schema]
+        with profiling.stage("cascade"):
+            with profiling.stage("prompt"):
+                prompt_value = chain.first.invoke(inputs)
+
+            def call_llm() -> list[Any]:
+                messages = [prompt_value] * self.cascade_samples
+                for step in chain.middle:
+                    messages = step.batch(messages)
+                return messages
+
+            with profiling.stage("llm"):
+                messages = self.cascade_resilience.call(call_llm)
+            samples: list[BaseModel] = []
+            for message in messages:
+                profiling.record_llm_call(message)
+                try:
+                    with profiling.stage("parse"):
+                        samples.append(chain.last.invoke(message))
+                except Exception as e:
+                    # Ungültige Antwort zählt als abweichende Stimme
+                    print(f"Error in cascade: {e}")
+        if not samples:
+            return None
+        votes = Counter(sample.category for sample in samples)
+        category, count = votes.most_common(1)[0]
+        if count / self.cascade_samples < self.cascade_threshold:
+            return None
+        return next(sample for sample in samples if sample.category == category)
+
+    def _invoke_chain(self, chain: Runnable, inputs: dict[str, str]) -> BaseModel:
+        """
+        Führt Prompt-Aufbau, LLM-Aufruf und Parsing einer Pipeline einzeln aus, damit jede Stufe
+        getrennt gemessen und die Metadaten der LLM-Antwort (Tokens, Timings) erfasst werden können.
+        Nur der LLM-Aufruf wird bei vorübergehenden Fehlern wiederholt (`resilience`).
+
+        Args:
+            chain: Pipeline aus Prompt-Template, Chat-Modell und Output-Parser.
+            inputs: Prompt-Variablen.
+
+        Returns:
+            BaseModel: Geparste strukturierte Antwort.
+        """
+        with profiling.stage("prompt"):
+            message = chain.first.invoke(inputs)
+        prompt_value = message
+
+        def call_llm() -> Any:
+            result = prompt_value
+            for step in chain.middle:
+                result = step.invoke(result)
+            return result
+
+        with profiling.stage("llm"):
+            message = self.resilience.call(call_llm)
+        profiling.record_llm_call(message)
+        with profiling.stage("parse"):
+            return chain.last.invoke(message)
+
+    def _schema_variant(self, schema: type[BaseModel], exclude: frozenset[str]) -> type[BaseModel]:
+        """
+        Liefert eine Variante des Schemas ohne die angegebenen Felder samt vorkompilierter Pipeline.
+
+        Args:
+            schema: Ursprüngliches Pydantic-Modell.
+            exclude: Felder, die nicht mehr vom LLM erzeugt werden sollen.
+
+        Returns:
+            type[BaseModel]: Reduziertes Pydantic-Modell (bzw. das ursprüngliche, falls nichts entfernt wird).
+        """
+        if not exclude:
+            return schema
+        with self._variants_lock:
+            variant = self._variants.get((schema, exclude))
+            if variant is None:
+                fields = {name: (field.annotation, field) for name, field in schema.model_fields.items() if name not in exclude}
+                variant = create_model(schema.__name__, __doc__=schema.__doc__, **fields)
+                self.templates[variant] = self.templates[schema]
+                self.stages[variant] = self.stages[schema]
+                self.llms[variant] = self.llms[schema]
+                self.chains[variant] = self._build_chain(self.templates[schema], variant)
+                if schema in self._cascade_chains:
+                    self._cascade_chains[variant] = self._build_chain(self.templates[schema], variant, self.cascade_llm)
+                self._schema_keys[variant] = json.dumps(variant.model_json_schema(), sort_keys=True)
+                self._variants[(schema, exclude)] = variant
+        return variant
+
+    def _run_with_local(self, schema: type[BaseModel], inputs: dict[str, str], local: dict[str, Any]) -> BaseModel:
+        """
+        Ergänzt lokal extrahierte Felder um die Antwort des LLM für die übrigen Felder.
+
+        Args:
+            schema: Pydantic-Modell der vollständigen Antwort.
+            inputs: Prompt-Variablen.
+            local: Lokal (per Regex) extrahierte Felder.
+
+        Returns:
+            BaseModel: Vollständige Antwort; das LLM wird nur aufgerufen, wenn noch Felder fehlen.
+        """
+        exclude = frozenset(local.keys() & schema.model_fields.keys())
+        if exclude == schema.model_fields.keys():
+            return schema.model_validate(local)
+        res = self._run_chain(self._schema_variant(schema, exclude), inputs)
+        return schema.model_validate({**res.model_dump(), **local})
+
+    def extract_ratenplan_info(self, text: str, raise_errors: bool = False) -> Optional[dict[str, Any]]:
         """
         Extrahiert Informationen aus der Mail, die einen Ratenplan anfordert.
 
         Args:
             text: Text der Mail, die analysiert werden soll.
+            raise_errors: Fehler weitergeben statt None zu liefern.
 
         Returns:
             Optional[dict[str, Any]]: Extrahierte Informationen als Dictionary.
         """
         try:
-            prompt = ChatPromptTemplate.from_template(RATENPLAN_ANFORDERUNG_PROMPT)
-            return self.llm.with_structured_output(self.RatenplanAnforderung).invoke(prompt.format(text=text)).model_dump(mode='json')
+            local = extraction.extract_ratenplan_fields(text) if self.local_extraction else {}
+            return self._run_with_local(self.RatenplanAnforderung, {"text": text}, local).model_dump(mode='json')
         except Exception as e:
+            if raise_errors:
+                raise
             print(f"Error in extract_ratenplan_info: {e}")
             return None
 
-    def extract_rechnungskopie_info(self, text: str) -> Optional[dict[str, Any]]:
+    def extract_rechnungskopie_info(self, text: str, raise_errors: bool = False) -> Optional[dict[str, Any]]:
         """
         Extrahiert Informationen aus der Mail, die eine Rechnungskopie anfordert.
 
         Args:
             text: Text der Mail, die analysiert werden soll.
+            raise_errors: Fehler weitergeben statt None zu liefern.
 
         Returns:
             Optional[dict[str, Any]]: Extrahierte Informationen als Dictionary.
         """
         try:
-            prompt = ChatPromptTemplate.from_template(RECHNUNGSKOPIE_PROMPT)
-            return self.llm.with_structured_output(self.Rechnungskopie).invoke(prompt.format(text=text)).model_dump(mode='json')
+            return self._run_chain(self.Rechnungskopie, {"text": text}).model_dump(mode='json')
         except Exception as e:
+            if raise_errors:
+                raise
             print(f"Error in extract_rechnungskopie_info: {e}")
             return None
 
-    def extract_zahlungsaufschub_info(self, text: str) -> Optional[dict[str, Any]]:
+    def extract_zahlungsaufschub_info(self, text: str, raise_errors: bool = False) -> Optional[dict[str, Any]]:
         """
         Extrahiert Informationen aus der Mail, die eine Zahlungsaufschub anfordert.
 
         Args:
             text: Text der Mail, die analysiert werden soll.
+            raise_errors: Fehler weitergeben statt None zu liefern.
 
         Returns:
             Optional[dict[str, Any]]: Extrahierte Informationen als Dictionary.
         """
         try:
-            prompt = ChatPromptTemplate.from_template(ZAHLUNGSAUFSCHUB_INFO_PROMPT)
-            return self.llm.with_structured_output(self.Zahlungsaufschub).invoke(prompt.format(text=text)).model_dump(mode='json')
+            local = extraction.extract_zahlungsaufschub_fields(text) if self.local_extraction else {}
+            return self._run_with_local(self.Zahlungsaufschub, {"text": text}, local).model_dump(mode='json')
         except Exception as e:
+            if raise_errors:
+                raise
             print(f"Error in extract_zahlungsaufschub_info: {e}")
             return None
 
-    def step2_classifier(self, request: str, predictions: ClassificationResponse) -> Optional[dict[str, Any]]:
+    def step2_classifier(self, request: str, predictions: ClassificationResponse,
+                         raise_errors: bool = False) -> Optional[dict[str, Any]]:
         """
         Extrahiert weitergehende Informationen aus der Mail.
 
         Args:
             request: Text der Mail, die analysiert werden soll.
             predictions: Ergebnisse der Klassifikation.
+            raise_errors: Fehler der Extraktion weitergeben statt None zu liefern.
 
         Returns:
             Optional[dict[str, Any]]: Extrahierte Informationen als Dictionary.
         """
         extracted_info = None
         if predictions.category == "Ratenplan anfordern":
-            extracted_info = self.extract_ratenplan_info(request)
+            extracted_info = self.extract_ratenplan_info(request, raise_errors)
         elif predictions.category == "Patient braucht eine Rechnungskopie":
-            extracted_info = self.extract_rechnungskopie_info(request)
+            extracted_info = self.extract_rechnungskopie_info(request, raise_errors)
         elif predictions.category == "Patient möchte später zahlen":
-            extracted_info = self.extract_zahlungsaufschub_info(request)
+            extracted_info = self.extract_zahlungsaufschub_info(request, raise_errors)
     
         return extracted_info
 
+    def details_from_combined(self, res: CombinedResponse) -> Optional[dict[str, Any]]:
+        """
+        Liest die Details der vorhergesagten Kategorie aus einer One-Pass-Antwort.
+
+        Args:
+            res: Antwort mit kombiniertem Schema.
+
+        Returns:
+            Optional[dict[str, Any]]: Extrahierte Informationen als Dictionary oder None,
+                falls die Kategorie keine Details hat.
+        """
+        if res.category not in self.DETAIL_FIELDS:
+            return None
+        field, schema = self.DETAIL_FIELDS[res.category]
+        # Fehlender Block entspricht einer Extraktion ohne Treffer (Defaults des Schemas)
+        details = getattr(res, field) or schema()
+        return details.model_dump(mode='json')
+
+    def pre_classify(self, request: str) -> Optional[tuple[str, str]]:
+        """
+        Fragt die Vorklassifikatoren der Reihe nach.
+
+        Args:
+            request: Text der Mail, die analysiert werden soll.
+
+        Returns:
+            Optional[tuple[str, str]]: Name des Vorklassifikators und Kategorie oder None, falls keiner sicher ist.
+        """
+        for pre_classifier in self.pre_classifiers:
+            prediction = pre_classifier.predict(request)
+            if prediction is not None and prediction[0] in self.labels:
+                return pre_classifier.name, prediction[0]
+        return None
 
     def zero_shot_classifier(self, request: str) -> dict[str, Any]:
         """
@@ -138,17 +515,116 @@ class AIModel:
         Returns:
             dict[str, Any]: Ergebnisse der Klassifikation.
         """
-        prompt_template = CLASS_PROMPT
-        prompt = ChatPromptTemplate.from_template(prompt_template)
+        if not self.hooks:
+            return self._classify(request)
+
+        with profiling.trace_request() as trace:
+            result = self._classify(request)
+        trace_dict = trace.to_dict(kategorie=result["kategorie"], quelle=result["quelle"], error="error" in result)
+        for hook in self.hooks:
+            hook(trace_dict)
+        return result
+
+    def _classify(self, request: str) -> dict[str, Any]:
+        """
+        Klassifiziert die Mail und extrahiert die Informationen (ohne Hooks).
+
+        Args:
+            request: Text der Mail, die analysiert werden soll.
+
+        Returns:
+            dict[str, Any]: Ergebnisse der Klassifikation.
+        """
+        with profiling.stage("regex"):
+            kundennummer = extract_personal_information(request)
+            local = extraction.extract_base_fields(request) if self.local_extraction else {}
+        original = request
+        if self.preprocess:
+            with profiling.stage("preprocess"):
+                request = preprocess_request(request, self.max_input_tokens)
         try:
-            res = self.llm.with_structured_output(self.ClassificationResponse).invoke(prompt.format(request=request, categories=json.dumps(self.labels, ensure_ascii=False)))
-            step2_results = self.step2_classifier(request, res)
-            return {"kategorie": res.category, "vorname": res.vorname, "nachname": res.nachname,
-             "rechnungsbetrag": res.rechnungsbetrag, "geburtsdatum": res.geburtsdatum, "anschrift": res.anschrift, "kundennummer": extract_personal_information(request), "details": step2_results}
+            source = "llm"
+            with profiling.stage("pre_classification"):
+                pre_classification = self.pre_classify(original)
+            if pre_classification is not None:
+                # Sichere Vorklassifikation: nur noch die Detailextraktion braucht das LLM
+                source, category = pre_classification
+                res = self.ClassificationResponse.model_validate({"category": category, "vorname": None, "nachname": None,
+                    "rechnungsbetrag": None, "geburtsdatum": None, "anschrift": None, **local})
+            elif self.mode == "one_pass":
+                with profiling.stage("classification"):
+                    res = self._run_with_local(self.CombinedResponse, {"request": request}, local)
+            else:
+                with profiling.stage("classification"):
+                    res = self._run_with_local(self.ClassificationResponse, {"request": request}, local)
+            step2_error = None
+            if self.mode == "one_pass" and pre_classification is None:
+                step2_results = self.details_from_combined(res)
+            else:
+                with profiling.stage("step2"):
+                    try:
+                        step2_results = self.step2_classifier(request, res, raise_errors=True)
+                    except Exception as e:
+                        # Kategorie bleibt gültig; "error" markiert die Zeile für --retry-failed
+                        print(f"Error in step2_classifier: {e}")
+                        step2_results, step2_error = None, f"step2: {e}"
+            result = {"kategorie": res.category, "vorname": res.vorname, "nachname": res.nachname,
+             "rechnungsbetrag": res.rechnungsbetrag, "geburtsdatum": res.geburtsdatum, "anschrift": res.anschrift, "kundennummer": kundennummer, "details": step2_results, "quelle": source}
+            if step2_error is not None:
+                result["error"] = step2_error
+            return result
         except Exception as e:
             print(f"Error in zero_shot_classifier: {e}")
             return {"kategorie": "Sonstiges", "vorname": "", "nachname": "",
-             "rechnungsbetrag": 0.0, "geburtsdatum": "", "anschrift": "", "kundennummer": extract_personal_information(request), "details": None, "error": str(e)}
+             "rechnungsbetrag": 0.0, "geburtsdatum": "", "anschrift": "", "kundennummer": kundennummer, "details": None, "quelle": "llm", "error": str(e)}
+
+    def iter_classify(self, requests: Iterable[str], max_concurrency: int = 4) -> Iterator[dict[str, Any]]:
+        """
+        Klassifiziert mehrere Mails nebenläufig und liefert die Ergebnisse in Eingabereihenfolge.
+
+        Es sind höchstens `max_concurrency` Anfragen gleichzeitig beim Ollama-Server in Bearbeitung,
+        sodass dessen parallele Slots (OLLAMA_NUM_PARALLEL) ausgenutzt werden.
+
+        Args:
+            requests: Texte der Mails, die analysiert werden sollen.
+            max_concurrency: Maximale Anzahl gleichzeitig laufender Anfragen.
+
+        Returns:
+            Iterator[dict[str, Any]]: Ergebnisse der Klassifikation in Eingabereihenfolge.
+        """
+        if max_concurrency <= 1:
+            for request in requests:
+                yield self.zero_shot_classifier(request)
+            return
+
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            # Doppeltes Fenster, damit die Worker auch dann ausgelastet bleiben,
+            # wenn die älteste Anfrage noch läuft (Head-of-Line-Blocking)
+            pending: deque[Future] = deque()
+            try:
+                for request in requests:
+                    pending.append(executor.submit(self.zero_shot_classifier, request))
+                    if len(pending) >= 2 * max_concurrency:
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+            finally:
+                # Bei Abbruch (z.B. Ctrl-C) nicht gestartete Anfragen verwerfen statt sie abzuarbeiten
+                for future in pending:
+                    future.cancel()
+
+    def classify_batch(self, requests: Iterable[str], max_concurrency: int = 4) -> list[dict[str, Any]]:
+        """
+        Klassifiziert mehrere Mails nebenläufig.
+
+        Args:
+            requests: Texte der Mails, die analysiert werden sollen.
+            max_concurrency: Maximale Anzahl gleichzeitig laufender Anfragen.
+
+        Returns:
+            list[dict[str, Any]]: Ergebnisse der Klassifikation in Eingabereihenfolge.
+        """
+        return list(self.iter_classify(requests, max_concurrency=max_concurrency))
 
 def extract_personal_information(request: str) -> str:
     """
@@ -165,4 +641,4 @@ def extract_personal_information(request: str) -> str:
     regex = r"\d-\d{5}-\d{8}(?!\d)"
     matches = re.findall(regex, request)
     # Es gibt keine Fälle mit unterschiedlichen Kundennummern im Datensatz
-    return str(np.unique(matches)[0]) if len(np.unique(matches)) > 0 else ""
\ No newline at end of file
+    return min(matches, default="")
\ No newline at end of file
@@ -0,0 +1,192 @@
+from typing import Optional
+import re
+
+from rules import SECTION_PATTERN
+
+# Beginn einer zitierten Vorgänger-Mail: alles ab dieser Zeile wird verworfen
+QUOTE_START_PATTERN = re.compile(
+    r"^\s*(?:-{2,}\s*(?:Ursprüngliche Nachricht|Original Message|Weitergeleitete Nachricht|Forwarded message)\s*-{2,}"
+    r"|Am .{0,80}(?:schrieb|geschrieben)[^:\n]{0,80}:"
+    r"|On .{0,80}wrote:"
+    r"|Von:\s.+\n\s*(?:Gesendet|Datum):"
+    r"|From:\s.+\n\s*(?:Sent|Date):)",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+# Zitierte Zeilen ("> ...")
+QUOTED_LINE_PATTERN = re.compile(r"^\s*>.*(?:\n|$)", re.MULTILINE)
+
+# Signatur-Trenner nach RFC 3676 ("-- " in eigener Zeile): alles danach wird verworfen
+SIGNATURE_DELIMITER_PATTERN = re.compile(r"^--\s*$", re.MULTILINE)
+
+# Grußformel; danach bleiben nur die nächsten Zeilen (Name, ggf. Anschrift und Geburtsdatum) erhalten
+GREETING_PATTERN = re.compile(
+    r"^\s*(?:mit )?(?:freundlichen|besten|herzlichen|liebe|viele|beste|schöne) grüßen?\b.*$|^\s*(?:mfg|lg|vg|gruß)\b.*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+# Textbausteine ohne Informationsgehalt für die Klassifikation. Entfernt wird nur der Baustein selbst
+# (ab Beginn des Treffers bzw. reine Kontaktzeilen), nie der Text der Patienten davor in derselben Zeile.
+BOILERPLATE_PATTERNS = [
+    # Mobil-Fußzeile am Zeilenende, z.B. "… überwiesen. Gesendet von meinem iPhone"
+    re.compile(r"(?:^|(?<=\s))(?:Gesendet|Sent) (?:von|mit|from) (?:meinem|my) [\w .-]{1,40}$", re.IGNORECASE | re.MULTILINE),
+    # Disclaimer bis zum Ende des Absatzes
+    re.compile(r"\b(?:Diese E-Mail|Diese Nachricht|This e-?mail|This message) (?:enthält|kann|ist|may|contains|is)"
+               r"[^\n]*?(?:vertraulich|confidential)[\s\S]*?(?=\n\s*\n|\Z)", re.IGNORECASE),
+    re.compile(r"(?:Bitte denken Sie an die Umwelt|Please consider the environment)[^\n]*", re.IGNORECASE),
+    # Kontaktzeilen nur mit Telefonnummer bzw. Webadresse
+    re.compile(r"^[ \t]*(?:Tel(?:efon)?|Fax|Mobil|Handy)\.?[ \t]*:?[ \t]*[+\d(][\d \t()/.+-]*$", re.IGNORECASE | re.MULTILINE),
+    re.compile(r"^[ \t]*(?:(?:Web|Internet)[ \t]*:[ \t]*\S+|www\.\S+)[ \t]*$", re.IGNORECASE | re.MULTILINE),
+]
+
+# Anzahl Zeilen, die nach der Grußformel erhalten bleiben
+SIGNATURE_LINES = 4
+
+# Grobe Schätzung für deutschsprachigen Text mit Llama-Tokenizern
+CHARS_PER_TOKEN = 4
+
+TRUNCATION_MARKER = " […] "
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Schätzt die Anzahl Tokens eines Textes ohne Tokenizer.
+
+    Args:
+        text: Text.
+
+    Returns:
+        int: Geschätzte Anzahl Tokens.
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def strip_quoted(text: str) -> str:
+    """
+    Entfernt zitierte Vorgänger-Mails und mit ">" zitierte Zeilen.
+
+    Args:
+        text: Mailtext.
+
+    Returns:
+        str: Mailtext ohne Zitate.
+    """
+    match = QUOTE_START_PATTERN.search(text)
+    if match and match.start() > 0:
+        text = text[:match.start()]
+    return QUOTED_LINE_PATTERN.sub("", text)
+
+
+def strip_signature(text: str, keep_lines: int = SIGNATURE_LINES) -> str:
+    """
+    Entfernt Signaturen: alles nach "-- " sowie alles ab der `keep_lines`-ten Zeile nach der letzten Grußformel.
+
+    Die Zeilen direkt nach der Grußformel bleiben erhalten, da dort Name, Anschrift oder
+    Geburtsdatum der Patienten stehen.
+
+    Args:
+        text: Mailtext.
+        keep_lines: Anzahl nicht-leerer Zeilen, die nach der Grußformel erhalten bleiben.
+
+    Returns:
+        str: Mailtext ohne Signatur.
+    """
+    match = SIGNATURE_DELIMITER_PATTERN.search(text)
+    if match:
+        text = text[:match.start()]
+    greetings = list(GREETING_PATTERN.finditer(text))
+    if greetings:
+        end = greetings[-1].end()
+        tail = [line for line in text[end:].splitlines() if line.strip()][:keep_lines]
+        text = text[:end] + "".join("\n" + line for line in tail)
+    return text
+
+
+def strip_boilerplate(text: str) -> str:
+    """
+    Entfernt Disclaimer, Mobil-Fußzeilen und Kontaktzeilen.
+
+    Args:
+        text: Mailtext.
+
+    Returns:
+        str: Mailtext ohne Textbausteine.
+    """
+    for pattern in BOILERPLATE_PATTERNS:
+        text = pattern.sub("", text)
+    return text
+
+
+def normalize_whitespace(text: str) -> str:
+    """
+    Fasst Leerzeichen zusammen und entfernt Leerzeilen.
+
+    Args:
+        text: Mailtext.
+
+    Returns:
+        str: Mailtext mit normalisiertem Leerraum.
+    """
+    lines = (re.sub(r"[ \t ]+", " ", line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """
+    Kürzt einen Text auf ein Token-Budget. Anfang (Anliegen) und Ende (Grußformel mit Name) bleiben erhalten.
+
+    Args:
+        text: Text.
+        max_tokens: Maximale Anzahl (geschätzter) Tokens.
+
+    Returns:
+        str: Gekürzter Text.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    head = max_chars * 3 // 4
+    tail = max_chars - head - len(TRUNCATION_MARKER)
+    # An Wortgrenzen schneiden
+    head_text = text[:head].rsplit(" ", 1)[0]
+    tail_text = text[-tail:].split(" ", 1)[-1] if tail > 0 else ""
+    return head_text.rstrip() + TRUNCATION_MARKER + tail_text.lstrip()
+
+
+def clean_text(text: str, max_tokens: Optional[int] = None) -> str:
+    """
+    Bereinigt einen Mailtext: Zitate, Signatur und Textbausteine entfernen, Leerraum normalisieren, kürzen.
+
+    Args:
+        text: Mailtext.
+        max_tokens: Optionales Token-Budget für den Text.
+
+    Returns:
+        str: Bereinigter Mailtext.
+    """
+    text = normalize_whitespace(strip_boilerplate(strip_signature(strip_quoted(text))))
+    return truncate_tokens(text, max_tokens) if max_tokens else text
+
+
+def preprocess_request(request: str, max_tokens: Optional[int] = 512) -> str:
+    """
+    Bereinigt eine Mail im Format "Betreff: ... \\n Text: ... \\n Anlagen: ..." für das LLM.
+
+    Nur der Text wird bereinigt und auf das Token-Budget gekürzt; Betreff und Anlagen bleiben erhalten.
+
+    Args:
+        request: Text der Mail.
+        max_tokens: Token-Budget für den Text der Mail oder None für keine Kürzung.
+
+    Returns:
+        str: Bereinigte Mail im selben Format.
+    """
+    match = SECTION_PATTERN.match(request)
+    if not match:
+        return clean_text(request, max_tokens)
+    text = clean_text(match.group("text"), max_tokens)
+    betreff = " ".join(match.group("betreff").split())
+    result = f"Betreff: {betreff} \n Text: {text}"
+    if match.group("anlagen") is not None:
+        result += f" \n Anlagen: {' '.join(match.group('anlagen').split())}"
+    return result
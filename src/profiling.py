@@ -0,0 +1,261 @@
+from typing import Any, Iterator, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+import json
+import math
+import threading
+import time
+
+# Trace der Anfrage, die im aktuellen Thread bearbeitet wird (None = Instrumentierung aus)
+_current_trace: ContextVar[Optional["RequestTrace"]] = ContextVar("current_trace", default=None)
+
+# Timing-Felder aus den response_metadata von Ollama (Nanosekunden)
+OLLAMA_DURATIONS = ("total_duration", "load_duration", "prompt_eval_duration", "eval_duration")
+
+
+class RequestTrace:
+    """
+    Zeitmessungen und LLM-Metadaten einer einzelnen Anfrage.
+
+    Stufen können verschachtelt werden; ihre Namen werden dann mit "/" verbunden
+    (z.B. "step2/llm").
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialisiert eine leere Trace.
+
+        Returns:
+            None
+        """
+        self.stages: dict[str, float] = {}
+        self.llm_calls: list[dict[str, Any]] = []
+        self._stack: list[str] = []
+        self._start = time.perf_counter()
+
+    @property
+    def current_stage(self) -> str:
+        """Vollständiger Name der aktuell laufenden Stufe."""
+        return "/".join(self._stack)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Misst die Dauer einer Stufe und addiert sie zu bisherigen Messungen derselben Stufe.
+
+        Args:
+            name: Name der Stufe.
+
+        Returns:
+            Iterator[None]: Kontextmanager.
+        """
+        self._stack.append(name)
+        path = self.current_stage
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[path] = self.stages.get(path, 0.0) + time.perf_counter() - start
+            self._stack.pop()
+
+    def record_llm_call(self, message: Any) -> None:
+        """
+        Übernimmt Token-Zahlen und Ollama-Timings aus der Antwort eines Chat-Modells.
+
+        Args:
+            message: AIMessage mit `usage_metadata` und `response_metadata`.
+
+        Returns:
+            None
+        """
+        usage = getattr(message, "usage_metadata", None) or {}
+        metadata = getattr(message, "response_metadata", None) or {}
+        call = {
+            "stage": self.current_stage,
+            "model": metadata.get("model"),
+            "prompt_tokens": usage.get("input_tokens", metadata.get("prompt_eval_count")),
+            "eval_tokens": usage.get("output_tokens", metadata.get("eval_count")),
+        }
+        for field in OLLAMA_DURATIONS:
+            if metadata.get(field) is not None:
+                call[field.replace("_duration", "_s")] = metadata[field] / 1e9
+        self.llm_calls.append(call)
+
+    def to_dict(self, **fields: Any) -> dict[str, Any]:
+        """
+        Schließt die Trace ab und liefert sie als Dictionary.
+
+        Args:
+            **fields: Zusätzliche Felder (z.B. Kategorie, Quelle).
+
+        Returns:
+            dict[str, Any]: Gesamtdauer, Dauer pro Stufe und LLM-Aufrufe.
+        """
+        return {**fields, "total_s": time.perf_counter() - self._start, "stages": dict(self.stages),
+                "llm_calls": list(self.llm_calls)}
+
+
+@contextmanager
+def trace_request() -> Iterator[RequestTrace]:
+    """
+    Startet eine Trace für die Anfrage im aktuellen Thread.
+
+    Returns:
+        Iterator[RequestTrace]: Kontextmanager mit der aktiven Trace.
+    """
+    trace = RequestTrace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Misst eine Stufe der aktiven Trace; ohne aktive Trace ohne Wirkung.
+
+    Args:
+        name: Name der Stufe.
+
+    Returns:
+        Iterator[None]: Kontextmanager.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    with trace.stage(name):
+        yield
+
+
+def record_llm_call(message: Any) -> None:
+    """
+    Vermerkt Token-Zahlen und Timings eines LLM-Aufrufs in der aktiven Trace.
+
+    Args:
+        message: Antwort des Chat-Modells.
+
+    Returns:
+        None
+    """
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.record_llm_call(message)
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """
+    Berechnet ein Perzentil mit linearer Interpolation.
+
+    Args:
+        sorted_values: Aufsteigend sortierte Werte.
+        q: Perzentil zwischen 0 und 100.
+
+    Returns:
+        float: Perzentil der Werte (NaN bei leerer Liste).
+    """
+    if not sorted_values:
+        return math.nan
+    position = (len(sorted_values) - 1) * q / 100
+    lower, upper = math.floor(position), math.ceil(position)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def distribution(values: list[float]) -> dict[str, float]:
+    """
+    Fasst Werte als Anzahl, Mittelwert und p50/p95/p99 zusammen.
+
+    Args:
+        values: Messwerte.
+
+    Returns:
+        dict[str, float]: Kennzahlen der Verteilung.
+    """
+    ordered = sorted(values)
+    return {"count": len(ordered), "mean": sum(ordered) / len(ordered) if ordered else math.nan,
+            "p50": percentile(ordered, 50), "p95": percentile(ordered, 95), "p99": percentile(ordered, 99)}
+
+
+class Profiler:
+    """
+    Sammelt die Traces aller Anfragen. Wird als Hook an `AIModel` übergeben.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialisiert einen leeren Profiler.
+
+        Returns:
+            None
+        """
+        self.traces: list[dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, trace: dict[str, Any]) -> None:
+        """
+        Hook: nimmt die Trace einer abgeschlossenen Anfrage entgegen.
+
+        Args:
+            trace: Trace als Dictionary.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self.traces.append(trace)
+
+    def summary(self) -> dict[str, Any]:
+        """
+        Fasst Latenzen pro Stufe sowie Token-Zahlen und Ollama-Timings zusammen, gesamt und pro Kategorie.
+
+        Returns:
+            dict[str, Any]: p50/p95/p99 pro Stufe und Kategorie sowie Kennzahlen der LLM-Aufrufe pro Stufe.
+        """
+        with self._lock:
+            traces = list(self.traces)
+
+        def stage_stats(selected: list[dict[str, Any]]) -> dict[str, dict[str, float]]:
+            stages: dict[str, list[float]] = {"total": [t["total_s"] for t in selected]}
+            for t in selected:
+                for name, seconds in t["stages"].items():
+                    stages.setdefault(name, []).append(seconds)
+            return {name: distribution(values) for name, values in sorted(stages.items())}
+
+        llm: dict[str, dict[str, list[float]]] = {}
+        for t in traces:
+            for call in t["llm_calls"]:
+                metrics = llm.setdefault(call["stage"], {})
+                for key, value in call.items():
+                    if key not in ("stage", "model") and value is not None:
+                        metrics.setdefault(key, []).append(value)
+
+        categories = sorted({t.get("kategorie") for t in traces if t.get("kategorie")})
+        return {
+            "requests": len(traces),
+            "stages": stage_stats(traces),
+            "per_category": {c: stage_stats([t for t in traces if t.get("kategorie") == c]) for c in categories},
+            "llm_calls": {stage_name: {key: {**distribution(values), "sum": sum(values)} for key, values in metrics.items()}
+                          for stage_name, metrics in sorted(llm.items())},
+        }
+
+    def export(self, path: str, traces_path: Optional[str] = None) -> dict[str, Any]:
+        """
+        Schreibt die Zusammenfassung als JSON und optional alle Traces als JSONL.
+
+        Args:
+            path: Pfad für die Zusammenfassung.
+            traces_path: Optionaler Pfad für die Traces der einzelnen Anfragen.
+
+        Returns:
+            dict[str, Any]: Die geschriebene Zusammenfassung.
+        """
+        summary = self.summary()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=4)
+        if traces_path:
+            with self._lock, open(traces_path, "w", encoding="utf-8") as f:
+                for trace in self.traces:
+                    f.write(json.dumps(trace, ensure_ascii=False) + "\n")
+        return summary
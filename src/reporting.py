@@ -0,0 +1,234 @@
+"""
+Berichte zur Evaluation: Metriken, Confusion Matrix und Diagramme.
+
+matplotlib und seaborn werden erst beim Erstellen der Diagramme
+importiert, damit der Inferenzpfad (`model`, `service`, Streaming in `evaluation`) ohne
+diese Bibliotheken startet.
+"""
+from typing import TYPE_CHECKING, Sequence
+import importlib.util
+import csv
+import os
+
+if TYPE_CHECKING:
+    from numpy import ndarray
+    from metrics import ConfusionAccumulator
+
+# Mapping für kürzere, lesbare Labels
+LABEL_MAPPING: dict[str, str] = {
+    "Ratenplan anfordern": "Ratenplan anfordern",
+    "Ratenplan unterschrieben zurücksenden": "Ratenplan zurücksenden",
+    "Patient übermittelt Leistungsbescheid": "Leistungsbescheid",
+    "Patient fragt erneute Zusendung des Passworts fürs Onlineportal an": "Passwort anfordern",
+    "Patient braucht eine Rechnungskopie": "Rechnungskopie",
+    "Patient möchte später zahlen": "Später zahlen",
+    "Patient teilt mit, dass er überwiesen hat": "Zahlung mitgeteilt",
+    "Sonstiges": "Sonstiges"
+}
+
+def shorten_label(label: str) -> str:
+    """
+    Kürzt ein Label auf eine lesbare Form.
+
+    Args:
+        label: Label, der kürzer werden soll.
+
+    Returns:
+        Gekürztes Label.
+    """
+    return LABEL_MAPPING.get(label, label)
+
+def plot_confusion_matrix(cm: "ndarray", labels: list[str], output_path: str = "confusion_matrix.png") -> None:
+    """
+    Erstellt eine visuelle Heatmap der Confusion Matrix.
+
+    Args:
+        cm: Confusion Matrix.
+        labels: Liste der Klassen.
+        output_path: Pfad zur Speicherung des Diagramms.
+
+    Returns:
+        None
+    """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    plt.figure(figsize=(14, 12))
+    
+    # Verwende das Label-Mapping für kürzere Labels
+    short_labels = [shorten_label(l) for l in labels]
+    
+    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', 
+                xticklabels=short_labels, yticklabels=short_labels,
+                cbar_kws={'label': 'Anzahl'})
+    
+    plt.xlabel('Vorhergesagt', fontsize=12)
+    plt.ylabel('Tatsächlich', fontsize=12)
+    plt.title('Confusion Matrix - Klassifikation der Anfragen', fontsize=14, fontweight='bold')
+    plt.xticks(rotation=45, ha='right', fontsize=10)
+    plt.yticks(rotation=0, fontsize=10)
+    plt.tight_layout()
+    plt.savefig(output_path, dpi=150, bbox_inches='tight')
+    plt.close()
+    print(f"Confusion Matrix gespeichert: {output_path}")
+
+def plot_class_distribution(true_counts: dict[str, int], pred_counts: dict[str, int],
+                            output_path: str = "class_distribution.png") -> None:
+    """
+    Zeigt die Verteilung der tatsächlichen vs. vorhergesagten Klassen.
+
+    Args:
+        true_counts: Anzahl tatsächlicher Mails pro Klasse.
+        pred_counts: Anzahl vorhergesagter Mails pro Klasse.
+        output_path: Pfad zur Speicherung des Diagramms.
+
+    Returns:
+        None
+    """
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(1, 2, figsize=(16, 7))
+    
+    for ax, counts, title, color in [(axes[0], true_counts, 'Tatsächliche Verteilung', 'steelblue'),
+                                     (axes[1], pred_counts, 'Vorhergesagte Verteilung', 'coral')]:
+        # Absteigend sortiert, Klassen ohne Mails auslassen
+        ordered = sorted(((label, n) for label, n in counts.items() if n > 0), key=lambda item: -item[1])
+        ax.barh([shorten_label(label) for label, _ in ordered], [n for _, n in ordered], color=color)
+        ax.set_title(title, fontweight='bold')
+        ax.set_xlabel('Anzahl')
+        ax.invert_yaxis()
+    
+    plt.tight_layout()
+    plt.savefig(output_path, dpi=150, bbox_inches='tight')
+    plt.close()
+    print(f"Klassenverteilung gespeichert: {output_path}")
+
+def plot_metrics_per_class(report_dict: dict[str, dict[str, float]], output_path: str = "metrics_per_class.png") -> None:
+    """
+    Zeigt Precision, Recall, F1 pro Klasse als Balkendiagramm.
+
+    Args:
+        report_dict: Dictionary mit Metriken pro Klasse.
+        output_path: Pfad zur Speicherung des Diagramms.
+
+    Returns:
+        None
+    """
+    import matplotlib.pyplot as plt
+    import numpy as np
+
+    # Filter nur Klassen (keine 'accuracy', 'macro avg', etc.)
+    classes = [k for k in report_dict.keys() if k not in ['accuracy', 'macro avg', 'weighted avg']]
+    
+    precision = [report_dict[c]['precision'] for c in classes]
+    recall = [report_dict[c]['recall'] for c in classes]
+    f1 = [report_dict[c]['f1-score'] for c in classes]
+    
+    # Verwende das Label-Mapping für kürzere Labels
+    short_classes = [shorten_label(c) for c in classes]
+    
+    x = np.arange(len(classes))
+    width = 0.25
+    
+    fig, ax = plt.subplots(figsize=(16, 7))
+    ax.bar(x - width, precision, width, label='Precision', color='#2ecc71')
+    ax.bar(x, recall, width, label='Recall', color='#3498db')
+    ax.bar(x + width, f1, width, label='F1-Score', color='#9b59b6')
+    
+    ax.set_ylabel('Score')
+    ax.set_title('Metriken pro Klasse', fontweight='bold')
+    ax.set_xticks(x)
+    ax.set_xticklabels(short_classes, rotation=30, ha='right', fontsize=10)
+    ax.legend()
+    ax.set_ylim(0, 1.1)
+    ax.axhline(y=0.8, color='gray', linestyle='--', alpha=0.5, label='80% Threshold')
+    
+    plt.tight_layout()
+    plt.savefig(output_path, dpi=150, bbox_inches='tight')
+    plt.close()
+    print(f"Metriken pro Klasse gespeichert: {output_path}")
+
+
+def accuracy(y_true: Sequence[str], y_pred: Sequence[str]) -> float:
+    """
+    Anteil korrekt klassifizierter Mails (ohne scikit-learn).
+
+    Args:
+        y_true: Tatsächliche Klassen.
+        y_pred: Vorhergesagte Klassen.
+
+    Returns:
+        float: Accuracy (0.0 bei leerer Eingabe).
+    """
+    return sum(t == p for t, p in zip(y_true, y_pred)) / len(y_true) if len(y_true) else 0.0
+
+
+def write_report(metrics: "ConfusionAccumulator", output_dir: str, plots: str = "auto") -> float:
+    """
+    Gibt Accuracy, Classification Report und Confusion Matrix aus und speichert
+    confusion_matrix.csv sowie die Diagramme in `output_dir`.
+
+    Args:
+        metrics: Confusion Matrix über alle Vorhersagen.
+        output_dir: Verzeichnis für CSV und Diagramme.
+        plots: "always" (Diagramme immer erzeugen), "never" (keine Diagramme) oder "auto"
+            (nur neu erzeugen, wenn sich die Zahlen seit dem letzten Bericht geändert haben
+            und matplotlib installiert ist).
+
+    Returns:
+        float: Accuracy.
+    """
+    acc = metrics.accuracy
+    print(f"\n{'='*50}")
+    print(f"ACCURACY: {acc:.2%}")
+    print(f"{'='*50}")
+    
+    print("\n--- Classification Report ---")
+    report = metrics.report()
+    print(metrics.format_report())
+    
+    print("\n--- Confusion Matrix ---")
+    header = [""] + [f"Pred_{l}" for l in metrics.labels]
+    rows = [[f"True_{l}"] + [str(n) for n in counts] for l, counts in zip(metrics.labels, metrics.matrix.tolist())]
+    for row in rows:
+        print(f"{shorten_label(row[0][5:]):<22} " + " ".join(f"{n:>5}" for n in row[1:]))
+    
+    # Export CSV
+    with open(os.path.join(output_dir, "confusion_matrix.csv"), "w", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerows([header, *rows])
+
+    fingerprint_path = os.path.join(output_dir, "report_fingerprint.txt")
+    fingerprint = metrics.fingerprint()
+    if plots == "never":
+        return acc
+    if plots == "auto" and os.path.exists(fingerprint_path):
+        with open(fingerprint_path, "r", encoding="utf-8") as f:
+            if f.read().strip() == fingerprint:
+                print("\nZahlen unverändert, Visualisierungen werden nicht neu erzeugt.")
+                return acc
+    
+    if plots == "auto" and importlib.util.find_spec("matplotlib") is None:
+        print("\nmatplotlib nicht installiert (requirements-inference.txt), Visualisierungen werden übersprungen.")
+        return acc
+
+    # ========== VISUALISIERUNGEN ==========
+    print("\n--- Erstelle Visualisierungen ---")
+    
+    # 1. Confusion Matrix Heatmap
+    plot_confusion_matrix(metrics.matrix, metrics.labels, os.path.join(output_dir, "confusion_matrix.png"))
+    
+    # 2. Klassenverteilung (True vs Pred)
+    plot_class_distribution(dict(zip(metrics.labels, metrics.matrix.sum(axis=1).tolist())),
+                            dict(zip(metrics.labels, metrics.matrix.sum(axis=0).tolist())),
+                            os.path.join(output_dir, "class_distribution.png"))
+    
+    # 3. Metriken pro Klasse
+    plot_metrics_per_class(report, os.path.join(output_dir, "metrics_per_class.png"))
+    
+    with open(fingerprint_path, "w", encoding="utf-8") as f:
+        f.write(fingerprint)
+    print("\n✅ Alle Visualisierungen gespeichert!")
+    print("   - confusion_matrix.png")
+    print("   - class_distribution.png")
+    print("   - metrics_per_class.png")
+    return acc
@@ -0,0 +1,314 @@
+from typing import Any, Callable, Optional, TypeVar
+import random
+import threading
+import time
+
+import profiling
+
+T = TypeVar("T")
+
+# HTTP-Status, bei denen ein erneuter Versuch sinnvoll ist (Überlast, Gateway, Timeout)
+TRANSIENT_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(RuntimeError):
+    """Das Backend gilt als überlastet; der Aufruf wurde nach `max_wait_s` abgewiesen."""
+
+
+def is_timeout(exc: BaseException) -> bool:
+    """
+    Prüft, ob ein Fehler ein Timeout ist (eigener Timeout oder httpx).
+
+    Args:
+        exc: Ausnahme eines LLM-Aufrufs.
+
+    Returns:
+        bool: True bei einem Timeout.
+    """
+    if isinstance(exc, TimeoutError):
+        return True
+    try:
+        import httpx
+    except ImportError:
+        return False
+    return isinstance(exc, httpx.TimeoutException)
+
+
+def is_transient(exc: BaseException) -> bool:
+    """
+    Prüft, ob ein Fehler vorübergehend ist (Timeout, Verbindungsfehler, Überlast des Servers).
+
+    Fehler in Prompt oder Antwort (z.B. ungültiges JSON bei Temperatur 0) sind nicht vorübergehend;
+    ein erneuter Versuch würde dasselbe Ergebnis liefern.
+
+    Args:
+        exc: Ausnahme eines LLM-Aufrufs.
+
+    Returns:
+        bool: True, falls ein erneuter Versuch sinnvoll ist.
+    """
+    if isinstance(exc, (TimeoutError, ConnectionError)) or is_timeout(exc):
+        return True
+    # ollama.ResponseError (status_code) bzw. httpx.HTTPStatusError (response.status_code)
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    if status in TRANSIENT_STATUS:
+        return True
+    try:
+        import httpx
+    except ImportError:
+        return False
+    return isinstance(exc, httpx.TransportError)
+
+
+class RetryPolicy:
+    """
+    Begrenzte Wiederholung vorübergehender Fehler mit exponentiellem Backoff und Jitter.
+
+    Die Wartezeit vor dem n-ten Wiederholungsversuch wird gleichverteilt aus
+    [0, min(max_delay_s, base_delay_s * 2^(n-1))] gezogen ("Full Jitter"), damit gleichzeitig
+    fehlgeschlagene Anfragen den Server nicht im Gleichtakt erneut treffen.
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay_s: float = 0.5, max_delay_s: float = 8.0,
+                 seed: Optional[int] = None) -> None:
+        """
+        Initialisiert die Richtlinie.
+
+        Args:
+            max_attempts: Maximale Anzahl Versuche pro Aufruf (1 = keine Wiederholung).
+            base_delay_s: Obergrenze der Wartezeit vor dem ersten Wiederholungsversuch.
+            max_delay_s: Obergrenze jeder Wartezeit.
+            seed: Startwert des Zufallsgenerators (für reproduzierbare Benchmarks).
+
+        Returns:
+            None
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay_s = base_delay_s
+        self.max_delay_s = max_delay_s
+        self._random = random.Random(seed)
+
+    def should_retry(self, exc: BaseException, attempt: int) -> bool:
+        """
+        Entscheidet, ob nach einem fehlgeschlagenen Versuch erneut versucht wird.
+
+        Args:
+            exc: Ausnahme des Versuchs.
+            attempt: Nummer des fehlgeschlagenen Versuchs (ab 1).
+
+        Returns:
+            bool: True, falls ein weiterer Versuch erfolgen soll.
+        """
+        return attempt < self.max_attempts and is_transient(exc)
+
+    def delay(self, attempt: int) -> float:
+        """
+        Liefert die Wartezeit vor dem nächsten Versuch.
+
+        Args:
+            attempt: Nummer des fehlgeschlagenen Versuchs (ab 1).
+
+        Returns:
+            float: Wartezeit in Sekunden.
+        """
+        return self._random.uniform(0, min(self.max_delay_s, self.base_delay_s * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """
+    Unterbricht die Aufrufe an ein überlastetes Backend.
+
+    Nach `failure_threshold` aufeinanderfolgenden vorübergehenden Fehlern wird der Schalter geöffnet:
+    Neue Aufrufe warten, statt den Server weiter zu belasten. Nach `reset_timeout_s` darf ein einzelner
+    Probeaufruf durch ("half_open"); gelingt er, wird der Schalter geschlossen, sonst erneut geöffnet.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout_s: float = 10.0) -> None:
+        """
+        Initialisiert einen geschlossenen Schalter.
+
+        Args:
+            failure_threshold: Aufeinanderfolgende Fehler bis zum Öffnen (0 = nie öffnen).
+            reset_timeout_s: Pause nach dem Öffnen bis zum Probeaufruf.
+
+        Returns:
+            None
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self.state = "closed"
+        self.opens = 0
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._condition = threading.Condition()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wartet, bis ein Aufruf erlaubt ist.
+
+        Args:
+            timeout: Maximale Wartezeit in Sekunden oder None für unbegrenzt.
+
+        Returns:
+            bool: True, falls der Aufruf der Probeaufruf ist; dieses Token wird an `record` zurückgegeben.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                if self.state == "closed":
+                    return False
+                now = time.monotonic()
+                if self.state == "open" and now >= self._opened_at + self.reset_timeout_s:
+                    self.state = "half_open"
+                if self.state == "half_open" and not self._probe_in_flight:
+                    self._probe_in_flight = True
+                    return True
+                wait = self.retry_after_s() or 0.05
+                if deadline is not None:
+                    if now >= deadline:
+                        raise CircuitOpenError(f"LLM-Backend überlastet, Pause seit {now - self._opened_at:.1f} s")
+                    wait = min(wait, deadline - now)
+                self._condition.wait(wait)
+
+    def record(self, failed: bool, probe: bool = False) -> None:
+        """
+        Meldet das Ergebnis eines Aufrufs.
+
+        Solange der Schalter nicht geschlossen ist, entscheidet nur der Probeaufruf über den Zustand;
+        Ergebnisse älterer, vor dem Öffnen gestarteter Aufrufe werden dann ignoriert.
+
+        Args:
+            failed: True bei einem vorübergehenden Fehler (Timeout, Verbindungsfehler, Überlast).
+            probe: Token von `acquire`; True, falls der Aufruf der Probeaufruf war.
+
+        Returns:
+            None
+        """
+        with self._condition:
+            if probe:
+                self._probe_in_flight = False
+                if failed:
+                    self.state = "open"
+                    self._opened_at = time.monotonic()
+                    self.opens += 1
+                else:
+                    self.state = "closed"
+                    self._failures = 0
+                self._condition.notify_all()
+                return
+            if self.state != "closed":
+                return
+            if not failed:
+                self._failures = 0
+                return
+            self._failures += 1
+            if 0 < self.failure_threshold <= self._failures:
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self.opens += 1
+                self._condition.notify_all()
+
+    def retry_after_s(self) -> float:
+        """
+        Liefert die verbleibende Pause bis zum nächsten Probeaufruf.
+
+        Returns:
+            float: Sekunden bis zum Probeaufruf; 0.0, falls der Schalter nicht offen ist.
+        """
+        if self.state != "open":
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_timeout_s - time.monotonic())
+
+
+class Resilience:
+    """
+    Führt LLM-Aufrufe mit Wiederholung und Circuit Breaker aus und zählt Fehler.
+
+    Timeouts pro Aufruf setzt das Backend (`create_llm(timeout_s=...)`); ein Timeout gilt als
+    vorübergehender Fehler und wird wiederholt.
+    """
+
+    def __init__(self, retry: Optional[RetryPolicy] = None, breaker: Optional[CircuitBreaker] = None,
+                 max_wait_s: Optional[float] = 120.0) -> None:
+        """
+        Initialisiert die Richtlinien und Zähler.
+
+        Args:
+            retry: Wiederholungsrichtlinie; Standard sind 3 Versuche.
+            breaker: Circuit Breaker; Standard öffnet nach 5 aufeinanderfolgenden Fehlern für 10 s.
+            max_wait_s: Maximale Wartezeit eines Aufrufs auf den geöffneten Schalter, danach `CircuitOpenError`.
+
+        Returns:
+            None
+        """
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.max_wait_s = max_wait_s
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(
+            ("calls", "succeeded", "failed", "attempt_errors", "timeouts", "retries", "rejected"), 0)
+        self._backoff_s = 0.0
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        """Erhöht einen Zähler threadsicher."""
+        with self._lock:
+            self._counters[key] += amount
+
+    def call(self, fn: Callable[[], T]) -> T:
+        """
+        Führt einen Aufruf aus und wiederholt ihn bei vorübergehenden Fehlern.
+
+        Args:
+            fn: Aufruf ohne Argumente (z.B. der LLM-Schritt einer Pipeline).
+
+        Returns:
+            T: Ergebnis des ersten erfolgreichen Versuchs.
+        """
+        self._count("calls")
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                probe = self.breaker.acquire(self.max_wait_s)
+            except CircuitOpenError:
+                self._count("rejected")
+                self._count("failed")
+                raise
+            try:
+                result = fn()
+            except Exception as e:
+                transient = is_transient(e)
+                self.breaker.record(failed=transient, probe=probe)
+                with self._lock:
+                    self._counters["attempt_errors"] += 1
+                    self._counters["timeouts"] += is_timeout(e)
+                if not self.retry.should_retry(e, attempt):
+                    self._count("failed")
+                    raise
+                delay = self.retry.delay(attempt)
+                with self._lock:
+                    self._counters["retries"] += 1
+                    self._backoff_s += delay
+                with profiling.stage("backoff"):
+                    time.sleep(delay)
+                continue
+            self.breaker.record(failed=False, probe=probe)
+            self._count("succeeded")
+            return result
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Liefert Zähler für Aufrufe, Fehler, Timeouts und Wiederholungen sowie den Zustand des Schalters.
+
+        Returns:
+            dict[str, Any]: Kennzahlen der Aufrufe.
+        """
+        with self._lock:
+            return {
+                **self._counters,
+                "backoff_s": self._backoff_s,
+                "circuit_state": self.breaker.state,
+                "circuit_opens": self.breaker.opens,
+                "retry_after_s": self.breaker.retry_after_s(),
+            }
@@ -0,0 +1,149 @@
+from typing import Optional
+import re
+
+# Aufbau der Mail-Texte wie in evaluation.py: "Betreff: ... \n Text: ... \n Anlagen: ..."
+SECTION_PATTERN = re.compile(r"^Betreff:(?P<betreff>.*?)\n Text:(?P<text>.*?)(?:\n Anlagen:(?P<anlagen>.*))?$", re.DOTALL)
+
+# Gewichtung der Treffer je nach Abschnitt der Mail
+SECTION_WEIGHTS: dict[str, float] = {"betreff": 2.0, "text": 1.0, "anlagen": 1.5}
+
+# Schlüsselwörter pro Kategorie (angelehnt an die Beispiele in CLASS_PROMPT): (Regex, Gewicht)
+KEYWORD_RULES: dict[str, list[tuple[str, float]]] = {
+    "Ratenplan anfordern": [
+        (r"\bin raten\b", 3.0),
+        (r"ratenzahlung\w* (?:\w+ ){0,3}(?:vereinbaren|beantragen|anfragen|einrichten|möglich)", 3.0),
+        (r"\bmonatsraten\b", 2.0),
+        (r"\bratenzahlung", 1.0),
+        (r"\babzahlen\b|\bteilzahlung", 2.0),
+    ],
+    "Ratenplan unterschrieben zurücksenden": [
+        (r"\bunterschrieben\w*|\bunterzeichnet\w*", 3.0),
+        (r"\bsepa[- ]?(?:lastschrift)?mandat", 3.0),
+        (r"\banbei (?:\w+ ){0,3}(?:raten)?vereinbarung", 2.0),
+    ],
+    "Patient übermittelt Leistungsbescheid": [
+        (r"\bleistungsbescheid|\bbeihilfebescheid|\berstattungsbescheid", 4.0),
+        (r"\bbescheid\b", 2.0),
+        (r"\bgoz\b", 2.0),
+        (r"\b(?:nicht|nur teilweise) erstattet|\babgelehnt\b", 2.0),
+    ],
+    "Patient fragt erneute Zusendung des Passworts fürs Onlineportal an": [
+        (r"\bpasswort|\bkennwort", 4.0),
+        (r"\bzugangsdaten|\bzugang\b", 3.0),
+        (r"\beinloggen\b|\blogin\b|\banmelden\b", 2.0),
+        (r"\bonline-?portal|\bportal\b", 1.0),
+    ],
+    "Patient braucht eine Rechnungskopie": [
+        (r"\brechnungskopie|\bzweitschrift|\brechnungsduplikat", 4.0),
+        (r"\bkopie (?:der|meiner|ihrer) rechnung", 3.0),
+        (r"rechnung\w* (?:\w+ ){0,3}(?:erneut|nochmal|noch einmal) (?:\w+ ){0,2}(?:zusenden|schicken|senden)", 3.0),
+    ],
+    "Patient möchte später zahlen": [
+        (r"\bspäter (?:\w+ )?zahlen|\bspäter begleichen", 4.0),
+        (r"\bzahlungsaufschub|\baufschub\b|\bstundung", 4.0),
+        (r"\berst (?:im|am|zum|ab|nächst\w*) (?:\w+ )?(?:zahlen|überweisen|begleichen)", 3.0),
+        (r"\bzahlungsziel\w* (?:\w+ ){0,2}verlänger", 3.0),
+    ],
+    "Patient teilt mit, dass er überwiesen hat": [
+        (r"\büberwiesen\b", 4.0),
+        (r"\büberweisung (?:\w+ ){0,3}(?:getätigt|veranlasst|ausgeführt|erfolgt)", 3.0),
+        (r"\bzahlung (?:ist raus|erfolgt|getätigt|veranlasst)", 3.0),
+        (r"\bbeglichen\b|\bbezahlt\b", 2.0),
+    ],
+}
+
+# Anhänge, die eine Kategorie zusätzlich stützen (nur im Abschnitt "Anlagen" ausgewertet)
+ATTACHMENT_RULES: dict[str, list[tuple[str, float]]] = {
+    "Ratenplan unterschrieben zurücksenden": [(r"ratenplan|vereinbarung|sepa|unterschrieben", 2.0)],
+    "Patient übermittelt Leistungsbescheid": [(r"bescheid|beihilfe|erstattung", 2.0)],
+}
+
+
+class RuleClassifier:
+    """
+    Deterministischer Vorklassifikator auf Basis von Schlüsselwörtern in Betreff, Text und Anlagen.
+
+    Alle Regeln werden zu einem einzigen Regex mit benannten Gruppen kompiliert, sodass jeder
+    Abschnitt der Mail in einem Durchlauf ausgewertet wird. Nur Vorhersagen mit ausreichendem
+    Score und Abstand zur zweitbesten Kategorie werden zurückgegeben, alle anderen Mails gehen an das LLM.
+    """
+
+    name = "regeln"
+
+    def __init__(self, threshold: float = 0.8, min_score: float = 4.0) -> None:
+        """
+        Kompiliert die Regeln.
+
+        Args:
+            threshold: Mindestkonfidenz (Anteil des besten Scores an der Summe der beiden besten).
+            min_score: Mindestscore der besten Kategorie.
+
+        Returns:
+            None
+        """
+        self.threshold = threshold
+        self.min_score = min_score
+        self._rules: list[tuple[str, float]] = []
+        self._keyword_regex = self._compile(KEYWORD_RULES)
+        self._attachment_regex = self._compile(ATTACHMENT_RULES)
+
+    def _compile(self, rules: dict[str, list[tuple[str, float]]]) -> re.Pattern:
+        """
+        Fasst Regeln zu einem Regex mit einer benannten Gruppe pro Regel zusammen.
+
+        Args:
+            rules: Regeln pro Kategorie.
+
+        Returns:
+            re.Pattern: Kombinierter, kompilierter Regex.
+        """
+        alternatives = []
+        for label, patterns in rules.items():
+            for pattern, weight in patterns:
+                alternatives.append(f"(?P<r{len(self._rules)}>{pattern})")
+                self._rules.append((label, weight))
+        return re.compile("|".join(alternatives), re.IGNORECASE)
+
+    def scores(self, request: str) -> dict[str, float]:
+        """
+        Berechnet die gewichteten Regel-Scores pro Kategorie.
+
+        Args:
+            request: Text der Mail, die analysiert werden soll.
+
+        Returns:
+            dict[str, float]: Score pro Kategorie (nur Kategorien mit Treffern).
+        """
+        match = SECTION_PATTERN.match(request)
+        sections = match.groupdict(default="") if match else {"betreff": "", "text": request, "anlagen": ""}
+        scores: dict[str, float] = {}
+        for section, content in sections.items():
+            if not content or content.strip() == "nan":
+                continue
+            regexes = [self._keyword_regex, self._attachment_regex] if section == "anlagen" else [self._keyword_regex]
+            for regex in regexes:
+                # Jede Regel zählt pro Abschnitt nur einmal
+                for rule in {m.lastgroup for m in regex.finditer(content)}:
+                    label, weight = self._rules[int(rule[1:])]
+                    scores[label] = scores.get(label, 0.0) + weight * SECTION_WEIGHTS[section]
+        return scores
+
+    def predict(self, request: str) -> Optional[tuple[str, float]]:
+        """
+        Klassifiziert die Mail, falls die Regeln eindeutig genug sind.
+
+        Args:
+            request: Text der Mail, die analysiert werden soll.
+
+        Returns:
+            Optional[tuple[str, float]]: Kategorie und Konfidenz oder None, falls unsicher.
+        """
+        ranked = sorted(self.scores(request).items(), key=lambda item: item[1], reverse=True)
+        if not ranked or ranked[0][1] < self.min_score:
+            return None
+        best_label, best_score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        confidence = best_score / (best_score + runner_up)
+        if confidence < self.threshold:
+            return None
+        return best_label, confidence
@@ -0,0 +1,346 @@
+"""
+Dauerhaft laufender Klassifikationsdienst für das Mail-Gateway.
+
+`AIModel` wird einmalig aufgebaut; Prompts, Pipelines und die HTTP-Verbindung zum
+Ollama-Server bleiben über alle Anfragen erhalten. Der `RequestDispatcher` gibt jede Mail
+an einen dauerhaften Thread-Pool, der die parallelen Slots des Backends ausgelastet hält.
+
+Aufruf:
+    python src/service.py --port 8080 --concurrency 4
+
+Endpunkte:
+    POST /classify  {"request": "..."} oder {"Betreff": ..., "Text": ..., "Anlagen": ...}
+                    bzw. {"requests": [...]} für mehrere Mails
+    GET  /stats     Warteschlangenlänge, Latenzen, Fehler- und Wiederholungszähler
+    GET  /health    Lebenszeichen
+
+Ist der Circuit Breaker offen (Backend überlastet), antwortet POST /classify sofort mit 503
+und "Retry-After", statt weitere Mails anzunehmen.
+"""
+from typing import Any, Optional
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import math
+import threading
+import time
+
+import model as model_module
+from backends import create_llm, create_routing_llms, parse_stage_models
+from cache import ResultCache
+from ingest import format_request
+from profiling import distribution
+from resilience import Resilience, RetryPolicy
+from rules import RuleClassifier
+
+# Anzahl der letzten Anfragen, über die Latenzen berichtet werden
+STATS_WINDOW = 10_000
+
+
+class RequestDispatcher:
+    """
+    Verteilt einzelne Mails auf einen dauerhaften Thread-Pool mit `max_concurrency` Slots.
+
+    Jede Mail startet, sobald ein Slot frei ist; es wird nicht auf weitere Mails gewartet.
+    Weitere Mails warten in der Warteschlange des Pools, langsame Mails (z.B. mit Detailextraktion
+    oder Wiederholung) blockieren nur ihren eigenen Slot.
+    """
+
+    def __init__(self, ai_model: model_module.AIModel, max_concurrency: int = 4) -> None:
+        """
+        Startet den Thread-Pool.
+
+        Args:
+            ai_model: Initialisiertes AI-Modell.
+            max_concurrency: Maximale Anzahl gleichzeitig bearbeiteter Mails.
+
+        Returns:
+            None
+        """
+        self.ai_model = ai_model
+        self.max_concurrency = max_concurrency
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._in_flight = 0
+        self._processed = 0
+        self._errors = 0
+        self._queue_wait: deque[float] = deque(maxlen=STATS_WINDOW)
+        self._service: deque[float] = deque(maxlen=STATS_WINDOW)
+        self._started = time.time()
+        self._stopped = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="classify")
+
+    def submit(self, request: str) -> Future:
+        """
+        Reiht eine Mail zur Klassifikation ein.
+
+        Args:
+            request: Text der Mail.
+
+        Returns:
+            Future: Liefert das Ergebnis von `AIModel.zero_shot_classifier`.
+        """
+        if self._stopped.is_set():
+            raise RuntimeError("RequestDispatcher wurde beendet")
+        with self._lock:
+            self._queued += 1
+        return self._executor.submit(self._classify_one, request, time.perf_counter())
+
+    def classify(self, request: str, timeout: Optional[float] = None) -> dict[str, Any]:
+        """
+        Klassifiziert eine Mail und wartet auf das Ergebnis.
+
+        Args:
+            request: Text der Mail.
+            timeout: Maximale Wartezeit in Sekunden oder None.
+
+        Returns:
+            dict[str, Any]: Ergebnis der Klassifikation.
+        """
+        return self.submit(request).result(timeout=timeout)
+
+    def _classify_one(self, request: str, enqueued: float) -> dict[str, Any]:
+        """
+        Klassifiziert eine Mail in einem Slot des Thread-Pools.
+
+        Args:
+            request: Text der Mail.
+            enqueued: Eingangszeit der Mail (perf_counter).
+
+        Returns:
+            dict[str, Any]: Ergebnis der Klassifikation.
+        """
+        start = time.perf_counter()
+        with self._lock:
+            self._queued -= 1
+            self._in_flight += 1
+            self._queue_wait.append(start - enqueued)
+        result = None
+        try:
+            result = self.ai_model.zero_shot_classifier(request)
+            return result
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._processed += 1
+                if result is None or "error" in result:
+                    self._errors += 1
+                if result is not None:
+                    self._service.append(time.perf_counter() - enqueued)
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Liefert Warteschlangenlänge, Durchsatz und Latenzen (p50/p95/p99 in Sekunden).
+
+        Returns:
+            dict[str, Any]: Kennzahlen des Dienstes.
+        """
+        with self._lock:
+            return {
+                "queue_depth": self._queued,
+                "in_flight": self._in_flight,
+                "processed": self._processed,
+                "errors": self._errors,
+                "uptime_s": time.time() - self._started,
+                "queue_wait_s": distribution(list(self._queue_wait)),
+                "latency_s": distribution(list(self._service)),
+            }
+
+    def close(self) -> None:
+        """
+        Wartet auf die Mails in Bearbeitung; noch wartende Mails werden abgebrochen.
+
+        Returns:
+            None
+        """
+        self._stopped.set()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _request_text(payload: dict[str, Any]) -> str:
+    """
+    Liest den Mail-Text aus einer Anfrage: entweder fertig unter "request" oder als Betreff/Text/Anlagen.
+
+    Args:
+        payload: JSON-Objekt der Anfrage.
+
+    Returns:
+        str: Mail-Text für das Modell.
+    """
+    if "request" in payload:
+        return str(payload["request"])
+    if "Text" in payload or "Betreff" in payload:
+        return format_request(payload)
+    raise ValueError('Erwartet "request" oder "Betreff"/"Text"/"Anlagen"')
+
+
+def _request_texts(payload: dict[str, Any]) -> list[str]:
+    """
+    Liest die Mail-Texte einer Anfrage mit mehreren Mails ("requests": Liste von Texten oder Objekten).
+
+    Args:
+        payload: JSON-Objekt der Anfrage.
+
+    Returns:
+        list[str]: Mail-Texte für das Modell.
+    """
+    items = payload["requests"]
+    if not isinstance(items, list) or not all(isinstance(item, (str, dict)) for item in items):
+        raise ValueError('"requests" muss eine Liste von Mail-Texten oder Objekten sein')
+    return [item if isinstance(item, str) else _request_text(item) for item in items]
+
+
+def make_handler(dispatcher: RequestDispatcher, timeout: Optional[float] = None) -> type[BaseHTTPRequestHandler]:
+    """
+    Erstellt den HTTP-Handler für einen RequestDispatcher.
+
+    Args:
+        dispatcher: RequestDispatcher, an den die Mails weitergegeben werden.
+        timeout: Maximale Wartezeit pro Anfrage in Sekunden oder None.
+
+    Returns:
+        type[BaseHTTPRequestHandler]: Handler-Klasse für `ThreadingHTTPServer`.
+    """
+
+    class ClassificationHandler(BaseHTTPRequestHandler):
+        # Keep-Alive, damit das Gateway seine Verbindung wiederverwenden kann
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, status: int, body: Any, headers: Optional[dict[str, str]] = None) -> None:
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self) -> None:
+            if self.path == "/stats":
+                stats = dispatcher.stats()
+                if dispatcher.ai_model.cache is not None:
+                    stats["cache"] = dispatcher.ai_model.cache.stats()
+                stats["llm"] = dispatcher.ai_model.resilience.stats()
+                if dispatcher.ai_model.cascade_llm is not None:
+                    stats["cascade"] = dispatcher.ai_model.cascade_resilience.stats()
+                self._send_json(200, stats)
+            elif self.path == "/health":
+                self._send_json(200, {"status": "ok"})
+            else:
+                self._send_json(404, {"error": f"Unbekannter Pfad: {self.path}"})
+
+        def do_POST(self) -> None:
+            if self.path != "/classify":
+                self._send_json(404, {"error": f"Unbekannter Pfad: {self.path}"})
+                return
+            # Backpressure: bei offenem Circuit Breaker keine neuen Mails annehmen
+            retry_after = dispatcher.ai_model.resilience.breaker.retry_after_s()
+            if retry_after > 0:
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                self._send_json(503, {"error": "LLM-Backend überlastet", "retry_after_s": retry_after},
+                                headers={"Retry-After": str(math.ceil(retry_after))})
+                return
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not isinstance(payload, dict):
+                    raise ValueError("Erwartet ein JSON-Objekt")
+                if "requests" in payload:
+                    futures = [dispatcher.submit(request) for request in _request_texts(payload)]
+                    self._send_json(200, [future.result(timeout=timeout) for future in futures])
+                else:
+                    self._send_json(200, dispatcher.classify(_request_text(payload), timeout=timeout))
+            except (ValueError, AttributeError) as e:
+                self._send_json(400, {"error": str(e)})
+            except Exception as e:
+                self._send_json(503, {"error": str(e)})
+
+        def log_message(self, format: str, *args: Any) -> None:
+            # Kein Zugriffslog pro Anfrage
+            pass
+
+    return ClassificationHandler
+
+
+def serve(ai_model: model_module.AIModel, host: str = "127.0.0.1", port: int = 8080, max_concurrency: int = 4,
+          warmup: bool = True) -> None:
+    """
+    Startet den HTTP-Dienst und blockiert bis zum Abbruch (Ctrl-C).
+
+    Args:
+        ai_model: Initialisiertes AI-Modell.
+        host: Adresse, an die der Dienst gebunden wird.
+        port: Port des Dienstes.
+        max_concurrency: Maximale Anzahl gleichzeitig laufender Anfragen an das Backend.
+        warmup: Vor dem Start eine Test-Mail klassifizieren, damit das Modell geladen und die Verbindung offen ist.
+
+    Returns:
+        None
+    """
+    if warmup:
+        print("Warming up model...")
+        ai_model.zero_shot_classifier("Betreff: Test \n Text: Test \n Anlagen: nan")
+    dispatcher = RequestDispatcher(ai_model, max_concurrency=max_concurrency)
+    server = ThreadingHTTPServer((host, port), make_handler(dispatcher))
+    print(f"Serving on http://{host}:{port} (max_concurrency={max_concurrency})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        dispatcher.close()
+        if ai_model.cache is not None:
+            ai_model.cache.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Klassifikationsdienst für das Mail-Gateway")
+    parser.add_argument("--host", default="127.0.0.1", help="Adresse des Dienstes")
+    parser.add_argument("--port", type=int, default=8080, help="Port des Dienstes")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Maximale Anzahl gleichzeitiger Anfragen an den Ollama-Server")
+    parser.add_argument("--cache", default=None, help="Pfad zum SQLite-Ergebnis-Cache (Standard: kein Cache)")
+    parser.add_argument("--mode", choices=["two_pass", "one_pass"], default="two_pass",
+                        help="two_pass: Klassifikation + Detailextraktion, one_pass: ein kombinierter LLM-Aufruf")
+    parser.add_argument("--rules", type=float, nargs="?", const=0.8, default=None, metavar="THRESHOLD",
+                        help="Regel-Vorklassifikator vor dem LLM mit Konfidenzschwelle (Standard: 0.8)")
+    parser.add_argument("--knn-train", default=None, metavar="PATH",
+                        help="Gelabelte Mails (CSV/JSONL mit 'Anliegen') für den kNN-Vorklassifikator")
+    parser.add_argument("--knn-threshold", type=float, default=0.8, help="Konfidenzschwelle des kNN-Vorklassifikators")
+    parser.add_argument("--local-extraction", action="store_true",
+                        help="Eindeutige Felder per Regex statt per LLM extrahieren")
+    parser.add_argument("--compact-prompts", action="store_true", help="Kompakte Prompts mit der E-Mail am Ende")
+    parser.add_argument("--preprocess", action="store_true", help="Zitate, Signaturen und Textbausteine entfernen")
+    parser.add_argument("--max-input-tokens", type=int, default=512, help="Token-Budget für den Mailtext bei --preprocess")
+    parser.add_argument("--stage-model", action="append", default=[], metavar="STAGE=MODEL",
+                        help="Eigenes Modell für eine Stufe (z.B. rechnungskopie=llama3.2:1b), mehrfach angebbar")
+    parser.add_argument("--cascade-model", default=None, metavar="MODEL",
+                        help="Kleines Modell, das die Klassifikation zuerst beantwortet; llama3 nur bei Uneinigkeit")
+    parser.add_argument("--cascade-samples", type=int, default=3, help="Antworten des kleinen Modells pro Mail")
+    parser.add_argument("--cascade-threshold", type=float, default=1.0,
+                        help="Mindestanteil übereinstimmender Antworten des kleinen Modells")
+    parser.add_argument("--llm-timeout", type=float, default=120,
+                        help="Timeout pro Anfrage an den Ollama-Server in Sekunden")
+    parser.add_argument("--max-retries", type=int, default=2,
+                        help="Wiederholungen bei Timeouts, Verbindungsfehlern und Überlast (mit Backoff)")
+    parser.add_argument("--no-warmup", action="store_true", help="Modell nicht vor dem Start aufwärmen")
+    args = parser.parse_args()
+
+    pre_classifiers = [RuleClassifier(threshold=args.rules)] if args.rules is not None else []
+    if args.knn_train:
+        # numpy/scikit-learn nur laden, wenn der kNN-Vorklassifikator genutzt wird
+        from knn import KNNClassifier
+        pre_classifiers.append(KNNClassifier.from_file(args.knn_train, threshold=args.knn_threshold))
+    serve(model_module.AIModel(cache=ResultCache(args.cache) if args.cache else None, mode=args.mode,
+                               pre_classifiers=pre_classifiers, local_extraction=args.local_extraction,
+                               compact_prompts=args.compact_prompts, preprocess=args.preprocess,
+                               max_input_tokens=args.max_input_tokens, cascade_samples=args.cascade_samples,
+                               cascade_threshold=args.cascade_threshold,
+                               llm=create_llm(model="llama3", temperature=0, timeout_s=args.llm_timeout),
+                               resilience=Resilience(RetryPolicy(max_attempts=args.max_retries + 1)),
+                               **create_routing_llms(parse_stage_models(args.stage_model), args.cascade_model,
+                                                     timeout_s=args.llm_timeout)),
+          host=args.host, port=args.port, max_concurrency=args.concurrency, warmup=not args.no_warmup)
@@ -0,0 +1,58 @@
+"""
+Tests für den persistenten SQLite-Ergebnis-Cache.
+
+Aufruf:
+    python -m pytest tests
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from cache import ResultCache
+
+
+def test_make_key() -> None:
+    key = ResultCache.make_key("Bitte  um\nKopie", "prompt", "schema", "llama3", 0)
+    assert key == ResultCache.make_key("Bitte um Kopie", "prompt", "schema", "llama3", 0)
+    assert key != ResultCache.make_key("Bitte um Kopie", "prompt", "schema", "llama3.2:1b", 0)
+    assert key != ResultCache.make_key("Bitte um Kopie", "prompt v2", "schema", "llama3", 0)
+
+
+def test_get_set_and_stats() -> None:
+    cache = ResultCache(":memory:")
+    assert cache.get("a") is None
+    cache.set("a", {"category": "Sonstiges"})
+    cache.set("a", {"category": "Ratenplan anfordern"})
+    assert cache.get("a") == {"category": "Ratenplan anfordern"}
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "evictions": 0, "entries": 1}
+
+
+def test_least_recently_used_entries_are_evicted() -> None:
+    cache = ResultCache(":memory:", max_entries=2)
+    cache.set("a", {"v": 1})
+    time.sleep(0.01)
+    cache.set("b", {"v": 2})
+    time.sleep(0.01)
+    # Zugriff auf "a" macht "b" zum ältesten Eintrag
+    assert cache.get("a") == {"v": 1}
+    time.sleep(0.01)
+    cache.set("c", {"v": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": 1} and cache.get("c") == {"v": 3}
+    assert cache.stats()["evictions"] == 1 and cache.stats()["entries"] == 2
+
+
+def test_entries_survive_reopen(tmp_path) -> None:
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResultCache(path)
+    cache.set("a", {"v": 1})
+    cache.close()
+
+    cache = ResultCache(path, max_entries=1)
+    assert cache.stats()["entries"] == 1
+    assert cache.get("a") == {"v": 1}
+    cache.set("b", {"v": 2})
+    assert cache.get("a") is None
+    cache.close()
@@ -0,0 +1,72 @@
+"""
+Tests für fortsetzbare Läufe: Zeilen-IDs, Checkpoint und Reparatur abgeschnittener JSONL-Ausgaben.
+
+Aufruf:
+    python -m pytest tests
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from checkpoint import RunManifest, row_id
+from ingest import PredictionWriter, read_jsonl_rows, repair_jsonl_tail
+
+MAIL = {"Betreff": "Rechnung", "Text": "Bitte um eine Rechnungskopie.", "Anlagen": ""}
+
+
+def test_row_id_uses_id_column() -> None:
+    assert row_id({**MAIL, "message_id": "abc"}, 0) == row_id({**MAIL, "message_id": "abc"}, 5) == "abc"
+
+
+def test_row_id_distinguishes_identical_mails() -> None:
+    assert row_id(MAIL, 0) != row_id(dict(MAIL), 1)
+    assert row_id(MAIL, 3) == row_id(dict(MAIL), 3)
+
+
+def test_manifest_resume_skips_done_and_retries_failed(tmp_path) -> None:
+    path = str(tmp_path / "out.jsonl")
+    with PredictionWriter(path) as writer:
+        writer.write({"row_id": "a", "kategorie": "Sonstiges"})
+        writer.write({"row_id": "b", "kategorie": "Sonstiges", "error": "timeout"})
+        # Erneut verarbeitet: die zuletzt geschriebene Zeile gilt
+        writer.write({"row_id": "b", "kategorie": "Ratenplan anfordern"})
+        writer.write({"row_id": "c", "kategorie": "Sonstiges", "error": "timeout"})
+
+    manifest = RunManifest(path)
+    assert manifest.stats() == {"done": 3, "failed": 1}
+    assert manifest.get("b")["kategorie"] == "Ratenplan anfordern"
+    assert not manifest.needs_processing("a", retry_failed=True)
+    assert not manifest.needs_processing("c")
+    assert manifest.needs_processing("c", retry_failed=True)
+    assert manifest.needs_processing("d")
+    assert RunManifest(path, resume=False).stats() == {"done": 0, "failed": 0}
+
+
+def test_truncated_last_record_is_dropped(tmp_path) -> None:
+    path = str(tmp_path / "out.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"row_id": "a", "kategorie": "Sonstiges"}) + "\n")
+        f.write('{"row_id": "b", "kategor')
+
+    manifest = RunManifest(path)
+    assert manifest.needs_processing("b")
+    with PredictionWriter(path, append=True) as writer:
+        writer.write({"row_id": "b", "kategorie": "Sonstiges"})
+    assert [r["row_id"] for r in read_jsonl_rows(path)] == ["a", "b"]
+
+
+def test_complete_last_record_without_newline_is_kept(tmp_path) -> None:
+    path = tmp_path / "out.jsonl"
+    path.write_text('{"row_id": "a", "kategorie": "Sonstiges"}', encoding="utf-8")
+    assert repair_jsonl_tail(str(path)) is False
+    assert path.read_text(encoding="utf-8").endswith("}\n")
+
+
+def test_truncated_single_long_record(tmp_path) -> None:
+    # Datensatz länger als ein Leseblock, ohne vorherige Zeile
+    path = tmp_path / "out.jsonl"
+    path.write_text('{"row_id": "a", "text": "' + "x" * 100, encoding="utf-8")
+    assert repair_jsonl_tail(str(path), chunk_size=16) is True
+    assert path.read_text(encoding="utf-8") == ""
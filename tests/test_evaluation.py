@@ -0,0 +1,60 @@
+"""
+Tests für evaluation.evaluate mit dem Fake-Backend (ohne Ollama).
+
+Aufruf:
+    python -m pytest tests
+"""
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import evaluation
+from ingest import read_jsonl_rows
+
+
+@pytest.fixture
+def output_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("LLM_BACKEND", "fake")
+    monkeypatch.setattr(evaluation, "OUTPUT_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_evaluate_unlabelled_inbox_writes_predictions_only(output_dir) -> None:
+    inbox = output_dir / "inbox.jsonl"
+    with open(inbox, "w", encoding="utf-8") as f:
+        for i in range(3):
+            f.write(json.dumps({"Betreff": f"Anfrage {i}", "Text": "Bitte um eine Rechnungskopie.", "Anlagen": ""}) + "\n")
+    output = output_dir / "predictions.jsonl"
+
+    evaluation.evaluate(max_concurrency=2, cache_path=None, input_path=str(inbox), output_path=str(output))
+
+    predictions = list(read_jsonl_rows(str(output)))
+    assert len(predictions) == 3
+    assert all("row_id" in p and "kategorie" in p for p in predictions)
+    assert not (output_dir / "metrics.json").exists()
+
+
+def test_evaluate_duplicate_mails_get_own_rows(output_dir) -> None:
+    inbox = output_dir / "inbox.jsonl"
+    mail = json.dumps({"Betreff": "Rechnung", "Text": "Bitte um eine Rechnungskopie.", "Anlagen": ""})
+    inbox.write_text(f"{mail}\n{mail}\n", encoding="utf-8")
+    output = output_dir / "predictions.jsonl"
+
+    evaluation.evaluate(cache_path=None, input_path=str(inbox), output_path=str(output))
+    assert len({p["row_id"] for p in read_jsonl_rows(str(output))}) == 2
+
+
+def test_evaluate_retry_failed_resumes(output_dir) -> None:
+    inbox = output_dir / "inbox.jsonl"
+    inbox.write_text("".join(json.dumps({"id": str(i), "Text": f"Mail {i}"}) + "\n" for i in range(3)), encoding="utf-8")
+    output = output_dir / "predictions.jsonl"
+    output.write_text(json.dumps({"row_id": "0", "kategorie": "Sonstiges"}) + "\n"
+                      + json.dumps({"row_id": "1", "kategorie": "Sonstiges", "error": "timeout"}) + "\n", encoding="utf-8")
+
+    # Ohne --resume: die Ausgabe bleibt erhalten, nur die fehlgeschlagene und die fehlende Zeile werden verarbeitet
+    evaluation.evaluate(cache_path=None, input_path=str(inbox), output_path=str(output), retry_failed=True)
+    assert [p["row_id"] for p in read_jsonl_rows(str(output))] == ["0", "1", "1", "2"]
@@ -0,0 +1,88 @@
+"""
+Tests für AIModel mit dem Fake-Backend (ohne Ollama).
+
+Aufruf:
+    python -m pytest tests
+"""
+from typing import Any, Optional
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import model as model_module
+from backends import FakeChatModel
+from cache import ResultCache
+
+MAIL = ("Betreff: Rechnung \n Text: Bitte um eine Rechnungskopie.\n\n> Am Montag schrieb die Praxis:\n> alte Nachricht\n"
+        "Gesendet von meinem iPhone \n Anlagen: nan")
+
+
+class RecordingClassifier:
+    """Vorklassifikator, der die erhaltenen Mails festhält und immer "Sonstiges" liefert."""
+    name = "recording"
+
+    def __init__(self) -> None:
+        self.requests: list[str] = []
+
+    def predict(self, request: str) -> Optional[tuple[str, float]]:
+        self.requests.append(request)
+        return "Sonstiges", 1.0
+
+
+def test_pre_classifiers_see_original_mail_with_preprocess() -> None:
+    # Regeln und kNN-Index beruhen auf unverarbeiteten Mails; die Abfrage muss dieselbe Verteilung sehen
+    recorder = RecordingClassifier()
+    ai_model = model_module.AIModel(llm=FakeChatModel(latency_s=0), preprocess=True, pre_classifiers=[recorder])
+    result = ai_model.zero_shot_classifier(MAIL)
+    assert recorder.requests == [MAIL]
+    assert result["quelle"] == "recording"
+
+
+def _answer(category: str):
+    def responder(prompt: str, schema: dict[str, Any]) -> dict[str, Any]:
+        return {"category": category, "vorname": None, "nachname": None, "rechnungsbetrag": None,
+                "geburtsdatum": None, "anschrift": None}
+    return responder
+
+
+def _cascade_model(small: FakeChatModel, **kwargs: Any) -> model_module.AIModel:
+    return model_module.AIModel(llm=FakeChatModel(latency_s=0, responder=_answer("Sonstiges")), cascade_llm=small, **kwargs)
+
+
+def test_cascade_agreement_skips_large_model() -> None:
+    ai_model = _cascade_model(FakeChatModel(model="small", latency_s=0, responder=_answer("Sonstiges")))
+    ai_model.zero_shot_classifier(MAIL)
+    assert ai_model.cascade_resilience.stats()["succeeded"] == 1
+    assert ai_model.resilience.stats()["calls"] == 0
+
+
+def test_cascade_failure_escalates_without_retry() -> None:
+    ai_model = _cascade_model(FakeChatModel(model="small", latency_s=0, failure_rate=1.0))
+    start = time.perf_counter()
+    for i in range(8):
+        result = ai_model.zero_shot_classifier(f"{MAIL} {i}")
+        assert result["kategorie"] == "Sonstiges" and "error" not in result
+    assert time.perf_counter() - start < 1.0
+
+    cascade = ai_model.cascade_resilience.stats()
+    assert cascade["retries"] == 0 and cascade["backoff_s"] == 0
+    # Nach fünf Fehlern ist der Schalter der Kaskade offen; weitere Mails eskalieren ohne Warten
+    assert cascade["circuit_state"] == "open" and cascade["rejected"] == 3
+    large = ai_model.resilience.stats()
+    assert large["calls"] == large["succeeded"] == 8
+    assert large["circuit_state"] == "closed"
+
+
+def test_cascade_escalation_is_cached() -> None:
+    cache = ResultCache(":memory:")
+    # Uneinige Antworten des kleinen Modells: Eskalation, die der zweite Lauf aus dem Cache liest
+    categories = iter(["Sonstiges", "Ratenplan anfordern", "Sonstiges"] * 2)
+    small = FakeChatModel(model="small", latency_s=0, num_parallel=1,
+                          responder=lambda prompt, schema: _answer(next(categories))(prompt, schema))
+    ai_model = _cascade_model(small, cache=cache)
+    ai_model.zero_shot_classifier(MAIL)
+    ai_model.zero_shot_classifier(MAIL)
+    assert ai_model.cascade_resilience.stats()["calls"] == 1
+    assert ai_model.resilience.stats()["calls"] == 1
@@ -0,0 +1,41 @@
+"""
+Regressionstests für preprocess: Textbausteine dürfen den Text der Patienten nicht mitlöschen.
+
+Aufruf:
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from preprocess import clean_text, preprocess_request
+
+
+@pytest.mark.parametrize("text, expected", [
+    # Einzeilige Mails: Fußzeile am Zeilenende, der Text davor bleibt erhalten
+    ("Ich habe heute 120 EUR überwiesen. Gesendet von meinem iPhone", "Ich habe heute 120 EUR überwiesen."),
+    ("Bitte schicken Sie mir eine Rechnungskopie. Diese E-Mail ist vertraulich.", "Bitte schicken Sie mir eine Rechnungskopie."),
+    ("Bitte um Ratenplan. Bitte denken Sie an die Umwelt, bevor Sie drucken.", "Bitte um Ratenplan."),
+    # Schlüsselwörter der Kontaktzeilen in normalen Sätzen
+    ("Handy neu, ich kann mich nicht mehr einloggen, bitte Passwort schicken.",
+     "Handy neu, ich kann mich nicht mehr einloggen, bitte Passwort schicken."),
+    ("Tel. 0171/123456, bitte rufen Sie mich an.", "Tel. 0171/123456, bitte rufen Sie mich an."),
+    ("Web-Portal geht nicht, bitte neues Passwort.", "Web-Portal geht nicht, bitte neues Passwort."),
+])
+def test_single_line_body_keeps_patient_text(text: str, expected: str) -> None:
+    assert clean_text(text) == expected
+
+
+def test_multi_line_footer_is_removed() -> None:
+    text = ("Hallo,\nbitte schicken Sie mir einen Ratenplan.\n\nMit freundlichen Grüßen\nMax Muster\n"
+            "Tel: +49 171 1234567\nwww.example.de\n\nGesendet von meinem iPhone\n\n"
+            "Diese E-Mail enthält vertrauliche Informationen.\nWenn Sie nicht der richtige Adressat sind, …")
+    assert clean_text(text) == "Hallo,\nbitte schicken Sie mir einen Ratenplan.\nMit freundlichen Grüßen\nMax Muster"
+
+
+def test_preprocess_request_keeps_single_line_text() -> None:
+    request = "Betreff: Zahlung \n Text: Ich habe heute 120 EUR überwiesen. Gesendet von meinem iPhone \n Anlagen: nan"
+    assert preprocess_request(request) == "Betreff: Zahlung \n Text: Ich habe heute 120 EUR überwiesen. \n Anlagen: nan"
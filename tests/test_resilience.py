@@ -0,0 +1,137 @@
+"""
+Tests für Wiederholung und Circuit Breaker.
+
+Aufruf:
+    python -m pytest tests
+"""
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from resilience import CircuitBreaker, CircuitOpenError, Resilience, RetryPolicy, is_timeout, is_transient
+
+
+def _failing(errors: list[Exception], result: str = "ok"):
+    """Liefert einen Aufruf, der zuerst die angegebenen Fehler wirft und dann `result` liefert."""
+    errors = list(errors)
+
+    def call() -> str:
+        if errors:
+            raise errors.pop(0)
+        return result
+    return call
+
+
+@pytest.mark.parametrize("exc, transient", [
+    (TimeoutError(), True),
+    (ConnectionError(), True),
+    (SimpleNamespace(status_code=503), True),
+    (SimpleNamespace(response=SimpleNamespace(status_code=429)), True),
+    (SimpleNamespace(status_code=400), False),
+    (ValueError("ungültiges JSON"), False),
+])
+def test_is_transient(exc, transient) -> None:
+    assert is_transient(exc) is transient
+
+
+def test_is_timeout() -> None:
+    assert is_timeout(TimeoutError())
+    assert not is_timeout(ConnectionError())
+
+
+def test_retry_policy() -> None:
+    policy = RetryPolicy(max_attempts=3, base_delay_s=0.5, max_delay_s=1.0, seed=0)
+    assert policy.should_retry(ConnectionError(), 1)
+    assert policy.should_retry(ConnectionError(), 2)
+    assert not policy.should_retry(ConnectionError(), 3)
+    assert not policy.should_retry(ValueError(), 1)
+    assert all(0 <= policy.delay(attempt) <= min(1.0, 0.5 * 2 ** (attempt - 1)) for attempt in range(1, 6) for _ in range(20))
+
+
+def test_call_retries_transient_errors() -> None:
+    resilience = Resilience(RetryPolicy(max_attempts=3, base_delay_s=0.001, seed=0))
+    assert resilience.call(_failing([ConnectionError(), TimeoutError()])) == "ok"
+    stats = resilience.stats()
+    assert (stats["calls"], stats["succeeded"], stats["failed"]) == (1, 1, 0)
+    assert (stats["attempt_errors"], stats["retries"], stats["timeouts"]) == (2, 2, 1)
+
+
+def test_call_gives_up_after_max_attempts() -> None:
+    resilience = Resilience(RetryPolicy(max_attempts=2, base_delay_s=0.001))
+    with pytest.raises(ConnectionError):
+        resilience.call(_failing([ConnectionError()] * 3))
+    assert resilience.stats()["failed"] == 1
+    assert resilience.stats()["retries"] == 1
+
+
+def test_call_does_not_retry_permanent_errors() -> None:
+    resilience = Resilience(RetryPolicy(max_attempts=3, base_delay_s=0.001))
+    with pytest.raises(ValueError):
+        resilience.call(_failing([ValueError("ungültiges JSON")]))
+    stats = resilience.stats()
+    assert stats["retries"] == 0 and stats["circuit_state"] == "closed"
+
+
+def test_breaker_opens_after_consecutive_failures() -> None:
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout_s=60)
+    for failed in (True, True, False, True, True):
+        breaker.record(failed=failed, probe=breaker.acquire())
+    assert breaker.state == "closed"
+    breaker.record(failed=True, probe=breaker.acquire())
+    assert breaker.state == "open" and breaker.opens == 1
+    assert 59 < breaker.retry_after_s() <= 60
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire(timeout=0.01)
+
+
+def test_half_open_probe_closes_or_reopens() -> None:
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout_s=0.05)
+    breaker.record(failed=True, probe=breaker.acquire())
+    assert breaker.state == "open"
+
+    time.sleep(0.06)
+    probe = breaker.acquire(timeout=1)
+    assert probe and breaker.state == "half_open"
+    # Nur ein Probeaufruf gleichzeitig
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire(timeout=0.01)
+    breaker.record(failed=True, probe=probe)
+    assert breaker.state == "open" and breaker.opens == 2
+
+    time.sleep(0.06)
+    probe = breaker.acquire(timeout=1)
+    breaker.record(failed=False, probe=probe)
+    assert breaker.state == "closed"
+    assert breaker.acquire(timeout=0) is False
+
+
+def test_old_call_does_not_decide_half_open_state() -> None:
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout_s=0.05)
+    old = breaker.acquire()
+    breaker.record(failed=True, probe=breaker.acquire())
+    time.sleep(0.06)
+    probe = breaker.acquire(timeout=1)
+    # Ein vor dem Öffnen gestarteter Aufruf endet während des Probeaufrufs
+    breaker.record(failed=False, probe=old)
+    assert breaker.state == "half_open"
+    breaker.record(failed=True, probe=old)
+    assert breaker.state == "half_open" and breaker.opens == 1
+    breaker.record(failed=False, probe=probe)
+    assert breaker.state == "closed"
+
+
+def test_call_rejected_while_open() -> None:
+    resilience = Resilience(RetryPolicy(max_attempts=1), CircuitBreaker(failure_threshold=1, reset_timeout_s=60),
+                            max_wait_s=0)
+    with pytest.raises(ConnectionError):
+        resilience.call(_failing([ConnectionError()]))
+    with pytest.raises(CircuitOpenError):
+        resilience.call(_failing([]))
+    stats = resilience.stats()
+    assert (stats["calls"], stats["failed"], stats["rejected"]) == (2, 2, 1)
+    assert stats["circuit_state"] == "open" and stats["circuit_opens"] == 1
@@ -0,0 +1,97 @@
+"""
+Tests für den Klassifikationsdienst mit dem Fake-Backend (ohne Ollama).
+
+Aufruf:
+    python -m pytest tests
+"""
+from http.server import ThreadingHTTPServer
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import model as model_module
+from backends import FakeChatModel
+from service import RequestDispatcher, make_handler
+
+MAIL = "Betreff: Rechnung \n Text: Bitte um eine Rechnungskopie. \n Anlagen: nan"
+
+
+@pytest.fixture
+def dispatcher():
+    # One-Pass: genau ein LLM-Aufruf pro Mail
+    ai_model = model_module.AIModel(mode="one_pass", llm=FakeChatModel(latency_s=0.1, num_parallel=4))
+    dispatcher = RequestDispatcher(ai_model, max_concurrency=4)
+    yield dispatcher
+    dispatcher.close()
+
+
+def test_single_request_starts_immediately(dispatcher) -> None:
+    start = time.perf_counter()
+    result = dispatcher.classify(MAIL, timeout=5)
+    assert time.perf_counter() - start < 0.15
+    assert result["kategorie"] in dispatcher.ai_model.labels
+    stats = dispatcher.stats()
+    assert stats["processed"] == 1 and stats["errors"] == 0 and stats["in_flight"] == 0
+    assert stats["queue_wait_s"]["p99"] < 0.05
+
+
+def test_requests_fill_all_slots(dispatcher) -> None:
+    start = time.perf_counter()
+    futures = [dispatcher.submit(f"{MAIL} {i}") for i in range(8)]
+    results = [future.result(timeout=5) for future in futures]
+    # 8 Mails auf 4 Slots: zwei Runden à 0.1 s
+    assert time.perf_counter() - start < 0.3
+    assert len(results) == 8
+    assert dispatcher.stats()["processed"] == 8
+
+
+def test_closed_dispatcher_rejects_requests(dispatcher) -> None:
+    dispatcher.close()
+    with pytest.raises(RuntimeError):
+        dispatcher.submit(MAIL)
+
+
+@pytest.fixture
+def server_url(dispatcher):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(dispatcher, timeout=5))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def _post(url: str, body: object) -> tuple[int, object]:
+    request = urllib.request.Request(f"{url}/classify", data=json.dumps(body).encode("utf-8"), method="POST")
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_classify_request_list(server_url) -> None:
+    status, body = _post(server_url, {"requests": [MAIL, {"Betreff": "Rechnung", "Text": "Kopie bitte", "Anlagen": ""}]})
+    assert status == 200
+    assert len(body) == 2
+
+
+@pytest.mark.parametrize("body", [
+    {"requests": "abc"},
+    {"requests": [1, 2]},
+    {"requests": {"Text": "..."}},
+    ["abc"],
+])
+def test_invalid_request_list_is_rejected(server_url, dispatcher, body) -> None:
+    status, response = _post(server_url, body)
+    assert status == 400
+    assert "error" in response
+    assert dispatcher.stats()["processed"] == 0